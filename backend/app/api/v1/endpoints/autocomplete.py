@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Query
+from typing import Dict, List, Optional
+from app.services.autocomplete import get_autocomplete_service
+
+router = APIRouter()
+autocomplete_service = get_autocomplete_service()
+
+@router.get("/")
+async def autocomplete(
+    q: str = Query(default=""),
+    owner_id: Optional[str] = None,
+    kinds: List[str] = Query(default=["tags", "categories", "titles"]),
+    limit: int = Query(default=10, ge=1, le=50)
+) -> Dict[str, List[Dict]]:
+    """Suggest tags, categories and (for owner_id) document titles starting with q"""
+    return autocomplete_service.suggest(q, owner_id=owner_id, kinds=kinds, limit=limit)
@@ -1,18 +1,29 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from typing import List
+from pydantic import BaseModel
 from app.models.category import Category
 from app.services.config import ConfigService
 
 router = APIRouter()
 config_service = ConfigService()
 
+class RenameRequest(BaseModel):
+    new_name: str
+
 @router.get("/", response_model=List[Category])
-async def get_categories():
-    """Get all categories"""
+async def get_categories(request: Request, response: Response):
+    """Get all categories (supports If-None-Match revalidation)"""
     try:
-        return await config_service.get_categories()
+        categories = await config_service.get_categories()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    etag = config_service.catalog.etag("categories")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return categories
 
 @router.post("/", response_model=Category)
 async def create_category(category: Category):
@@ -29,4 +40,12 @@ async def delete_category(name: str):
         await config_service.delete_category(name)
         return {"message": f"Category {name} deleted successfully"}
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=str(e)) 
+
+@router.post("/{name}/rename")
+async def rename_category(name: str, request: RenameRequest):
+    """Rename a category and rewrite every document that uses it"""
+    try:
+        return await config_service.rename_category(name, request.new_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
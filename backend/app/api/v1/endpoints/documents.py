@@ -1,117 +1,364 @@
 from typing import List, Optional, Dict
-from fastapi import APIRouter, File, Form, UploadFile, Query, HTTPException
-from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile, Query, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from datetime import datetime, timezone
 from pydantic import BaseModel
-from ....models.document import Document
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+import asyncio
+import json
+import logging
+from ....core.config import settings
+from ....core.database import read_collection
+from ....models.document import Document, LIVE
+from ....models.share import Share
 from ....services.storage.factory import get_storage_provider
+from ....services.storage.inventory import get_storage_inventory
+from ....services.storage.key_filter import get_storage_key_filter
 from ....services.ai_analysis import AIAnalysisService, AIServiceError
+from ....services.analysis_cache import content_hash
+from ....services.search.service import get_search_service
+from ....services.autocomplete import get_autocomplete_service
+from ....services.content import get_content_service
+from ....services.enrichment import get_enrichment_queue
+from ....services.similarity import get_similarity_service
+from ....services.vector_index import get_related_documents_service
+from ....services.filters import FilterSyntaxError, build_filter_query, merge_clauses
+from ....services.bulk import BulkMetadataService
+from ....services.document import DocumentService
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 storage = get_storage_provider()
+inventory = get_storage_inventory()
+key_filter = get_storage_key_filter()
+search_service = get_search_service()
+autocomplete_service = get_autocomplete_service()
+content_service = get_content_service()
+enrichment_queue = get_enrichment_queue()
+similarity_service = get_similarity_service()
+related_service = get_related_documents_service()
+bulk_service = BulkMetadataService()
+document_service = DocumentService()
 
 class BatchDeleteRequest(BaseModel):
     document_ids: List[str]
     owner_id: str
 
+class BatchUploadResult(BaseModel):
+    file_name: str
+    status: str  # "created" or "failed"
+    document_id: Optional[str] = None
+    error: Optional[str] = None
+    duplicates: List[Dict] = []  # Likely near-duplicates already stored
+
+class BatchUploadResponse(BaseModel):
+    documents: List[Document]
+    results: List[BatchUploadResult]
+    success: int
+    total: int
+
+class BulkUpdateRequest(BaseModel):
+    owner_id: str
+    document_ids: Optional[List[str]] = None
+    filter: Optional[str] = None  # Same syntax as the listing filter
+    add_tags: List[str] = []
+    remove_tags: List[str] = []
+    add_categories: List[str] = []
+    remove_categories: List[str] = []
+    description: Optional[str] = None
+
+class DocumentPatch(BaseModel):
+    owner_id: str
+    revision: Optional[int] = None  # Expected revision; omit to skip the check
+    title: Optional[str] = None
+    description: Optional[str] = None
+    categories: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+    add_tags: List[str] = []
+    remove_tags: List[str] = []
+    add_categories: List[str] = []
+    remove_categories: List[str] = []
+
+class BulkUpdateResponse(BaseModel):
+    matched: int
+    modified: int
+
+class SearchHighlights(BaseModel):
+    title: str
+    description: Optional[str] = None
+    content: Optional[str] = None
+
+class SearchHit(BaseModel):
+    document: Document
+    score: float
+    highlights: SearchHighlights
+
 @router.get("/")
 async def list_documents(
     owner_id: str,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=10, ge=1, le=100),
     category: Optional[str] = None,
-    tag: Optional[str] = None
-) -> List[Document]:
+    tag: Optional[str] = None,
+    filter: Optional[str] = Query(
+        default=None,
+        description='Boolean filter, e.g. Invoice AND 2024 AND NOT paid AND created>=2024-01-01'
+    ),
+    include: List[str] = Query(
+        default=[],
+        description='Related data to embed: "shares" adds each document\'s active share (or null)'
+    )
+) -> List[Dict]:
     """List documents with optional filtering"""
-    query = {"owner_id": owner_id}
+    clauses = [{"owner_id": owner_id}, LIVE]
     if category:
-        query["categories"] = category
+        clauses.append({"categories": category})
     if tag:
-        query["tags"] = tag
+        clauses.append({"tags": tag})
+    if filter:
+        try:
+            clauses.append(build_filter_query(filter))
+        except FilterSyntaxError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid filter: {str(e)}")
+    query = merge_clauses(clauses)
     
-    return await Document.find(query).skip(skip).limit(limit).to_list()
+    if "shares" not in include:
+        cursor = read_collection(Document, "listing").find(query).skip(skip).limit(limit)
+        return [jsonable_encoder(Document.model_validate(row)) async for row in cursor]
+
+    # Join after paginating, so only this page's shares are looked up
+    # (via the shares.document_id index) and everything is one round-trip
+    pipeline = [
+        {"$match": query},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$lookup": {
+            "from": Share.Settings.name,
+            "localField": "_id",
+            "foreignField": "document_id",
+            "pipeline": [
+                {"$match": {"expires_at": {"$gt": datetime.now(timezone.utc)}}},
+                {"$sort": {"expires_at": -1}},
+                {"$limit": 1},
+                {"$project": {"short_url": 1, "expires_at": 1}}
+            ],
+            "as": "shares"
+        }}
+    ]
+    documents = []
+    async for row in read_collection(Document, "listing").aggregate(pipeline):
+        shares = row.pop("shares")
+        item = jsonable_encoder(Document.model_validate(row))
+        item["share"] = {
+            "id": str(shares[0]["_id"]),
+            "document_id": str(row["_id"]),
+            "short_url": shares[0]["short_url"],
+            "expires_at": shares[0]["expires_at"].replace(tzinfo=timezone.utc).isoformat()
+        } if shares else None
+        documents.append(item)
+    return documents
+
+@router.get("/search")
+async def search_documents(
+    owner_id: str,
+    q: str = Query(..., min_length=1),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=10, ge=1, le=100),
+    categories: List[str] = Query(default=[]),
+    tags: List[str] = Query(default=[])
+) -> List[SearchHit]:
+    """Full-text search over titles, descriptions, labels and file content"""
+    return await search_service.search(
+        owner_id=owner_id,
+        query=q,
+        categories=categories,
+        tags=tags,
+        limit=limit,
+        skip=skip
+    )
+
+@router.post("/bulk-update")
+async def bulk_update_documents(request: BulkUpdateRequest) -> BulkUpdateResponse:
+    """Add/remove labels and set fields on many documents with update_many"""
+    try:
+        result = await bulk_service.bulk_update(
+            owner_id=request.owner_id,
+            document_ids=request.document_ids,
+            filter_expression=request.filter,
+            add_tags=request.add_tags,
+            remove_tags=request.remove_tags,
+            add_categories=request.add_categories,
+            remove_categories=request.remove_categories,
+            set_fields={"description": request.description}
+        )
+    except FilterSyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BulkUpdateResponse(**result)
 
 @router.post("/batch")
 async def create_documents(
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     title_prefix: str = Form(...),
     description: Optional[str] = Form(None),
     categories: List[str] = Form([]),
     tags: List[str] = Form([]),
-    owner_id: str = Form(...)
-) -> List[Document]:
-    """Create multiple documents in one request"""
-    documents = []
+    owner_id: str = Form(...),
+    enrich: bool = Form(True),
+    check_duplicates: bool = Form(False)
+) -> BatchUploadResponse:
+    """
+    Create multiple documents in one request.
+
+    Files are uploaded concurrently (at most UPLOAD_CONCURRENCY at a time),
+    then all successful uploads are inserted with a single unordered
+    insert_many. Objects whose metadata insert fails are removed from
+    storage again. Every file gets its own outcome in the response.
+    With enrich, created documents are queued for AI enrichment. Opting in
+    to check_duplicates makes the response wait for text extraction
+    (otherwise done in the background) so each result can list likely
+    near-duplicates; GET /{id}/similar answers the same later.
+    """
+    semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+    current_time = datetime.utcnow()
+    results = [BatchUploadResult(file_name=file.filename, status="failed") for file in files]
+    contents: Dict[int, bytes] = {}
     
-    for i, file in enumerate(files):
-        # Read file content
-        file_content = await file.read()
-        file_size = len(file_content)
-        
-        # Generate S3 key (path in B2)
-        current_time = datetime.utcnow()
-        file_path = f"documents/{owner_id}/{current_time.year}/{current_time.month:02d}/{current_time.day:02d}/{file.filename}"
-        
-        # Create document metadata
-        document = Document(
-            title=f"{title_prefix} {i+1}" if len(files) > 1 else title_prefix,
-            description=description,
-            file_name=file.filename,
-            file_size=file_size,
-            mime_type=file.content_type or "application/octet-stream",
-            s3_key=file_path,
-            categories=categories,
-            tags=tags,
-            owner_id=owner_id
-        )
-        
-        # Upload file to B2
-        await storage.upload_file(file_content, file_path)
-        
-        # Save document metadata
-        await document.insert()
+    async def upload(i: int, file: UploadFile) -> Optional[Document]:
+        async with semaphore:
+            try:
+                # Read file content
+                file_content = await file.read()
+                
+                # Generate S3 key (path in B2)
+                file_path = f"documents/{owner_id}/{current_time.year}/{current_time.month:02d}/{current_time.day:02d}/{file.filename}"
+                
+                # Create document metadata with its id assigned up front,
+                # so insert_many failures can be matched back to files
+                document = Document(
+                    id=PydanticObjectId(),
+                    title=f"{title_prefix} {i+1}" if len(files) > 1 else title_prefix,
+                    description=description,
+                    file_name=file.filename,
+                    file_size=len(file_content),
+                    mime_type=file.content_type or "application/octet-stream",
+                    s3_key=file_path,
+                    categories=categories,
+                    tags=tags,
+                    owner_id=owner_id
+                )
+                
+                await storage.upload_file(file_content, file_path)
+                contents[i] = file_content
+                return document
+            except Exception as e:
+                results[i].error = f"Upload failed: {str(e)}"
+                return None
+    
+    uploaded = await asyncio.gather(*(upload(i, file) for i, file in enumerate(files)))
+    pending = [(i, document) for i, document in enumerate(uploaded) if document is not None]
+    
+    # Save all metadata in one round-trip
+    failed_inserts: Dict[int, str] = {}
+    if pending:
+        try:
+            await Document.insert_many([document for _, document in pending], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed_inserts[error["index"]] = error.get("errmsg", "Insert failed")
+        except Exception as e:
+            failed_inserts = {position: str(e) for position in range(len(pending))}
+    
+    # Remove stored objects whose metadata could not be saved
+    async def cleanup(file_path: str):
+        try:
+            await storage.delete_file(file_path)
+        except Exception as e:
+            logger.error(f"Error cleaning up {file_path} after failed insert: {str(e)}")
+    
+    await asyncio.gather(*(
+        cleanup(pending[position][1].s3_key) for position in failed_inserts
+    ))
+    
+    documents = []
+    for position, (i, document) in enumerate(pending):
+        if position in failed_inserts:
+            results[i].error = f"Saving metadata failed: {failed_inserts[position]}"
+            continue
+        results[i].status = "created"
+        results[i].document_id = str(document.id)
         documents.append(document)
+        autocomplete_service.document_added(document)
+        if not check_duplicates:
+            background_tasks.add_task(search_service.index_document, document, contents[i])
     
-    return documents
+    if check_duplicates:
+        created = [(i, document) for i, document in pending if results[i].status == "created"]
+        await asyncio.gather(*(
+            search_service.index_document(document, contents[i]) for i, document in created
+        ))
+        duplicates = await asyncio.gather(*(
+            similarity_service.find_similar(str(document.id), owner_id) for _, document in created
+        ))
+        for (i, _), found in zip(created, duplicates):
+            results[i].duplicates = found or []
+    
+    await inventory.objects_added([
+        {"key": document.s3_key, "size": document.file_size} for document in documents
+    ])
+    for document in documents:
+        key_filter.key_added(document.s3_key)
+    if enrich:
+        await enrichment_queue.enqueue_many(documents)
+    return BatchUploadResponse(
+        documents=documents,
+        results=results,
+        success=len(documents),
+        total=len(files)
+    )
 
 @router.delete("/batch")
 async def delete_documents(request: BatchDeleteRequest):
-    """Delete multiple documents in one request"""
-    deleted_count = 0
-    errors = []
-    
-    for doc_id in request.document_ids:
-        try:
-            document = await Document.get(doc_id)
-            if not document or document.owner_id != request.owner_id:
-                errors.append(f"Document {doc_id} not found or access denied")
-                continue
-            
-            # Delete from B2
-            await storage.delete_file(document.s3_key)
-            
-            # Delete metadata
-            await document.delete()
-            deleted_count += 1
-            
-        except Exception as e:
-            errors.append(f"Error deleting document {doc_id}: {str(e)}")
+    """Delete multiple documents in one request (files are purged in the background)"""
+    deleted = set(await document_service.delete_documents(request.document_ids, request.owner_id))
+    errors = [
+        f"Document {doc_id} not found or access denied"
+        for doc_id in request.document_ids if doc_id not in deleted
+    ]
     
     return {
-        "success": deleted_count,
+        "success": len(deleted),
         "total": len(request.document_ids),
         "errors": errors if errors else None
     }
 
 @router.post("/")
 async def create_document(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     title_prefix: str = Form(...),
     description: Optional[str] = Form(None),
     categories: List[str] = Form([]),
     tags: List[str] = Form([]),
-    owner_id: str = Form(...)
+    owner_id: str = Form(...),
+    enrich: bool = Form(True),
+    check_duplicates: bool = Form(False)
 ) -> Document:
-    """Create a new document"""
+    """
+    Create a new document.
+
+    Text extraction and indexing run in the background; once done, likely
+    near-duplicates are listed by GET /{id}/similar, which the response's
+    Link header (rel="duplicates") points to. Opting in to
+    check_duplicates makes the response wait for indexing and adds the
+    near-duplicates to the document as "duplicates".
+    """
     # Read file content
     file_content = await file.read()
     file_size = len(file_content)
@@ -138,37 +385,147 @@ async def create_document(
     
     # Save document metadata
     await document.insert()
+    await inventory.object_added(file_path, file_size)
+    key_filter.key_added(file_path)
+    autocomplete_service.document_added(document)
+    if enrich:
+        await enrichment_queue.enqueue(document)
+
+    similar_url = request.url_for("get_similar_documents", document_id=str(document.id))
+    link = f'<{similar_url.include_query_params(owner_id=owner_id)}>; rel="duplicates"'
+    if check_duplicates:
+        await search_service.index_document(document, file_content)
+        duplicates = await similarity_service.find_similar(str(document.id), owner_id)
+        return JSONResponse(
+            {**jsonable_encoder(document), "duplicates": duplicates or []},
+            headers={"Link": link}
+        )
+    background_tasks.add_task(search_service.index_document, document, file_content)
+    response.headers["Link"] = link
     return document
 
 @router.get("/{document_id}/download")
 async def get_download_url(document_id: str, owner_id: str) -> dict:
     """Get download URL for a document"""
     document = await Document.get(document_id)
-    if not document or document.owner_id != owner_id:
+    if not document or document.owner_id != owner_id or document.deleted_at:
         raise HTTPException(status_code=404, detail="Document not found")
     
     url = await storage.generate_download_url(document.s3_key)
     return {"download_url": url}
 
-@router.delete("/{document_id}")
-async def delete_document(document_id: str, owner_id: str):
-    """Delete a document"""
+@router.get("/{document_id}/content")
+async def get_document_content(document_id: str, owner_id: str) -> Dict:
+    """Get the extracted text, summary and page data of a document"""
     document = await Document.get(document_id)
-    if not document or document.owner_id != owner_id:
+    if not document or document.owner_id != owner_id or document.deleted_at:
         raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Delete from B2
-    await storage.delete_file(document.s3_key)
-    
-    # Delete metadata
-    await document.delete()
+
+    content = await content_service.get(document_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="No content extracted for this document")
+    return content
+
+@router.get("/{document_id}/similar")
+async def get_similar_documents(
+    document_id: str,
+    owner_id: str,
+    threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+    limit: int = Query(10, ge=1, le=100)
+) -> Dict:
+    """Likely near-duplicates of a document (re-scans, minor edits), most similar first"""
+    document = await Document.get(document_id)
+    if not document or document.owner_id != owner_id or document.deleted_at:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    similar = await similarity_service.find_similar(document_id, owner_id, threshold, limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="No content extracted for this document")
+    return {"document_id": document_id, "similar": similar}
+
+@router.get("/{document_id}/related")
+async def get_related_documents(
+    document_id: str,
+    owner_id: str,
+    limit: int = Query(10, ge=1, le=100)
+) -> Dict:
+    """Documents with the most similar text (cosine of local embeddings), most related first"""
+    document = await Document.get(document_id)
+    if not document or document.owner_id != owner_id or document.deleted_at:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    related = (await related_service.related([document_id], owner_id, limit))[document_id]
+    if related is None:
+        raise HTTPException(status_code=404, detail="No content extracted for this document")
+    return {"document_id": document_id, "related": related}
+
+@router.get("/{document_id}/analysis")
+async def get_document_analysis(document_id: str, owner_id: str) -> Dict:
+    """Status of a document's background AI enrichment (queued, running, done, dead, cancelled)"""
+    document = await Document.get(document_id)
+    if not document or document.owner_id != owner_id or document.deleted_at:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    job = await enrichment_queue.status(document_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No analysis requested for this document")
+    return job
+
+@router.post("/{document_id}/analysis")
+async def request_document_analysis(document_id: str, owner_id: str) -> Dict:
+    """Queue (or re-run, e.g. after it was dead-lettered) AI enrichment of a document"""
+    document = await Document.get(document_id)
+    if not document or document.owner_id != owner_id or document.deleted_at:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if not enrichment_queue.enabled:
+        raise HTTPException(status_code=503, detail="AI analysis is not configured")
+    if not await enrichment_queue.enqueue(document):
+        raise HTTPException(status_code=400, detail=f"Cannot analyze files of type {document.mime_type}")
+    return await enrichment_queue.status(document_id)
+
+@router.patch("/{document_id}")
+async def patch_document(document_id: str, patch: DocumentPatch) -> Document:
+    """Partially update a document's metadata (409 if the revision is stale)"""
+    return await document_service.patch_document(
+        document_id,
+        patch.owner_id,
+        revision=patch.revision,
+        set_fields={
+            "title": patch.title,
+            "description": patch.description,
+            "categories": patch.categories,
+            "tags": patch.tags
+        },
+        add_tags=patch.add_tags,
+        remove_tags=patch.remove_tags,
+        add_categories=patch.add_categories,
+        remove_categories=patch.remove_categories
+    )
+
+@router.delete("/{document_id}")
+async def delete_document(document_id: str, owner_id: str):
+    """Delete a document (its file and shares are purged in the background)"""
+    await document_service.delete_document(document_id, owner_id)
     return {"status": "success"}
 
+# HTTP status for each kind of AI analysis failure
+AI_ERROR_STATUS = {
+    "quota_exceeded": 402,  # Payment Required
+    "rate_limited": 429,  # Too Many Requests
+    "authentication_error": 401,  # Unauthorized
+    "configuration_error": 503,  # Service Unavailable
+    "api_error": 502,  # Bad Gateway
+    "processing_error": 500,  # Internal Server Error
+    "unknown_error": 500,  # Internal Server Error
+}
+
 @router.post("/analyze")
 async def analyze_document(
     file: UploadFile = File(...),
+    summary: bool = Form(True),
 ) -> Dict:
-    """Analyze a document and return AI-generated suggestions"""
+    """Analyze a document and return AI-generated suggestions (without summary, locally when possible)"""
     try:
         # Initialize AI service only when needed
         ai_service = AIAnalysisService()
@@ -177,40 +534,92 @@ async def analyze_document(
         file_content = await file.read()
         
         try:
-            # Get suggestions
-            suggestions = await ai_service.get_suggestions(
-                file_content,
-                file.content_type or "application/octet-stream"
-            )
-            
-            # Get summary
-            summary = await ai_service.get_summary(
+            # One extraction and one API call (none if the file was seen before)
+            return await ai_service.analyze(
                 file_content,
-                file.content_type or "application/octet-stream"
+                file.content_type or "application/octet-stream",
+                summary=summary
             )
             
-            return {
-                "summary": summary,
-                "categories": suggestions["categories"],
-                "tags": suggestions["tags"]
-            }
-            
         except AIServiceError as e:
-            error_status = {
-                "quota_exceeded": 402,  # Payment Required
-                "authentication_error": 401,  # Unauthorized
-                "configuration_error": 503,  # Service Unavailable
-                "api_error": 502,  # Bad Gateway
-                "processing_error": 500,  # Internal Server Error
-                "unknown_error": 500,  # Internal Server Error
-            }.get(e.error_type, 500)
-            
             raise HTTPException(
-                status_code=error_status,
-                detail=e.message
+                status_code=AI_ERROR_STATUS.get(e.error_type, 500),
+                detail=e.message,
+                headers={"Retry-After": str(int(e.retry_after) + 1)} if e.retry_after else None
             )
             
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analyze/batch")
+async def analyze_documents(
+    files: List[UploadFile] = File(...),
+    summary: bool = Form(True),
+) -> StreamingResponse:
+    """
+    Analyze several documents at once, streaming one NDJSON line per file.
+
+    Files are analyzed concurrently; the shared rate limiter and the
+    extraction pool bound the actual work. Identical files are analyzed
+    once, and the copies report the index of the first in duplicate_of.
+    Lines are written as files finish, so they arrive out of order.
+    """
+    if len(files) > settings.ANALYZE_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ANALYZE_BATCH_MAX_FILES} files can be analyzed at once"
+        )
+    ai_service = AIAnalysisService()
+
+    # Read everything up front: the uploads are closed once streaming starts
+    contents = [await file.read() for file in files]
+    hashes = await asyncio.gather(*(content_hash(content) for content in contents))
+    groups: Dict[str, List[int]] = {}
+    for i, file_hash in enumerate(hashes):
+        groups.setdefault(file_hash, []).append(i)
+
+    async def analyze(indexes: List[int]) -> List[Dict]:
+        first = indexes[0]
+        try:
+            outcome = {
+                "status": "success",
+                "result": await ai_service.analyze(
+                    contents[first],
+                    files[first].content_type or "application/octet-stream",
+                    summary=summary
+                )
+            }
+        except AIServiceError as e:
+            outcome = {
+                "status": "failed",
+                "status_code": AI_ERROR_STATUS.get(e.error_type, 500),
+                "error": e.message,
+                "retry_after": e.retry_after
+            }
+        except Exception as e:
+            logger.error(f"Error analyzing {files[first].filename}: {str(e)}", exc_info=True)
+            outcome = {"status": "failed", "status_code": 500, "error": str(e)}
+        return [
+            {
+                "index": i,
+                "file_name": files[i].filename,
+                "duplicate_of": first if i != first else None,
+                **outcome
+            }
+            for i in indexes
+        ]
+
+    async def stream():
+        tasks = [asyncio.create_task(analyze(indexes)) for indexes in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for line in await next_done:
+                    yield json.dumps(jsonable_encoder(line)) + "\n"
+        finally:
+            # The client went away: don't spend API calls nobody will read
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+from app.services.events import ChangeEvent, get_event_bus
+
+router = APIRouter()
+event_bus = get_event_bus()
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+@router.get("/stream")
+async def stream_events(request: Request, owner_id: str):
+    """
+    Server-sent events for an owner's documents and shares.
+
+    Each event is a JSON object with collection, operation and
+    document_id, so clients can refetch instead of polling.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+
+    def forward(event: ChangeEvent) -> None:
+        # Deletes carry no document, so their owner is unknown
+        if event.document is None or event.document.get("owner_id") != owner_id:
+            return
+        if not queue.full():
+            queue.put_nowait({
+                "collection": event.collection,
+                "operation": event.operation,
+                "document_id": event.document_id
+            })
+
+    async def generate():
+        for collection in ("documents", "shares"):
+            event_bus.subscribe(collection, forward)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['collection']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            for collection in ("documents", "shares"):
+                event_bus.unsubscribe(collection, forward)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
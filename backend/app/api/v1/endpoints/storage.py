@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Query
+from typing import Dict, List, Optional
+from app.services.storage.inventory import get_storage_inventory
+from app.services.storage.key_filter import get_storage_key_filter
+
+router = APIRouter()
+inventory = get_storage_inventory()
+key_filter = get_storage_key_filter()
+
+@router.get("/browse")
+async def browse(
+    prefix: str = "",
+    delimiter: str = "/",
+    start_after: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000)
+) -> Dict:
+    """List folders and files under a prefix from the storage inventory"""
+    return await inventory.browse(prefix, delimiter=delimiter, start_after=start_after, limit=limit)
+
+@router.get("/usage")
+async def usage(owner_id: Optional[str] = None) -> List[Dict]:
+    """Objects and bytes stored per owner"""
+    return await inventory.usage(owner_id)
+
+@router.get("/orphans")
+async def orphans(
+    owner_id: Optional[str] = None,
+    limit: int = Query(default=1000, ge=1, le=10000)
+) -> Dict:
+    """Documents without a stored object, and stored objects without a document"""
+    missing = await inventory.missing_objects(owner_id)
+    return {
+        "missing_objects": [
+            {"document_id": str(doc.id), "owner_id": doc.owner_id, "s3_key": doc.s3_key}
+            for doc in missing[:limit]
+        ],
+        "unreferenced_objects": await inventory.unreferenced_objects(owner_id, limit=limit)
+    }
+
+@router.post("/refresh")
+async def refresh(full: bool = False) -> Dict:
+    """Run one incremental inventory step, or refresh every due shard"""
+    if full:
+        return await inventory.refresh_all()
+    return await inventory.refresh_step() or {"listed": 0, "completed": True}
+
+@router.get("/key-filter")
+async def key_filter_metrics() -> Dict:
+    """Key filter lookups, definite misses and false-positive rate"""
+    return key_filter.metrics()
@@ -1,18 +1,29 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from typing import List
+from pydantic import BaseModel
 from app.models.tag import Tag
 from app.services.config import ConfigService
 
 router = APIRouter()
 config_service = ConfigService()
 
+class RenameRequest(BaseModel):
+    new_name: str
+
 @router.get("/", response_model=List[Tag])
-async def get_tags():
-    """Get all tags"""
+async def get_tags(request: Request, response: Response):
+    """Get all tags (supports If-None-Match revalidation)"""
     try:
-        return await config_service.get_tags()
+        tags = await config_service.get_tags()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    etag = config_service.catalog.etag("tags")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return tags
 
 @router.post("/", response_model=Tag)
 async def create_tag(tag: Tag):
@@ -29,4 +40,12 @@ async def delete_tag(name: str):
         await config_service.delete_tag(name)
         return {"message": f"Tag {name} deleted successfully"}
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=str(e)) 
+
+@router.post("/{name}/rename")
+async def rename_tag(name: str, request: RenameRequest):
+    """Rename a tag and rewrite every document that uses it"""
+    try:
+        return await config_service.rename_tag(name, request.new_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,4 +1,4 @@
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 import os
@@ -28,6 +28,23 @@ class Settings(BaseSettings):
     MONGODB_DB_NAME: str = "simpledms"
     ENVIRONMENT: str = "development"
     
+    # MongoDB connection pool settings
+    MONGODB_MIN_POOL_SIZE: int = 5
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 2000  # Fail instead of queueing forever on an exhausted pool
+    MONGODB_COMPRESSORS: str = "zstd,snappy,zlib"  # Preference order; missing libraries are skipped
+    
+    # Read preference per read workload (writes always go to the primary).
+    # Modes: primary, primaryPreferred, secondary, secondaryPreferred, nearest
+    MONGODB_READ_PREFERENCES: Dict[str, str] = {
+        "listing": "secondaryPreferred",
+        "stats": "secondaryPreferred",
+        "facets": "secondaryPreferred",
+        "search": "secondaryPreferred",
+        "training": "secondaryPreferred"
+    }
+    MONGODB_MAX_STALENESS_SECONDS: int = 90  # Bound on secondary lag (90 is MongoDB's minimum)
+    
     # Storage Provider settings
     STORAGE_PROVIDER: str = "b2"
     
@@ -60,7 +77,92 @@ class Settings(BaseSettings):
     
     # AI settings
     ANTHROPIC_API_KEY: Optional[str] = None
-    
+
+    # Upload settings
+    UPLOAD_CONCURRENCY: int = 8  # Parallel storage uploads per batch request
+
+    # Storage inventory settings
+    STORAGE_INVENTORY_ROOT: str = "documents/"  # Each folder below this is one shard
+    STORAGE_INVENTORY_INTERVAL: float = 300.0  # Seconds between incremental refresh steps
+    STORAGE_INVENTORY_PAGES: int = 10  # Listing pages (1000 keys each) per step
+    STORAGE_INVENTORY_LEASE_SECONDS: int = 300  # A worker's hold on the shard it lists, renewed per page
+    STORAGE_ORPHAN_GRACE_SECONDS: int = 3600  # Ignore objects younger than this (uploads in flight)
+
+    # Storage key filter settings
+    STORAGE_KEY_FILTER_ERROR_RATE: float = 0.01  # Target Bloom filter false-positive rate
+    STORAGE_KEY_FILTER_REBUILD_INTERVAL: float = 3600.0  # Seconds between rebuilds from a listing
+
+    # Change event bus settings
+    EVENT_BUS_CONSUMER: str = ""  # Resume token owner; defaults to hostname:worker slot
+    EVENT_BUS_SLOT_PATH: str = "data/event_bus"  # Lock files handing out worker slots
+    EVENT_BUS_POLL_INTERVAL: float = 2.0  # Seconds between polls without change streams
+    EVENT_BUS_POLL_LAG: float = 10.0  # Seconds of updates re-read per poll, for late commits
+    EVENT_BUS_TOKEN_SAVE_INTERVAL: float = 5.0  # Seconds between resume token writes
+
+    # Document content settings
+    CONTENT_INLINE_MAX_BYTES: int = 4 * 1024 * 1024  # Larger compressed texts go to GridFS
+    CONTENT_COMPRESSION_LEVEL: int = 6  # zlib level
+
+    # Text extraction settings
+    EXTRACTION_WORKERS: int = 0  # Worker processes; 0 means one per CPU
+    EXTRACTION_TIMEOUT: float = 60.0  # Seconds per file before its worker is killed
+    EXTRACTION_MEMORY_LIMIT_MB: int = 1024  # Address-space cap per worker (0 for none)
+    ANALYSIS_MAX_PAGES: int = 20  # Pages read for AI analysis (first, middle and last when sampled)
+
+    # AI analysis cache settings
+    ANALYSIS_CACHE_TTL_DAYS: int = 30  # Re-analyze files after this long
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 100000  # Least recently used entries are evicted beyond this
+
+    # Background AI enrichment settings
+    ENRICHMENT_WORKERS: int = 4  # Concurrent jobs per process
+    ENRICHMENT_POLL_INTERVAL: float = 5.0  # Seconds between queue polls when idle
+    ENRICHMENT_LEASE_SECONDS: float = 600.0  # A running job is reclaimed after this long
+    ENRICHMENT_MAX_ATTEMPTS: int = 5  # Then the job is dead-lettered
+    ENRICHMENT_RETRY_BASE_SECONDS: float = 30.0  # First retry delay, doubled per attempt
+    ENRICHMENT_RETRY_MAX_SECONDS: float = 3600.0
+
+    # LLM rate limiting (shared by all workers through MongoDB)
+    LLM_REQUESTS_PER_MINUTE: int = 50
+    LLM_TOKENS_PER_MINUTE: int = 40000  # Input plus output tokens
+    LLM_MAX_CONCURRENCY: int = 4  # In-flight requests per process
+    LLM_QUEUE_TIMEOUT: float = 30.0  # Seconds a request may wait for capacity
+    LLM_MAX_RETRIES: int = 3  # On 429/529, after the server's retry-after
+    ANALYZE_BATCH_MAX_FILES: int = 50  # Files per batch analyze request
+
+    # Local category/tag classifier (answers instead of the LLM when confident)
+    CLASSIFIER_ENABLED: bool = True
+    CLASSIFIER_FEATURES: int = 65536  # Hashed word buckets
+    CLASSIFIER_MAX_TAGS: int = 100  # Most used tags learned; all categories are
+    CLASSIFIER_MIN_CONFIDENCE: float = 0.9  # Top category probability needed to answer
+    CLASSIFIER_MIN_EXAMPLES: int = 200  # Documents learned before the model answers at all
+    CLASSIFIER_LEARNING_RATE: float = 0.5
+    CLASSIFIER_TRAIN_INTERVAL: float = 300.0  # Seconds between training passes
+    CLASSIFIER_TRAIN_BATCH_SIZE: int = 256  # Documents per SGD step
+    CLASSIFIER_TRAIN_LIMIT: int = 5000  # Documents per training pass
+
+    # Near-duplicate detection
+    SIMILARITY_THRESHOLD: float = 0.8  # Estimated Jaccard similarity of word shingles
+    SIMILARITY_MAX_CANDIDATES: int = 200  # LSH candidates compared per lookup
+
+    # Related documents vector index (local to each process)
+    VECTOR_INDEX_PATH: str = "data/vector_index"
+    VECTOR_DIMENSIONS: int = 128  # Changing it rebuilds the index (after a content backfill)
+    VECTOR_INDEX_SYNC_INTERVAL: float = 10.0  # Seconds between syncs of new embeddings
+    VECTOR_INDEX_COMPACT_RATIO: float = 0.2  # Compact once this share of rows is dead
+    VECTOR_INDEX_FULL_SCAN_RATIO: float = 0.5  # Owner share above which the whole matrix is scanned
+
+    # Deleted document purge settings
+    PURGE_INTERVAL: float = 10.0  # Seconds between passes when nothing woke the purger
+    PURGE_BATCH_SIZE: int = 100  # Tombstones per pass
+    PURGE_RETRY_BASE_SECONDS: float = 30.0  # First retry delay after a failed file delete
+    PURGE_RETRY_MAX_SECONDS: float = 6 * 3600.0  # Cap for the doubling retry delay
+
+    # Search settings
+    SEARCH_MAX_CONTENT_CHARS: int = 100000  # Extracted text indexed per document
+
+    # Autocomplete settings
+    AUTOCOMPLETE_REFRESH_INTERVAL: float = 30.0  # Seconds between retries of a rebuild after a resync or failure
+
     class Config:
         env_file = ROOT_DIR / ".env"
         case_sensitive = True
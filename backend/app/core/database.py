@@ -1,16 +1,178 @@
+import importlib.util
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred
+)
 from beanie import init_beanie
 from .config import get_settings
 from ..models.document import Document
 from ..models.category import Category
 from ..models.tag import Tag
+from ..models.search import SearchEntry
+from ..models.storage_object import StorageObject
+from ..models.content import DocumentContent
+from ..models.analysis import AnalysisCacheEntry, AnalysisJob
+
+logger = logging.getLogger(__name__)
+
+# Python modules pymongo needs for each wire compressor
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+READ_PREFERENCE_MODES = {
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "primaryPreferred": PrimaryPreferred,
+    "nearest": Nearest
+}
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener that measures how long checkouts wait.
+
+    Motor runs each operation in a worker thread, and a checkout's
+    "started" and "checked out" events fire on the same thread, so the
+    start time is kept in a thread-local.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.checkouts = 0
+        self.failed_checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.connections = 0
+
+    def _record_wait(self) -> Optional[float]:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        if started is None:
+            return None
+        wait = time.perf_counter() - started
+        with self._lock:
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._recent.append(wait)
+        return wait
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._record_wait()
+        with self._lock:
+            self.checkouts += 1
+
+    def connection_check_out_failed(self, event):
+        self._record_wait()
+        with self._lock:
+            self.failed_checkouts += 1
+        logger.warning(f"MongoDB connection checkout failed ({event.reason}) on {event.address}")
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections -= 1
+
+    # Events the metrics don't need (the listener must implement them all)
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    def snapshot(self) -> Dict:
+        """Checkout counts and wait times in milliseconds"""
+        with self._lock:
+            recent = sorted(self._recent)
+            attempts = self.checkouts + self.failed_checkouts
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 3)
+
+        return {
+            "checkouts": self.checkouts,
+            "failed_checkouts": self.failed_checkouts,
+            "open_connections": self.connections,
+            "wait_ms_avg": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+            "wait_ms_p50": percentile(0.5),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_p99": percentile(0.99),
+            "wait_ms_max": round(self.max_wait * 1000, 3)
+        }
+
+pool_metrics = PoolMetrics()
+
+def _available_compressors(names: str) -> list:
+    compressors = []
+    for name in (n.strip() for n in names.split(",")):
+        module = COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module):
+            compressors.append(name)
+        elif name:
+            logger.debug(f"Skipping MongoDB compressor {name}: {module or 'unknown'} not installed")
+    return compressors
+
+def create_client() -> AsyncIOMotorClient:
+    """Create the Motor client with the configured pool, compression and metrics"""
+    settings = get_settings()
+    options = {
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "event_listeners": [pool_metrics]
+    }
+    compressors = _available_compressors(settings.MONGODB_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return AsyncIOMotorClient(settings.MONGODB_URL, **options)
+
+def read_preference(workload: str):
+    """Read preference for a read workload (primary unless configured)"""
+    settings = get_settings()
+    mode = settings.MONGODB_READ_PREFERENCES.get(workload, "primary")
+    if mode not in READ_PREFERENCE_MODES:
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=settings.MONGODB_MAX_STALENESS_SECONDS)
+
+def read_collection(model, workload: str):
+    """A model's Motor collection that reads with the workload's preference"""
+    return model.get_motor_collection().with_options(read_preference=read_preference(workload))
 
 async def init_db():
     """Initialize database connection"""
     settings = get_settings()
     
     # Create Motor client
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    client = create_client()
     
     # Initialize beanie with the document models
     await init_beanie(
@@ -18,7 +180,12 @@ async def init_db():
         document_models=[
             Document,
             Category,
-            Tag
+            Tag,
+            SearchEntry,
+            StorageObject,
+            DocumentContent,
+            AnalysisCacheEntry,
+            AnalysisJob
         ]
     )
     
@@ -36,4 +203,4 @@ async def init_db():
             except Exception:
                 pass  # Skip if category already exists
     
-    return client 
\ No newline at end of file
+    return client
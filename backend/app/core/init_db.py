@@ -1,10 +1,15 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from .config import settings
+from .database import create_client
+from .migrations import run_migrations
 from ..models.document import Document
 from ..models.category import Category
 from ..models.tag import Tag
 from ..models.share import Share
+from ..models.search import SearchEntry
+from ..models.storage_object import StorageObject
+from ..models.content import DocumentContent
+from ..models.analysis import AnalysisCacheEntry, AnalysisJob
 
 async def create_default_categories():
     """Create default categories if none exist"""
@@ -23,10 +28,14 @@ async def create_default_categories():
 
 async def init_db():
     """Initialize database connection and Beanie ODM"""
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    client = create_client()
+    await run_migrations(client[settings.MONGODB_DB_NAME])
     await init_beanie(
         database=client[settings.MONGODB_DB_NAME],
-        document_models=[Document, Category, Tag, Share]
+        document_models=[
+            Document, Category, Tag, Share, SearchEntry,
+            StorageObject, DocumentContent, AnalysisCacheEntry, AnalysisJob
+        ]
     )
     
     # Create default categories
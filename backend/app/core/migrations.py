@@ -0,0 +1,36 @@
+import logging
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+async def migrate_share_ttl_index(database) -> None:
+    """
+    Turn the plain expires_at index on shares into a TTL index.
+
+    Older deployments have a regular expires_at_1 index; creating the TTL
+    index with the same key would fail with an options conflict, so this
+    must run before init_beanie. collMod converts the index in place
+    (MongoDB 5.1+); older servers get it dropped and rebuilt.
+    """
+    shares = database["shares"]
+    async for index in shares.list_indexes():
+        if dict(index["key"]) != {"expires_at": 1}:
+            continue
+        if index.get("expireAfterSeconds") == 0:
+            return
+
+        logger.info(f"Converting shares index {index['name']} to a TTL index")
+        try:
+            await database.command({
+                "collMod": "shares",
+                "index": {"name": index["name"], "expireAfterSeconds": 0}
+            })
+        except OperationFailure as e:
+            logger.info(f"collMod not supported ({str(e)}), rebuilding the index")
+            await shares.drop_index(index["name"])
+            await shares.create_index("expires_at", name="expires_at_1", expireAfterSeconds=0)
+        return
+
+async def run_migrations(database) -> None:
+    """Apply schema/index migrations that init_beanie can't do by itself"""
+    await migrate_share_ttl_index(database)
@@ -2,27 +2,16 @@ import asyncio
 import logging
 from datetime import datetime, timezone
 from typing import Optional
-from ..services.share import ShareService
 from ..services.document import DocumentService
 
 logger = logging.getLogger(__name__)
 
 class BackgroundTasks:
     def __init__(self):
-        self.share_service = ShareService()
         self.document_service = DocumentService()
         self.cleanup_task = None
         self.running = False
     
-    async def cleanup_expired_shares(self):
-        """Clean up expired share links"""
-        try:
-            count = await self.share_service.cleanup_expired_shares()
-            if count > 0:
-                logger.info(f"Cleaned up {count} expired shares")
-        except Exception as e:
-            logger.error(f"Error cleaning up expired shares: {str(e)}")
-
     async def cleanup_orphaned_documents(self):
         """Clean up documents without B2 files"""
         try:
@@ -35,7 +24,6 @@ class BackgroundTasks:
     async def cleanup_loop(self):
         """Main cleanup loop"""
         while self.running:
-            await self.cleanup_expired_shares()
             await self.cleanup_orphaned_documents()
             await asyncio.sleep(3600)  # Run every hour
     
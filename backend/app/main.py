@@ -1,18 +1,35 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 from beanie import init_beanie
 import logging
 
 from .core.config import get_settings
-from .core.database import init_db
+from .core.database import init_db, pool_metrics
+from .core.migrations import run_migrations
 from .core.tasks import BackgroundTasks
-from .api.v1.endpoints import documents, config, categories, tags, shares
+from .api.v1.endpoints import documents, config, categories, tags, shares, autocomplete, storage, events
 from .models.share import Share
 from .models.document import Document
 from .models.category import Category
 from .models.tag import Tag
+from .models.search import SearchEntry
+from .models.storage_object import StorageObject
+from .models.content import DocumentContent
+from .models.analysis import AnalysisCacheEntry, AnalysisJob
+from .services.search.service import get_search_service
+from .services.autocomplete import get_autocomplete_service
+from .services.catalog import get_catalog_cache
+from .services.events import get_event_bus
+from .services.purge import get_document_purger
+from .services.analysis_cache import get_analysis_cache
+from .services.extraction import get_extraction_service
+from .services.enrichment import get_enrichment_queue
+from .services.rate_limit import get_llm_rate_limiter
+from .services.classifier import get_local_classifier
+from .services.vector_index import get_related_documents_service
+from .services.storage.inventory import get_storage_inventory
+from .services.storage.key_filter import get_storage_key_filter
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -44,10 +61,16 @@ async def startup_event():
     # Initialize MongoDB connection
     app.state.db_client = await init_db()
     
+    database = app.state.db_client[get_settings().MONGODB_DB_NAME]
+    await run_migrations(database)
+    
     # Initialize Beanie ODM with all models
     await init_beanie(
-        database=app.state.db_client[get_settings().MONGODB_DB_NAME],
-        document_models=[Document, Category, Tag, Share]
+        database=database,
+        document_models=[
+            Document, Category, Tag, Share, SearchEntry,
+            StorageObject, DocumentContent, AnalysisCacheEntry, AnalysisJob
+        ]
     )
     
     # Clean up any existing shares that might have old schema
@@ -58,8 +81,35 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Error cleaning up old shares: {str(e)}")
     
+    # Load the full-text search index
+    try:
+        await get_search_service().start()
+    except Exception as e:
+        logger.error(f"Error loading search index: {str(e)}")
+    
+    # Build the autocomplete prefix indexes
+    try:
+        await get_autocomplete_service().start()
+    except Exception as e:
+        logger.error(f"Error loading autocomplete index: {str(e)}")
+    
+    # Seed the storage key filter (rebuilt from storage in the background)
+    try:
+        await get_storage_key_filter().start()
+    except Exception as e:
+        logger.error(f"Error starting storage key filter: {str(e)}")
+    
     # Start background tasks
+    await get_catalog_cache().start()
+    await get_storage_inventory().start()
+    await get_document_purger().start()
+    await get_enrichment_queue().start()
+    await get_local_classifier().start()
+    await get_related_documents_service().start()
     await background_tasks.start_cleanup_task()
+    
+    # Start the change feed last, once every subscriber is registered
+    await get_event_bus().start()
 
 # Include API routes after database initialization
 app.include_router(
@@ -92,11 +142,41 @@ app.include_router(
     tags=["shares"]
 )
 
+app.include_router(
+    autocomplete.router,
+    prefix=f"{settings.API_V1_STR}/autocomplete",
+    tags=["autocomplete"]
+)
+
+app.include_router(
+    storage.router,
+    prefix=f"{settings.API_V1_STR}/storage",
+    tags=["storage"]
+)
+
+app.include_router(
+    events.router,
+    prefix=f"{settings.API_V1_STR}/events",
+    tags=["events"]
+)
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database connection and stop background tasks"""
+    # Stop the change feed first so it can save its resume token
+    await get_event_bus().stop()
+    await get_document_purger().stop()
+    await get_enrichment_queue().stop()
+    await get_local_classifier().stop()
+    await get_related_documents_service().stop()
+    get_extraction_service().shutdown()
     if hasattr(app.state, "db_client"):
         app.state.db_client.close()
+    await get_catalog_cache().stop()
+    await get_search_service().stop()
+    await get_autocomplete_service().stop()
+    await get_storage_inventory().stop()
+    await get_storage_key_filter().stop()
     await background_tasks.stop_cleanup_task()
 
 @app.get("/health")
@@ -122,6 +202,28 @@ async def health_check():
             }
         )
 
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics: MongoDB pool, storage key filter, change feed, caches and purger"""
+    return {
+        "mongodb_pool": pool_metrics.snapshot(),
+        "storage_key_filter": get_storage_key_filter().metrics(),
+        "event_bus": get_event_bus().metrics(),
+        "analysis_cache": get_analysis_cache().metrics(),
+        "extraction": get_extraction_service().metrics(),
+        "llm_rate_limiter": get_llm_rate_limiter().metrics(),
+        "classifier": get_local_classifier().metrics(),
+        "vector_index": get_related_documents_service().metrics(),
+        "enrichment": {
+            **get_enrichment_queue().metrics(),
+            "jobs": await get_enrichment_queue().queue_depth()
+        },
+        "purger": {
+            **get_document_purger().metrics(),
+            "pending": await get_document_purger().pending()
+        }
+    }
+
 @app.get("/")
 async def root():
     return {
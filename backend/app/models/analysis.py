@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from .base import BaseDocument
+
+class AnalysisCacheEntry(BaseDocument):
+    """Cached AI analysis of one file content, for one model and prompt version"""
+    content_hash: str  # SHA-256 of the file bytes
+    model: str
+    prompt_version: int
+    summary: str
+    categories: List[str] = Field(default_factory=list)
+    tags: List[str] = Field(default_factory=list)
+    hits: int = 0
+    last_used_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime  # MongoDB removes the entry once this passes (TTL index)
+
+    class Settings:
+        name = "analysis_cache"
+        indexes = [
+            IndexModel(
+                [("content_hash", ASCENDING), ("model", ASCENDING), ("prompt_version", ASCENDING)],
+                name="analysis_key",
+                unique=True
+            ),
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_1", expireAfterSeconds=0),
+            IndexModel([("last_used_at", ASCENDING)], name="last_used")  # Eviction order
+        ]
+
+class AnalysisJob(BaseDocument):
+    """Background AI enrichment of one document (one job per document)"""
+    document_id: str
+    owner_id: str
+    status: str = "queued"  # queued, running, done, dead (gave up) or cancelled
+    attempts: int = 0
+    run_after: datetime = Field(default_factory=datetime.utcnow)  # Not claimed before this (retry backoff)
+    locked_by: Optional[str] = None  # Worker running the job
+    locked_until: Optional[datetime] = None  # Lease; an expired lease means the worker died
+    error: Optional[str] = None  # Last failure
+    result: Optional[Dict] = None  # summary, categories, tags
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "analysis_jobs"
+        indexes = [
+            IndexModel([("document_id", ASCENDING)], name="document_unique", unique=True),
+            IndexModel([("status", ASCENDING), ("run_after", ASCENDING)], name="status_run_after"),
+            IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="status_lease")
+        ]
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import List, Optional
+from beanie import PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from .base import BaseDocument
+
+class DocumentContent(BaseDocument):
+    """
+    Heavy per-document data, kept out of the hot documents collection.
+
+    Text and per-page data are stored zlib-compressed. Texts too large to
+    inline go to GridFS and only the file id is kept here.
+    """
+    document_id: str
+    owner_id: str
+    text: Optional[bytes] = None  # Compressed extracted text (inline)
+    text_file_id: Optional[PydanticObjectId] = None  # GridFS file with the compressed text
+    text_length: int = 0  # Characters before compression
+    compressed_size: int = 0
+    summary: Optional[str] = None  # AI-generated summary
+    pages: Optional[bytes] = None  # Compressed JSON list of per-page data
+    extracted_at: datetime = Field(default_factory=datetime.utcnow)
+    # Near-duplicate detection (see services/similarity.py)
+    minhash: Optional[bytes] = None  # MinHash signature of the text (uint32 array)
+    lsh_bands: List[int] = Field(default_factory=list)  # One key per LSH band
+    # Related documents (see services/vector_index.py)
+    embedding: Optional[bytes] = None  # Hashed n-gram embedding (float32 array)
+    embedded_at: Optional[datetime] = None  # Sync watermark of the vector indexes
+
+    class Settings:
+        name = "document_content"
+        indexes = [
+            IndexModel([("document_id", ASCENDING)], name="document_unique", unique=True),
+            "owner_id",
+            IndexModel([("owner_id", ASCENDING), ("lsh_bands", ASCENDING)], name="owner_lsh_bands"),
+            "embedded_at"
+        ]
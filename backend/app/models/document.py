@@ -1,9 +1,14 @@
 from typing import Optional, List
 from beanie import Document
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from pydantic import Field, ConfigDict
 from datetime import datetime
 from .base import BaseDocument
 
+# Query clause for documents that are not tombstoned (also matches
+# documents stored before the field existed)
+LIVE = {"deleted_at": None}
+
 class Document(BaseDocument):
     """Document model for storing file metadata"""
     
@@ -18,6 +23,13 @@ class Document(BaseDocument):
     owner_id: str = Field(index=True)  # Reference to user ID
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    revision: int = 0  # Bumped by every metadata update (optimistic concurrency)
+    # Tombstone: a deleted document stays hidden until the purger removes
+    # its file, shares and metadata (see services/purge.py)
+    deleted_at: Optional[datetime] = None
+    purge_attempts: int = 0
+    purge_after: Optional[datetime] = None  # Retry backoff after a failed purge
+    purge_error: Optional[str] = None
     
     class Settings:
         name = "documents"
@@ -25,7 +37,38 @@ class Document(BaseDocument):
             "title",
             "owner_id",
             "categories",
-            "tags"
+            "tags",
+            "s3_key",  # Joined against the storage inventory
+            # Compound indexes for filter expressions (see services/filters.py).
+            # A compound index may hold only one array field, so tags and
+            # categories each get their own.
+            IndexModel(
+                [("owner_id", ASCENDING), ("tags", ASCENDING), ("created_at", DESCENDING)],
+                name="owner_tags_created"
+            ),
+            IndexModel(
+                [("owner_id", ASCENDING), ("categories", ASCENDING), ("created_at", DESCENDING)],
+                name="owner_categories_created"
+            ),
+            IndexModel(
+                [("owner_id", ASCENDING), ("created_at", DESCENDING)],
+                name="owner_created"
+            ),
+            IndexModel(
+                [("owner_id", ASCENDING), ("file_size", ASCENDING)],
+                name="owner_size"
+            ),
+            # Change polling and classifier training read in (updated_at, _id) order
+            IndexModel(
+                [("updated_at", ASCENDING), ("_id", ASCENDING)],
+                name="updated"
+            ),
+            # Only tombstones are indexed, so the purger's scan stays small
+            IndexModel(
+                [("purge_after", ASCENDING)],
+                name="tombstones",
+                partialFilterExpression={"deleted_at": {"$type": "date"}}
+            )
         ]
     
     model_config = ConfigDict(
@@ -0,0 +1,31 @@
+from typing import Dict, List
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
+from .base import BaseDocument
+
+class SearchEntry(BaseDocument):
+    """Persisted search index entry (term frequencies) for one document"""
+    document_id: str = Field(index=True)
+    owner_id: str = Field(index=True)
+    terms: Dict[str, int] = Field(default_factory=dict)
+    length: int = 0
+    categories: List[str] = Field(default_factory=list)
+    tags: List[str] = Field(default_factory=list)
+
+    class Settings:
+        name = "search_index"
+        indexes = [
+            "document_id",
+            "owner_id",
+            # Other workers poll for saved entries in this order (see services/events.py)
+            IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated")
+        ]
+
+class SearchEntryTerms(BaseModel):
+    """Projection of SearchEntry used to rebuild the in-memory index"""
+    document_id: str
+    owner_id: str
+    terms: Dict[str, int]
+    length: int
+    categories: List[str]
+    tags: List[str]
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 from bson import ObjectId
 from pydantic import Field, ConfigDict, field_validator
+from pymongo import IndexModel, ASCENDING
 from .base import BaseDocument
 
 class Share(BaseDocument):
@@ -9,7 +10,7 @@ class Share(BaseDocument):
     owner_id: str = Field(index=True)
     short_url: str
     long_url: str
-    expires_at: datetime = Field(index=True)
+    expires_at: datetime  # MongoDB removes the share once this passes (TTL index)
     
     model_config = ConfigDict(
         arbitrary_types_allowed=True,
@@ -32,5 +33,13 @@ class Share(BaseDocument):
         indexes = [
             "document_id",
             "owner_id",
-            "expires_at"
+            # TTL index: expireAfterSeconds=0 deletes each share at expires_at.
+            # Keeps the name of the old plain index (see core/migrations.py).
+            IndexModel(
+                [("expires_at", ASCENDING)],
+                name="expires_at_1",
+                expireAfterSeconds=0
+            ),
+            # Change polling reads shares in (updated_at, _id) order
+            IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated")
         ] 
\ No newline at end of file
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from .base import BaseDocument
+
+class StorageObject(BaseDocument):
+    """Inventory entry for one object in the storage bucket"""
+    key: str
+    shard: str  # Listing prefix the object was found under
+    owner_id: Optional[str] = None  # Parsed from documents/{owner_id}/...
+    size: int = 0
+    modified: Optional[datetime] = None
+    seen_at: datetime = Field(default_factory=datetime.utcnow)  # Last listing (or upload) that saw it
+
+    class Settings:
+        name = "storage_inventory"
+        indexes = [
+            IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+            IndexModel([("shard", ASCENDING), ("seen_at", ASCENDING)], name="shard_seen"),
+            IndexModel([("owner_id", ASCENDING)], name="owner")
+        ]
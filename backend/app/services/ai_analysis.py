@@ -1,11 +1,12 @@
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from anthropic import AsyncAnthropic, APIError, APIStatusError, RateLimitError, AuthenticationError
+import httpx
 from ..core.config import settings
-import PyPDF2
-import io
-import mimetypes
-from docx.api import Document
-from pptx import Presentation
+from .analysis_cache import content_hash, get_analysis_cache
+from .classifier import get_local_classifier
+from .extraction import get_extraction_service
+from .rate_limit import RateLimitExceeded, get_llm_rate_limiter
 import json
 import logging
 
@@ -13,21 +14,75 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MODEL = "claude-3-sonnet-20240229"
+
+# Bump whenever SYSTEM_PROMPT or the text preparation changes, so cached
+# results from the old prompt are not served
+PROMPT_VERSION = 2
+
+# Claude can handle more tokens than GPT-3.5
+MAX_PROMPT_CHARS = 10000
+
+MAX_OUTPUT_TOKENS = 1000
+
+# Statuses worth retrying after the server's retry-after: rate limited, overloaded
+RETRYABLE_STATUSES = {429, 529}
+
+SYSTEM_PROMPT = """You are a document analysis assistant. Your task is to analyze documents and provide:
+1. A brief summary (2-3 sentences)
+2. Suggested categories (choose from: Invoice, Contract, Report, Other)
+3. Relevant tags (3-5 keywords)
+
+Always respond in valid JSON format with the following structure:
+{
+    "summary": "brief summary here",
+    "categories": ["category1", "category2"],
+    "tags": ["tag1", "tag2", "tag3"]
+}"""
+
 class AIServiceError(Exception):
     """Base class for AI service errors"""
-    def __init__(self, message: str, error_type: str):
+    def __init__(self, message: str, error_type: str, retry_after: Optional[float] = None):
         self.message = message
         self.error_type = error_type
+        self.retry_after = retry_after
         super().__init__(self.message)
         # Log error details
         logger.error(f"AIServiceError: {error_type} - {message}")
 
+@lru_cache()
+def get_anthropic_client() -> AsyncAnthropic:
+    """
+    Shared Anthropic client, so every request reuses one connection pool.
+
+    The SDK's own retries are off: they don't know about the other
+    workers, so retries go through the rate limiter instead.
+    """
+    limits = httpx.Limits(
+        max_connections=settings.LLM_MAX_CONCURRENCY,
+        max_keepalive_connections=settings.LLM_MAX_CONCURRENCY
+    )
+    return AsyncAnthropic(
+        api_key=settings.ANTHROPIC_API_KEY,
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0, connect=10.0))
+    )
+
+def _retry_after(error: APIStatusError) -> Optional[float]:
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
 class AIAnalysisService:
     def __init__(self):
         self.api_key = settings.ANTHROPIC_API_KEY
         self.is_available = bool(self.api_key)
+        self.cache = get_analysis_cache()
+        self.limiter = get_llm_rate_limiter()
+        self.classifier = get_local_classifier()
         if self.is_available:
-            self.client = AsyncAnthropic(api_key=self.api_key)
+            self.client = get_anthropic_client()
             logger.info("AIAnalysisService initialized successfully")
         else:
             logger.warning("AIAnalysisService initialized without API key")
@@ -41,67 +96,75 @@ class AIAnalysisService:
                 "configuration_error"
             )
     
-    def _extract_text_from_pptx(self, file_content: bytes) -> str:
-        """Extract text from PowerPoint file"""
-        prs = Presentation(io.BytesIO(file_content))
-        text_parts = []
-        
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text_parts.append(shape.text)
-        
-        text = "\n".join(filter(None, text_parts))  # Filter out empty strings
-        logger.info(f"Successfully extracted {len(text)} characters from PowerPoint")
-        return text
-    
     async def extract_text(self, file_content: bytes, mime_type: str) -> str:
-        """Extract text content from various file types"""
-        try:
-            logger.info(f"Extracting text from file with mime type: {mime_type}")
-            if mime_type == "application/pdf":
-                # Handle PDF files
-                pdf_file = io.BytesIO(file_content)
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                logger.info(f"Successfully extracted {len(text)} characters from PDF")
-                return text
-            
-            elif mime_type in ["application/msword", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]:
-                # Handle Word documents
-                doc = Document(io.BytesIO(file_content))
-                text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-                logger.info(f"Successfully extracted {len(text)} characters from Word document")
-                return text
-            
-            elif mime_type == "application/vnd.openxmlformats-officedocument.presentationml.presentation":
-                # Handle PowerPoint documents
-                return self._extract_text_from_pptx(file_content)
-            
-            elif mime_type.startswith("text/"):
-                # Handle text files
-                text = file_content.decode('utf-8')
-                logger.info(f"Successfully extracted {len(text)} characters from text file")
-                return text
-            
-            else:
-                supported_types = [
-                    "application/pdf",
-                    "application/msword",
-                    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                    "text/*"
-                ]
-                logger.error(f"Unsupported file type: {mime_type}. Supported types: {supported_types}")
-                raise ValueError(f"Unsupported file type: {mime_type}. Supported types are: PDF, Word, PowerPoint, and text files.")
-        
-        except Exception as e:
-            logger.error(f"Error extracting text: {str(e)}", exc_info=True)
-            raise ValueError(f"Error extracting text: {str(e)}")
+        """Extract text content from various file types (in the extraction worker pool)"""
+        logger.info(f"Extracting text from file with mime type: {mime_type}")
+        result = await get_extraction_service().extract(file_content, mime_type)
+        return result["text"]
+
+    async def _create_message(self, user_prompt: str):
+        """
+        Send one request through the rate limiter.
+
+        At most LLM_MAX_CONCURRENCY requests run at once in this process,
+        and each first takes its estimated tokens from the shared bucket.
+        A 429 or 529 blocks the bucket for retry-after seconds for all
+        workers and the request queues again, up to LLM_MAX_RETRIES times.
+        """
+        # Roughly four characters per token, plus the whole output budget
+        estimated = (len(SYSTEM_PROMPT) + len(user_prompt)) // 4 + MAX_OUTPUT_TOKENS
+        async with self.limiter.semaphore:
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                await self.limiter.acquire(estimated)
+                try:
+                    response = await self.client.messages.create(
+                        model=MODEL,
+                        max_tokens=MAX_OUTPUT_TOKENS,
+                        temperature=0.3,
+                        system=SYSTEM_PROMPT,
+                        messages=[
+                            {"role": "user", "content": user_prompt}
+                        ]
+                    )
+                except APIStatusError as e:
+                    if e.status_code not in RETRYABLE_STATUSES or attempt == settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = _retry_after(e) or 2 ** attempt
+                    logger.warning(f"Anthropic API returned {e.status_code}, retrying in {delay}s")
+                    await self.limiter.block(delay)
+                    continue
+                await self.limiter.settle(
+                    estimated,
+                    response.usage.input_tokens + response.usage.output_tokens
+                )
+                return response
+
+    async def prompt_text(self, file_content: bytes, mime_type: str) -> str:
+        """The text a document is analyzed by"""
+        # Extract only what fits in the prompt (Claude has token limits),
+        # sampling the start, middle and end of long documents
+        extracted = await get_extraction_service().extract(
+            file_content,
+            mime_type,
+            max_chars=MAX_PROMPT_CHARS,
+            max_pages=settings.ANALYSIS_MAX_PAGES,
+            sample=True
+        )
+        text = extracted["text"]
+        if extracted["truncated"]:
+            logger.info(
+                f"Analyzing {len(text)} characters from {extracted['pages_extracted']} "
+                f"of {extracted['pages']} pages"
+            )
+            text += "..."
+        return text
 
-    async def analyze_document(self, file_content: bytes, mime_type: str) -> Tuple[str, List[str], List[str]]:
+    async def analyze_document(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        text: Optional[str] = None
+    ) -> Tuple[str, List[str], List[str]]:
         """
         Analyze document content and return:
         - Summary description
@@ -111,28 +174,9 @@ class AIAnalysisService:
         try:
             self._check_api_key()
             
-            # Extract text from document
-            text = await self.extract_text(file_content, mime_type)
+            if text is None:
+                text = await self.prompt_text(file_content, mime_type)
             
-            # Truncate text if too long (Claude has token limits)
-            max_chars = 10000  # Claude can handle more tokens than GPT-3.5
-            if len(text) > max_chars:
-                logger.warning(f"Text truncated from {len(text)} to {max_chars} characters")
-                text = text[:max_chars] + "..."
-            
-            # Create prompt for Claude
-            system_prompt = """You are a document analysis assistant. Your task is to analyze documents and provide:
-1. A brief summary (2-3 sentences)
-2. Suggested categories (choose from: Invoice, Contract, Report, Other)
-3. Relevant tags (3-5 keywords)
-
-Always respond in valid JSON format with the following structure:
-{
-    "summary": "brief summary here",
-    "categories": ["category1", "category2"],
-    "tags": ["tag1", "tag2", "tag3"]
-}"""
-
             user_prompt = f"""Please analyze this document:
 
 {text}"""
@@ -140,15 +184,7 @@ Always respond in valid JSON format with the following structure:
             try:
                 logger.info("Sending request to Anthropic API")
                 # Get AI analysis using Claude
-                response = await self.client.messages.create(
-                    model="claude-3-sonnet-20240229",
-                    max_tokens=1000,
-                    temperature=0.3,
-                    system=system_prompt,
-                    messages=[
-                        {"role": "user", "content": user_prompt}
-                    ]
-                )
+                response = await self._create_message(user_prompt)
                 
                 logger.info("Received response from Anthropic API")
                 # Parse JSON from Claude's response
@@ -184,11 +220,18 @@ Always respond in valid JSON format with the following structure:
                     result["tags"]
                 )
             
+            except RateLimitExceeded as e:
+                raise AIServiceError(
+                    "Too many analysis requests right now. Please try again shortly.",
+                    "rate_limited",
+                    retry_after=e.retry_after
+                )
             except RateLimitError as e:
                 logger.error("Rate limit exceeded", exc_info=True)
                 raise AIServiceError(
-                    "Anthropic service quota exceeded. Please check your billing details.",
-                    "quota_exceeded"
+                    "Anthropic rate limit exceeded. Please try again shortly.",
+                    "rate_limited",
+                    retry_after=_retry_after(e)
                 )
             except AuthenticationError:
                 logger.error("Authentication failed", exc_info=True)
@@ -215,15 +258,56 @@ Always respond in valid JSON format with the following structure:
             logger.error(f"Unexpected error in analyze_document: {str(e)}", exc_info=True)
             raise AIServiceError(f"Error analyzing document: {str(e)}", "unknown_error")
 
+    async def analyze(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        summary: bool = True,
+        text: Optional[str] = None
+    ) -> Dict:
+        """
+        Summary, categories and tags of a document in one pass.
+
+        Results are cached by content hash, so analyzing a file that was
+        analyzed before (by anyone) skips extraction and the API call.
+        Without summary, the local classifier answers when it is confident
+        (summary is then None) and the LLM only otherwise. Pass text if it
+        was already extracted with prompt_text.
+        """
+        file_hash = await content_hash(file_content)
+        cached = await self.cache.get(file_hash, MODEL, PROMPT_VERSION)
+        if cached is not None:
+            logger.info(f"Analysis cache hit for {file_hash[:12]}")
+            return {**cached, "cached": True, "source": "cache"}
+
+        try:
+            if text is None:
+                text = await self.prompt_text(file_content, mime_type)
+        except Exception as e:
+            logger.error(f"Error extracting text for analysis: {str(e)}", exc_info=True)
+            raise AIServiceError(f"Error analyzing document: {str(e)}", "unknown_error")
+
+        if not summary:
+            suggestions = self.classifier.suggest(text)
+            if suggestions is not None:
+                return {"summary": None, **suggestions, "cached": False, "source": "local"}
+
+        summary_text, categories, tags = await self.analyze_document(file_content, mime_type, text=text)
+        # Track how often the local model would have given the same answer
+        self.classifier.compare(text, categories, tags)
+        result = {"summary": summary_text, "categories": categories, "tags": tags}
+        await self.cache.put(file_hash, MODEL, PROMPT_VERSION, result)
+        return {**result, "cached": False, "source": "llm"}
+
     async def get_summary(self, file_content: bytes, mime_type: str) -> str:
         """Get just the summary of a document"""
-        summary, _, _ = await self.analyze_document(file_content, mime_type)
-        return summary
+        result = await self.analyze(file_content, mime_type)
+        return result["summary"]
 
     async def get_suggestions(self, file_content: bytes, mime_type: str) -> Dict[str, List[str]]:
-        """Get category and tag suggestions"""
-        _, categories, tags = await self.analyze_document(file_content, mime_type)
+        """Get category and tag suggestions (locally when the classifier is confident)"""
+        result = await self.analyze(file_content, mime_type, summary=False)
         return {
-            "categories": categories,
-            "tags": tags
+            "categories": result["categories"],
+            "tags": result["tags"]
         } 
\ No newline at end of file
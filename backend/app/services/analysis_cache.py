@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Optional
+from pymongo import ReturnDocument
+
+from ..core.config import settings
+from ..models.analysis import AnalysisCacheEntry
+
+logger = logging.getLogger(__name__)
+
+async def content_hash(file_content: bytes) -> str:
+    """SHA-256 of a file, computed off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: hashlib.sha256(file_content).hexdigest())
+
+class AnalysisCache:
+    """
+    Persistent cache of AI analysis results.
+
+    Keyed by (content SHA-256, model, prompt version), so the same file
+    uploaded again - by anyone - is answered without an API call, while a
+    new model or prompt never returns stale results. Entries expire after
+    ANALYSIS_CACHE_TTL_DAYS (TTL index); beyond ANALYSIS_CACHE_MAX_ENTRIES
+    the least recently used ones are evicted.
+    """
+
+    def __init__(self):
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    @staticmethod
+    def _collection():
+        return AnalysisCacheEntry.get_motor_collection()
+
+    async def get(self, file_hash: str, model: str, prompt_version: int) -> Optional[Dict]:
+        """Cached result (summary, categories, tags) or None"""
+        row = await self._collection().find_one_and_update(
+            {
+                "content_hash": file_hash,
+                "model": model,
+                "prompt_version": prompt_version,
+                "expires_at": {"$gt": datetime.utcnow()}
+            },
+            {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+            projection={"summary": 1, "categories": 1, "tags": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return {"summary": row["summary"], "categories": row["categories"], "tags": row["tags"]}
+
+    async def put(self, file_hash: str, model: str, prompt_version: int, result: Dict) -> None:
+        """Store a result, evicting the least recently used entries if over capacity"""
+        now = datetime.utcnow()
+        try:
+            await self._collection().update_one(
+                {"content_hash": file_hash, "model": model, "prompt_version": prompt_version},
+                {
+                    "$set": {
+                        "summary": result["summary"],
+                        "categories": result["categories"],
+                        "tags": result["tags"],
+                        "last_used_at": now,
+                        "expires_at": now + timedelta(days=settings.ANALYSIS_CACHE_TTL_DAYS),
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {"hits": 0, "created_at": now}
+                },
+                upsert=True
+            )
+            await self._evict()
+        except Exception as e:
+            # A cache write failure must never fail the analysis
+            logger.error(f"Error caching analysis result: {str(e)}")
+
+    async def _evict(self) -> None:
+        excess = await self._collection().estimated_document_count() - settings.ANALYSIS_CACHE_MAX_ENTRIES
+        if excess <= 0:
+            return
+        oldest = await self._collection().find({}, {"_id": 1}).sort("last_used_at", 1).limit(excess).to_list(length=None)
+        result = await self._collection().delete_many({"_id": {"$in": [row["_id"] for row in oldest]}})
+        self.stats["evicted"] += result.deleted_count
+
+    def metrics(self) -> Dict:
+        return dict(self.stats)
+
+@lru_cache()
+def get_analysis_cache() -> AnalysisCache:
+    """Get the shared analysis cache instance"""
+    return AnalysisCache()
@@ -0,0 +1,407 @@
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+import asyncio
+import heapq
+import logging
+
+from ..core.config import settings
+from ..core.database import read_collection
+from ..models.category import Category
+from ..models.document import Document, LIVE
+from ..models.tag import Tag
+from .events import get_event_bus
+from .search.tokenizer import normalize
+
+logger = logging.getLogger(__name__)
+
+# Prefix ranges wider than this get their ranked suggestions cached
+CACHE_THRESHOLD = 256
+
+# Suggestions kept per cached prefix (upper bound for the limit parameter)
+MAX_SUGGESTIONS = 50
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index with usage-frequency ranking.
+
+    Every value is stored under its full normalized form and under each
+    word that starts inside it, so "Invoice 2024" is found by "inv" and by
+    "20". Lookups are two bisections; wide prefix ranges (short queries
+    over large sets) are ranked once and the cached top-N is then patched
+    in place as weights change.
+    """
+
+    def __init__(self, prune: bool = False):
+        self.prune = prune  # Drop values whose weight falls to zero
+        self._keys: List[Tuple[str, str]] = []
+        self._weights: Dict[str, int] = {}
+        self._cache: Dict[str, List[Tuple[str, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def __contains__(self, value: str) -> bool:
+        return value in self._weights
+
+    @staticmethod
+    def _index_keys(value: str) -> List[str]:
+        words = normalize(value).split()
+        return list(dict.fromkeys(" ".join(words[i:]) for i in range(len(words))))
+
+    @staticmethod
+    def _rank(item: Tuple[str, int]):
+        return (-item[1], len(item[0]), item[0])
+
+    def _refresh_cache(self, value: str) -> None:
+        """
+        Patch cached rankings under value's prefixes in place.
+
+        A cached list is always the exact top-N of its prefix range, so
+        dropping an entry keeps it exact, and a changed value only needs to
+        be re-inserted when it still ranks above the current last entry.
+        """
+        if not self._cache:
+            return
+        weight = self._weights.get(value)
+        prefixes = {key[:end] for key in self._index_keys(value) for end in range(len(key) + 1)}
+        for prefix in prefixes:
+            cached = self._cache.get(prefix)
+            if cached is None:
+                continue
+            others = [item for item in cached if item[0] != value]
+            if not others:
+                del self._cache[prefix]
+                continue
+            if weight is not None and self._rank((value, weight)) <= self._rank(others[-1]):
+                others.append((value, weight))
+                others.sort(key=self._rank)
+            self._cache[prefix] = others[:MAX_SUGGESTIONS]
+
+    def add(self, value: str, weight: int = 1) -> None:
+        """Insert a value or increase its weight"""
+        if not value:
+            return
+        if value in self._weights:
+            self._weights[value] += weight
+        else:
+            self._weights[value] = weight
+            for key in self._index_keys(value):
+                insort(self._keys, (key, value))
+        self._refresh_cache(value)
+
+    def bulk_add(self, items: Iterable[Tuple[str, int]]) -> None:
+        """Add many (value, weight) pairs, sorting the key array only once"""
+        for value, weight in items:
+            if value:
+                self._weights[value] = self._weights.get(value, 0) + weight
+        self._keys = sorted(
+            (key, value) for value in self._weights for key in self._index_keys(value)
+        )
+        self._cache = {}
+
+    def discard(self, value: str, weight: int = 1) -> None:
+        """Decrease a value's weight, dropping it at zero if pruning"""
+        if value not in self._weights:
+            return
+        self._weights[value] = max(0, self._weights[value] - weight)
+        if self.prune and self._weights[value] == 0:
+            self.remove(value)
+        else:
+            self._refresh_cache(value)
+
+    def remove(self, value: str) -> None:
+        """Remove a value regardless of its weight"""
+        if self._weights.pop(value, None) is None:
+            return
+        for key in self._index_keys(value):
+            position = bisect_left(self._keys, (key, value))
+            if position < len(self._keys) and self._keys[position] == (key, value):
+                del self._keys[position]
+        self._refresh_cache(value)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Return up to limit (value, weight) pairs, most used first"""
+        prefix = " ".join(normalize(prefix).split())
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        cached = self._cache.get(prefix)
+        if cached is not None and len(cached) >= limit:
+            return cached[:limit]
+
+        low = bisect_left(self._keys, (prefix,))
+        high = bisect_left(self._keys, (prefix + "\uffff",), low)
+        values = {value for _, value in self._keys[low:high]}
+        weights = self._weights
+        result = heapq.nsmallest(
+            MAX_SUGGESTIONS if high - low > CACHE_THRESHOLD else limit,
+            ((value, weights[value]) for value in values),
+            key=self._rank
+        )
+
+        if high - low > CACHE_THRESHOLD:
+            self._cache[prefix] = result
+        return result[:limit]
+
+# What a document contributes to the indexes: owner, title, tags, categories
+DocumentState = Tuple[str, str, FrozenSet[str], FrozenSet[str]]
+
+def document_state(document: Dict) -> Optional[DocumentState]:
+    """A stored document's contribution, or None if it doesn't count (deleted)"""
+    if document is None or document.get("deleted_at"):
+        return None
+    return (
+        document["owner_id"],
+        document["title"],
+        frozenset(document.get("tags") or []),
+        frozenset(document.get("categories") or [])
+    )
+
+class AutocompleteService:
+    """
+    In-memory prefix suggestions for tags, categories and document titles.
+
+    The last state seen of every live document is kept, so any change,
+    whether made through this worker or reported by the event bus (other
+    workers, and this worker's own writes again), is applied as the
+    difference from that state. Applying the same state twice changes
+    nothing. The indexes are only rebuilt from the database at start and
+    when the bus asks for a resync after missed events.
+    """
+
+    def __init__(self):
+        self.tags = PrefixIndex()
+        self.categories = PrefixIndex()
+        self._titles: Dict[str, PrefixIndex] = {}
+        self._documents: Dict[str, DocumentState] = {}
+        self._catalog: Dict[Tuple[str, str], str] = {}  # (collection, id) -> name
+        # Events seen while a build runs, replayed onto its result
+        self._pending: Optional[List] = None
+        self.stale = False
+        self.refresh_task = None
+        self.running = False
+
+    def _titles_for(self, owner_id: str, titles: Optional[Dict[str, PrefixIndex]] = None) -> PrefixIndex:
+        titles = self._titles if titles is None else titles
+        index = titles.get(owner_id)
+        if index is None:
+            index = titles[owner_id] = PrefixIndex(prune=True)
+        return index
+
+    async def load(self) -> None:
+        """Build the prefix indexes from the database"""
+        self.stale = False
+        self._pending = []
+        try:
+            # Suggestions keep using the old indexes until the new ones are complete
+            tags, categories = PrefixIndex(), PrefixIndex()
+            titles: Dict[str, PrefixIndex] = {}
+            documents: Dict[str, DocumentState] = {}
+            catalog: Dict[Tuple[str, str], str] = {}
+
+            owner_titles: Dict[str, List[Tuple[str, int]]] = {}
+            tag_counts: Dict[str, int] = {}
+            category_counts: Dict[str, int] = {}
+            cursor = read_collection(Document, "facets").find(
+                LIVE,
+                {"owner_id": 1, "title": 1, "tags": 1, "categories": 1}
+            )
+            async for row in cursor:
+                state = documents[str(row["_id"])] = document_state(row)
+                owner_id, title, document_tags, document_categories = state
+                owner_titles.setdefault(owner_id, []).append((title, 1))
+                for tag in document_tags:
+                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
+                for category in document_categories:
+                    category_counts[category] = category_counts.get(category, 0) + 1
+
+            for tag in await Tag.find_all().to_list():
+                catalog[("tags", str(tag.id))] = tag.name
+                tag_counts.setdefault(tag.name, 0)
+            for category in await Category.find_all().to_list():
+                catalog[("categories", str(category.id))] = category.name
+                category_counts.setdefault(category.name, 0)
+
+            tags.bulk_add(tag_counts.items())
+            categories.bulk_add(category_counts.items())
+            for owner_id, items in owner_titles.items():
+                self._titles_for(owner_id, titles).bulk_add(items)
+
+            self.tags, self.categories, self._titles = tags, categories, titles
+            self._documents, self._catalog = documents, catalog
+            pending = self._pending
+        finally:
+            self._pending = None
+        # Changes the build may have missed; ones it saw apply as no-ops
+        for event in pending:
+            self._on_change(event)
+        logger.info(
+            f"Autocomplete loaded {len(self.tags)} tags, {len(self.categories)} categories "
+            f"and titles for {len(self._titles)} owners"
+        )
+
+    def _apply(self, document_id: str, state: Optional[DocumentState]) -> None:
+        """Move a document's contribution from its last known state to state"""
+        old = self._documents.get(document_id)
+        if old == state:
+            return
+        if state is None:
+            del self._documents[document_id]
+        else:
+            self._documents[document_id] = state
+        old_owner, old_title, old_tags, old_categories = old or (None, None, frozenset(), frozenset())
+        owner, title, tags, categories = state or (None, None, frozenset(), frozenset())
+        if (old_owner, old_title) != (owner, title):
+            if old is not None:
+                self._titles_for(old_owner).discard(old_title)
+            if state is not None:
+                self._titles_for(owner).add(title)
+        self._apply_diff(self.tags, old_tags, tags)
+        self._apply_diff(self.categories, old_categories, categories)
+
+    def _on_change(self, event) -> None:
+        if self._pending is not None:
+            self._pending.append(event)
+            return
+        if event.operation == "resync":
+            self.stale = True
+        elif event.collection == "documents":
+            self._apply(event.document_id, document_state(event.document))
+        else:
+            self._on_catalog_change(event)
+
+    def _on_catalog_change(self, event) -> None:
+        index = self.tags if event.collection == "tags" else self.categories
+        key = (event.collection, event.document_id)
+        old = self._catalog.pop(key, None)
+        name = event.document.get("name") if event.document else None
+        # Deleted or renamed catalog entries leave the index, like local deletes and renames
+        if old is not None and old != name:
+            index.remove(old)
+        if name is not None:
+            self._catalog[key] = name
+            index.add(name, 0)
+
+    async def refresh_loop(self):
+        """Rebuild the indexes after a resync or a failed build"""
+        while self.running:
+            await asyncio.sleep(settings.AUTOCOMPLETE_REFRESH_INTERVAL)
+            if not self.stale:
+                continue
+            try:
+                await self.load()
+            except Exception as e:
+                self.stale = True
+                logger.error(f"Error refreshing autocomplete index: {str(e)}")
+
+    async def start(self):
+        """Build the indexes and keep them current with other workers' changes"""
+        bus = get_event_bus()
+        for collection in ("documents", "tags", "categories"):
+            bus.subscribe(collection, self._on_change)
+        self.running = True
+        self.refresh_task = asyncio.create_task(self.refresh_loop())
+        logger.info("Autocomplete subscribed to change events")
+        try:
+            await self.load()
+        except Exception:
+            self.stale = True  # Retried by the refresh loop
+            raise
+
+    async def stop(self):
+        """Stop following changes"""
+        if self.running:
+            self.running = False
+            bus = get_event_bus()
+            for collection in ("documents", "tags", "categories"):
+                bus.unsubscribe(collection, self._on_change)
+            if self.refresh_task:
+                self.refresh_task.cancel()
+                try:
+                    await self.refresh_task
+                except asyncio.CancelledError:
+                    pass
+
+    @staticmethod
+    def _state(document: Document) -> Optional[DocumentState]:
+        if document.deleted_at:
+            return None
+        return (document.owner_id, document.title, frozenset(document.tags), frozenset(document.categories))
+
+    def document_added(self, document: Document) -> None:
+        """Record a new document's title and labels"""
+        self._apply(str(document.id), self._state(document))
+
+    def document_removed(self, document: Document) -> None:
+        """Forget a deleted document's title and labels"""
+        self._apply(str(document.id), None)
+
+    def document_updated(
+        self,
+        owner_id: str,
+        old_title: str,
+        old_categories: Iterable[str],
+        old_tags: Iterable[str],
+        document: Document
+    ) -> None:
+        """Apply the title and label changes of an updated document"""
+        document_id = str(document.id)
+        if document_id not in self._documents:
+            self._documents[document_id] = (owner_id, old_title, frozenset(old_tags), frozenset(old_categories))
+        self._apply(document_id, self._state(document))
+
+    def labels_changed(self, document_id: str, categories: Iterable[str], tags: Iterable[str]) -> None:
+        """Apply new labels to a document whose other fields didn't change"""
+        old = self._documents.get(document_id)
+        if old is not None:
+            self._apply(document_id, (old[0], old[1], frozenset(tags), frozenset(categories)))
+
+    def label_renamed(self, field: str, old_name: str, new_name: str, document_ids: Iterable[str]) -> None:
+        """Move a renamed tag or category's uses to the new name"""
+        for document_id in document_ids:
+            old = self._documents.get(document_id)
+            if old is None:
+                continue
+            owner_id, title, tags, categories = old
+            if field == "tags":
+                tags = (tags - {old_name}) | {new_name}
+            else:
+                categories = (categories - {old_name}) | {new_name}
+            self._apply(document_id, (owner_id, title, tags, categories))
+        index = getattr(self, field)
+        index.remove(old_name)
+        index.add(new_name, 0)
+
+    @staticmethod
+    def _apply_diff(index: PrefixIndex, old: Iterable[str], new: Iterable[str]) -> None:
+        old, new = set(old), set(new)
+        for value in old - new:
+            index.discard(value)
+        for value in new - old:
+            index.add(value)
+
+    def suggest(
+        self,
+        prefix: str,
+        owner_id: Optional[str] = None,
+        kinds: Iterable[str] = ("tags", "categories", "titles"),
+        limit: int = 10
+    ) -> Dict[str, List[Dict]]:
+        """Suggest completions for prefix, grouped by kind"""
+        result = {}
+        for kind in kinds:
+            if kind == "tags":
+                matches = self.tags.suggest(prefix, limit)
+            elif kind == "categories":
+                matches = self.categories.suggest(prefix, limit)
+            elif kind == "titles" and owner_id and owner_id in self._titles:
+                matches = self._titles[owner_id].suggest(prefix, limit)
+            else:
+                matches = []
+            result[kind] = [{"value": value, "count": count} for value, count in matches]
+        return result
+
+@lru_cache()
+def get_autocomplete_service() -> AutocompleteService:
+    """Get the shared autocomplete service instance"""
+    return AutocompleteService()
@@ -0,0 +1,186 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from bson import ObjectId
+import logging
+
+from ..models.category import Category
+from ..models.document import Document, LIVE
+from ..models.tag import Tag
+from .autocomplete import get_autocomplete_service
+from .document import merged_labels
+from .filters import build_filter_query, merge_clauses
+from .search.service import get_search_service
+
+logger = logging.getLogger(__name__)
+
+# Label fields that can be edited in bulk -> catalog model
+LABEL_MODELS = {"tags": Tag, "categories": Category}
+
+class BulkMetadataService:
+    """Server-side metadata changes over many documents with update_many"""
+
+    def __init__(self):
+        self.search = get_search_service()
+        self.autocomplete = get_autocomplete_service()
+
+    @staticmethod
+    def _collection():
+        return Document.get_motor_collection()
+
+    async def _snapshot(self, query: Dict, fields: Iterable[str] = ()) -> Dict[ObjectId, Dict]:
+        """Fetch the labels (and fields) of the documents a query selects (single cursor)"""
+        projection = {"tags": 1, "categories": 1, **{field: 1 for field in fields}}
+        return {
+            row["_id"]: row
+            async for row in self._collection().find(query, projection)
+        }
+
+    def _sync_autocomplete(self, before: Dict[ObjectId, Dict], operations: Dict) -> None:
+        """Replay the label operations locally to keep usage counts exact"""
+        for doc_id, row in before.items():
+            labels = {}
+            for field in LABEL_MODELS:
+                old = row.get(field, [])
+                new = [value for value in old if value not in operations.get(f"remove_{field}", [])]
+                new += [value for value in operations.get(f"add_{field}", []) if value not in new]
+                labels[field] = new
+            self.autocomplete.labels_changed(str(doc_id), labels["categories"], labels["tags"])
+
+    async def bulk_update(
+        self,
+        owner_id: str,
+        document_ids: Optional[List[str]] = None,
+        filter_expression: Optional[str] = None,
+        add_tags: Optional[List[str]] = None,
+        remove_tags: Optional[List[str]] = None,
+        add_categories: Optional[List[str]] = None,
+        remove_categories: Optional[List[str]] = None,
+        set_fields: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Apply label additions/removals and field updates to many documents.
+
+        Documents are selected by id list and/or filter expression, always
+        scoped to owner_id. Everything is applied with one pipeline
+        update_many, so each document changes atomically, and revision
+        only moves for documents that actually changed.
+        """
+        if document_ids is None and not filter_expression:
+            raise ValueError("Provide document_ids or a filter expression")
+
+        invalid = [doc_id for doc_id in document_ids or [] if not ObjectId.is_valid(doc_id)]
+        if invalid:
+            raise ValueError(f"Invalid document ids: {', '.join(invalid[:5])}")
+
+        clauses = [{"owner_id": owner_id}, LIVE]
+        if document_ids is not None:
+            clauses.append({"_id": {"$in": [ObjectId(doc_id) for doc_id in document_ids]}})
+        if filter_expression:
+            clauses.append(build_filter_query(filter_expression))
+        query = merge_clauses(clauses)
+
+        operations = {
+            "add_tags": add_tags or [],
+            "remove_tags": remove_tags or [],
+            "add_categories": add_categories or [],
+            "remove_categories": remove_categories or [],
+        }
+        set_fields = {key: value for key, value in (set_fields or {}).items() if value is not None}
+        if not any(operations.values()) and not set_fields:
+            raise ValueError("No changes requested")
+
+        # Pin the selection so the update and the index sync see the same set
+        before = await self._snapshot(query, set_fields)
+        ids = list(before)
+        if not ids:
+            return {"matched": 0, "modified": 0}
+        now = datetime.utcnow()
+
+        new_values = {field: {"$literal": value} for field, value in set_fields.items()}
+        for field in LABEL_MODELS:
+            if operations[f"add_{field}"] or operations[f"remove_{field}"]:
+                new_values[field] = merged_labels(field, operations[f"add_{field}"], operations[f"remove_{field}"])
+        changed = {"$or": [
+            {"$ne": [f"$_bulk.{field}", {"$ifNull": [f"${field}", []] if field in LABEL_MODELS else f"${field}"}]}
+            for field in new_values
+        ]}
+        result = await self._collection().update_many({"_id": {"$in": ids}}, [
+            {"$set": {"_bulk": new_values}},
+            {"$set": {"_bulk.changed": changed}},
+            {"$set": {
+                **{field: f"$_bulk.{field}" for field in new_values},
+                "updated_at": {"$cond": ["$_bulk.changed", now, "$updated_at"]},
+                "revision": {"$cond": [
+                    "$_bulk.changed",
+                    {"$add": [{"$ifNull": ["$revision", 0]}, 1]},
+                    "$revision"
+                ]}
+            }},
+            {"$unset": "_bulk"}
+        ])
+        logger.info(f"Bulk update changed {result.modified_count} of {len(ids)} documents")
+
+        # Documents whose labels or fields actually changed
+        modified = set()
+        for doc_id, row in before.items():
+            for field in LABEL_MODELS:
+                old = set(row.get(field, []))
+                if old & set(operations[f"remove_{field}"]) or set(operations[f"add_{field}"]) - old:
+                    modified.add(doc_id)
+            if any(row.get(field) != value for field, value in set_fields.items()):
+                modified.add(doc_id)
+
+        self._sync_autocomplete(before, operations)
+        self.search.schedule_reindex([str(doc_id) for doc_id in modified])
+
+        return {"matched": len(ids), "modified": len(modified)}
+
+    async def rename_label(self, field: str, old_name: str, new_name: str) -> Dict:
+        """
+        Rename a tag or category everywhere in one server-side pass.
+
+        Documents that already carry the new name just drop the old one, so
+        no document ends up with duplicates. The catalog entry is renamed (or
+        merged into an existing entry with the new name).
+        """
+        model = LABEL_MODELS[field]
+        if not new_name or new_name == old_name:
+            raise ValueError("New name must be different from the old name")
+
+        affected = [
+            row["_id"]
+            async for row in self._collection().find({field: old_name}, {"_id": 1})
+        ]
+        now = datetime.utcnow()
+
+        # Documents with both names: just drop the old one
+        merged = await self._collection().update_many(
+            {field: {"$all": [old_name, new_name]}},
+            {"$pull": {field: old_name}, "$set": {"updated_at": now}, "$inc": {"revision": 1}}
+        )
+        # Everyone else: rewrite the element in place
+        renamed = await self._collection().update_many(
+            {field: old_name},
+            {"$set": {f"{field}.$[label]": new_name, "updated_at": now}, "$inc": {"revision": 1}},
+            array_filters=[{"label": old_name}]
+        )
+
+        # Rename the catalog entry, or merge it into an existing one
+        catalog_entry = await model.find_one(model.name == old_name)
+        if catalog_entry:
+            if await model.find_one(model.name == new_name):
+                await catalog_entry.delete()
+            else:
+                catalog_entry.name = new_name
+                await catalog_entry.save()
+
+        self.autocomplete.label_renamed(field, old_name, new_name, [str(doc_id) for doc_id in affected])
+        self.search.schedule_reindex([str(doc_id) for doc_id in affected])
+
+        return {
+            "old_name": old_name,
+            "new_name": new_name,
+            "modified": merged.modified_count + renamed.modified_count,
+            "merged": merged.modified_count,
+            "renamed": renamed.modified_count
+        }
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from functools import lru_cache
+from typing import List, Optional
+from pymongo import ReturnDocument
+
+from ..models.category import Category
+from ..models.tag import Tag
+from .events import get_event_bus
+
+logger = logging.getLogger(__name__)
+
+# Collection holding the shared catalog version counter
+VERSION_COLLECTION = "catalog_version"
+VERSION_ID = "catalog"
+
+class CatalogCache:
+    """
+    In-process cache of all categories and tags.
+
+    The cached sets carry the version number stored in the catalog_version
+    collection. Writes bump that version and reload locally; other workers
+    reload when the change event bus reports the write, so reads never
+    touch MongoDB.
+    """
+
+    def __init__(self):
+        self.categories: List[Category] = []
+        self.tags: List[Tag] = []
+        self.version: Optional[int] = None
+        self._lock = asyncio.Lock()
+        self.running = False
+
+    def _version_collection(self):
+        return Category.get_motor_collection().database[VERSION_COLLECTION]
+
+    async def _read_version(self) -> int:
+        doc = await self._version_collection().find_one({"_id": VERSION_ID})
+        return doc["version"] if doc else 0
+
+    async def _reload(self, version: int) -> None:
+        # The version is read before the data, so a write racing with the
+        # reload shows up as a newer version on the next poll
+        categories = await Category.find_all().to_list()
+        tags = await Tag.find_all().to_list()
+        self.categories, self.tags, self.version = categories, tags, version
+        logger.debug(f"Catalog cache loaded at version {version}")
+
+    async def refresh(self, force: bool = False) -> None:
+        """Reload the catalog if the shared version moved (or when forced)"""
+        async with self._lock:
+            version = await self._read_version()
+            if force or version != self.version:
+                await self._reload(version)
+
+    async def ensure_loaded(self) -> None:
+        if self.version is None:
+            await self.refresh()
+
+    async def invalidate(self) -> None:
+        """Bump the shared version after a write and reload this worker's copy"""
+        async with self._lock:
+            doc = await self._version_collection().find_one_and_update(
+                {"_id": VERSION_ID},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            await self._reload(doc["version"])
+
+    def etag(self, kind: str) -> str:
+        """Strong validator for the cached categories or tags"""
+        return f'"{kind}-v{self.version or 0}"'
+
+    async def get_categories(self) -> List[Category]:
+        await self.ensure_loaded()
+        return list(self.categories)
+
+    async def get_tags(self) -> List[Tag]:
+        await self.ensure_loaded()
+        return list(self.tags)
+
+    async def _on_change(self, event) -> None:
+        # Reload on data changes even if the version bump hasn't landed yet;
+        # the bump arrives as its own catalog_version event right after
+        await self.refresh(force=event.collection != VERSION_COLLECTION)
+
+    async def start(self):
+        """Load the catalog and reload whenever any worker changes it"""
+        bus = get_event_bus()
+        for collection in ("categories", "tags", VERSION_COLLECTION):
+            bus.subscribe(collection, self._on_change)
+        self.running = True
+        await self.refresh()
+        logger.info("Catalog cache subscribed to change events")
+
+    async def stop(self):
+        """Stop following changes"""
+        if self.running:
+            self.running = False
+            bus = get_event_bus()
+            for collection in ("categories", "tags", VERSION_COLLECTION):
+                bus.unsubscribe(collection, self._on_change)
+
+@lru_cache()
+def get_catalog_cache() -> CatalogCache:
+    """Get the shared catalog cache instance"""
+    return CatalogCache()
@@ -0,0 +1,406 @@
+import asyncio
+import io
+import logging
+import os
+import re
+import socket
+import zlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+
+from ..core.config import settings
+from ..core.database import read_collection
+from ..models.category import Category
+from ..models.document import Document, LIVE
+from .content import get_content_service
+
+logger = logging.getLogger(__name__)
+
+# Saved models, newest version wins
+GRIDFS_BUCKET = "classifier_models"
+MODEL_FILE = "classifier.npz"
+
+# Training lease, so only one worker trains at a time
+STATE_COLLECTION = "classifier_state"
+
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+
+# Labels are stored as "<kind>:<name>"
+CATEGORY = "category:"
+TAG = "tag:"
+
+# Tags suggested per document, like the LLM prompt asks for
+MAX_SUGGESTED_TAGS = 5
+
+def vectorize(text: str, n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hashing vectorizer: a text as the (indices, values) of a sparse vector.
+
+    Tokens are hashed with CRC32 (stable across processes, unlike hash())
+    into n_features buckets, with the sign taken from an unrelated hash
+    bit so collisions tend to cancel out. Counts are log-scaled and the
+    vector L2-normalized.
+    """
+    hashes = np.fromiter(
+        (zlib.crc32(token.encode("utf-8")) for token in TOKEN_PATTERN.findall(text.lower())),
+        dtype=np.uint32
+    )
+    if not hashes.size:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    indices, inverse = np.unique(hashes % n_features, return_inverse=True)
+    counts = np.bincount(inverse, weights=signs)
+    values = np.sign(counts) * np.log1p(np.abs(counts))
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    return indices.astype(np.int64), values.astype(np.float32)
+
+class LinearModel:
+    """One-vs-rest logistic regression over hashed features, trained by SGD"""
+
+    def __init__(
+        self,
+        n_features: int,
+        labels: Optional[List[str]] = None,
+        weights: Optional[np.ndarray] = None,
+        bias: Optional[np.ndarray] = None,
+        examples: int = 0,
+        version: int = 0,
+        trained_until: Optional[datetime] = None,
+        last_id=None
+    ):
+        self.n_features = n_features
+        self.labels = list(labels or [])
+        self.weights = weights if weights is not None else np.zeros((n_features, len(self.labels)), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(self.labels), dtype=np.float32)
+        self.examples = examples
+        self.version = version
+        # Training watermark: the last document (by updated_at, _id) learned from
+        self.trained_until = trained_until
+        self.last_id = last_id
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+
+    def copy(self, labels: List[str]) -> "LinearModel":
+        """A copy to train on, with zero weights for labels not known yet"""
+        new = [label for label in labels if label not in self._label_index]
+        weights = np.zeros((self.n_features, len(self.labels) + len(new)), dtype=np.float32)
+        weights[:, :len(self.labels)] = self.weights
+        bias = np.concatenate([self.bias, np.zeros(len(new), dtype=np.float32)])
+        return LinearModel(
+            self.n_features, self.labels + new, weights, bias,
+            self.examples, self.version, self.trained_until, self.last_id
+        )
+
+    def predict(self, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Probability of every label for one vector"""
+        logits = values @ self.weights[indices] + self.bias
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def partial_fit(self, batch: List[Tuple[np.ndarray, np.ndarray, List[str]]], learning_rate: float) -> None:
+        """One SGD step on a batch of (indices, values, labels)"""
+        lengths = [len(indices) for indices, _, _ in batch]
+        rows = np.repeat(np.arange(len(batch)), lengths)
+        indices = np.concatenate([indices for indices, _, _ in batch])
+        values = np.concatenate([values for _, values, _ in batch])
+
+        targets = np.zeros((len(batch), len(self.labels)), dtype=np.float32)
+        for row, (_, _, labels) in enumerate(batch):
+            targets[row, [self._label_index[label] for label in labels if label in self._label_index]] = 1.0
+
+        logits = np.tile(self.bias, (len(batch), 1))
+        np.add.at(logits, rows, values[:, None] * self.weights[indices])
+        errors = 1.0 / (1.0 + np.exp(-logits)) - targets
+
+        # Gradients averaged over the batch, so the step size doesn't grow with it
+        np.add.at(self.weights, indices, -learning_rate / len(batch) * values[:, None] * errors[rows])
+        self.bias -= learning_rate * errors.mean(axis=0)
+        self.examples += len(batch)
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            labels=np.array(self.labels, dtype=str),
+            weights=self.weights,
+            bias=self.bias,
+            examples=np.array(self.examples)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, metadata: Dict) -> "LinearModel":
+        arrays = np.load(io.BytesIO(data))
+        return cls(
+            arrays["weights"].shape[0],
+            arrays["labels"].tolist(),
+            arrays["weights"],
+            arrays["bias"],
+            int(arrays["examples"]),
+            metadata["version"],
+            metadata.get("trained_until"),
+            metadata.get("last_id")
+        )
+
+class LocalClassifier:
+    """
+    Suggests categories and tags without calling the LLM.
+
+    A linear model over hashed words of the extracted text, trained
+    incrementally on the labels users (and enrichment) gave their
+    documents: each pass learns from the documents updated since the last
+    one. One worker at a time trains, under a lease, and saves the model
+    to GridFS; the others load the newest version. Suggestions are only
+    returned when the top category's probability reaches
+    CLASSIFIER_MIN_CONFIDENCE; otherwise callers fall back to the LLM.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.content = get_content_service()
+        self.model: Optional[LinearModel] = None
+        self.task = None
+        self.running = False
+        self.stats = {
+            "predictions": 0,
+            "answered": 0,
+            "fallbacks": 0,
+            "compared": 0,
+            "agreed": 0,
+            "confident_compared": 0,
+            "confident_agreed": 0,
+            "tag_overlap": 0.0
+        }
+
+    def _gridfs(self) -> AsyncIOMotorGridFSBucket:
+        database = Document.get_motor_collection().database
+        return AsyncIOMotorGridFSBucket(database, bucket_name=GRIDFS_BUCKET)
+
+    def _state(self):
+        return Document.get_motor_collection().database[STATE_COLLECTION]
+
+    def _predict(self, text: str) -> Optional[Dict]:
+        """Label probabilities, and whether the model is confident enough to answer"""
+        model = self.model
+        if model is None or not model.labels:
+            return None
+        indices, values = vectorize(text, model.n_features)
+        if not indices.size:
+            return None
+        probabilities = model.predict(indices, values)
+
+        categories = sorted(
+            ((p, label[len(CATEGORY):]) for p, label in zip(probabilities, model.labels) if label.startswith(CATEGORY)),
+            reverse=True
+        )
+        tags = sorted(
+            ((p, label[len(TAG):]) for p, label in zip(probabilities, model.labels) if label.startswith(TAG)),
+            reverse=True
+        )
+        if not categories:
+            return None
+        confidence = float(categories[0][0])
+        return {
+            # The top category, plus any other the model is just as sure of
+            "categories": [categories[0][1]] + [
+                name for p, name in categories[1:] if p >= settings.CLASSIFIER_MIN_CONFIDENCE
+            ],
+            "tags": [name for p, name in tags[:MAX_SUGGESTED_TAGS] if p >= 0.5],
+            "confidence": confidence,
+            "confident": (
+                confidence >= settings.CLASSIFIER_MIN_CONFIDENCE
+                and model.examples >= settings.CLASSIFIER_MIN_EXAMPLES
+            )
+        }
+
+    def suggest(self, text: str) -> Optional[Dict]:
+        """Categories and tags for a text, or None when the LLM should answer"""
+        prediction = self._predict(text)
+        self.stats["predictions"] += 1
+        if prediction is None or not prediction["confident"]:
+            self.stats["fallbacks"] += 1
+            return None
+        self.stats["answered"] += 1
+        return {
+            "categories": prediction["categories"],
+            "tags": prediction["tags"],
+            "confidence": prediction["confidence"]
+        }
+
+    def compare(self, text: str, categories: List[str], tags: List[str]) -> None:
+        """Record whether the model agrees with an LLM answer for the same text"""
+        prediction = self._predict(text)
+        if prediction is None:
+            return
+        agreed = prediction["categories"][0] in categories
+        self.stats["compared"] += 1
+        self.stats["agreed"] += agreed
+        if prediction["confident"]:
+            self.stats["confident_compared"] += 1
+            self.stats["confident_agreed"] += agreed
+        union = set(prediction["tags"]) | set(tags)
+        if union:
+            self.stats["tag_overlap"] += len(set(prediction["tags"]) & set(tags)) / len(union)
+
+    async def _labels(self) -> List[str]:
+        """Every category, and the most used tags"""
+        categories = await Category.get_motor_collection().distinct("name")
+        pipeline = [
+            {"$match": LIVE},
+            {"$unwind": "$tags"},
+            {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": settings.CLASSIFIER_MAX_TAGS}
+        ]
+        tags = [row["_id"] async for row in read_collection(Document, "training").aggregate(pipeline)]
+        return [CATEGORY + name for name in categories] + [TAG + name for name in tags]
+
+    async def _claim(self) -> bool:
+        """Take or renew the training lease"""
+        now = datetime.utcnow()
+        try:
+            await self._state().find_one_and_update(
+                {"_id": "trainer", "$or": [{"locked_until": {"$lt": now}}, {"locked_by": self.worker_id}]},
+                {"$set": {
+                    "locked_by": self.worker_id,
+                    "locked_until": now + timedelta(seconds=settings.CLASSIFIER_TRAIN_INTERVAL * 3)
+                }},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Held by another worker
+            return False
+
+    async def train(self, limit: Optional[int] = None) -> int:
+        """Learn from labeled documents updated since the last pass; returns how many were read"""
+        limit = limit or settings.CLASSIFIER_TRAIN_LIMIT
+        current = self.model or LinearModel(settings.CLASSIFIER_FEATURES)
+        model = current.copy(await self._labels())
+
+        query = {**LIVE, "$or": [{"categories": {"$ne": []}}, {"tags": {"$ne": []}}]}
+        if model.trained_until is not None:
+            query = {"$and": [query, {"$or": [
+                {"updated_at": {"$gt": model.trained_until}},
+                {"updated_at": model.trained_until, "_id": {"$gt": model.last_id}}
+            ]}]}
+        rows = await read_collection(Document, "training").find(
+            query,
+            {"categories": 1, "tags": 1, "updated_at": 1}
+        ).sort([("updated_at", 1), ("_id", 1)]).limit(limit).to_list(length=None)
+        if not rows:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        learned = 0
+        batch_size = settings.CLASSIFIER_TRAIN_BATCH_SIZE
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            texts = await self.content.get_texts([str(row["_id"]) for row in chunk], workload="training")
+            batch = [
+                (texts[str(row["_id"])], [CATEGORY + name for name in row.get("categories", [])] + [TAG + name for name in row.get("tags", [])])
+                for row in chunk if str(row["_id"]) in texts
+            ]
+            if batch:
+                await loop.run_in_executor(None, self._fit, model, batch)
+                learned += len(batch)
+
+        model.trained_until = rows[-1]["updated_at"]
+        model.last_id = rows[-1]["_id"]
+        model.version += 1
+        await self._save(model)
+        self.model = model
+        logger.info(f"Classifier trained on {learned} documents ({model.examples} in total, version {model.version})")
+        return len(rows)
+
+    @staticmethod
+    def _fit(model: LinearModel, batch: List[Tuple[str, List[str]]]) -> None:
+        vectors = [(*vectorize(text, model.n_features), labels) for text, labels in batch]
+        model.partial_fit([vector for vector in vectors if vector[0].size], settings.CLASSIFIER_LEARNING_RATE)
+
+    async def _save(self, model: LinearModel) -> None:
+        data = await asyncio.get_running_loop().run_in_executor(None, model.to_bytes)
+        await self._gridfs().upload_from_stream(
+            MODEL_FILE,
+            data,
+            metadata={
+                "version": model.version,
+                "trained_until": model.trained_until,
+                "last_id": model.last_id,
+                "examples": model.examples
+            }
+        )
+        # Keep only the new version
+        async for old in self._gridfs().find({"filename": MODEL_FILE, "metadata.version": {"$lt": model.version}}):
+            await self._gridfs().delete(old._id)
+
+    async def load(self) -> bool:
+        """Load the newest saved model if it is newer than ours"""
+        async for grid_out in self._gridfs().find({"filename": MODEL_FILE}).sort("metadata.version", -1).limit(1):
+            if self.model is not None and grid_out.metadata["version"] <= self.model.version:
+                return False
+            data = await grid_out.read()
+            self.model = await asyncio.get_running_loop().run_in_executor(
+                None, LinearModel.from_bytes, data, grid_out.metadata
+            )
+            logger.info(f"Loaded classifier version {self.model.version}")
+            return True
+        return False
+
+    def metrics(self) -> Dict:
+        compared = self.stats["compared"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["answered"] / self.stats["predictions"], 3) if self.stats["predictions"] else None,
+            "agreement": round(self.stats["agreed"] / compared, 3) if compared else None,
+            "confident_agreement": (
+                round(self.stats["confident_agreed"] / self.stats["confident_compared"], 3)
+                if self.stats["confident_compared"] else None
+            ),
+            "tag_overlap": round(self.stats["tag_overlap"] / compared, 3) if compared else None,
+            "version": self.model.version if self.model else None,
+            "examples": self.model.examples if self.model else 0,
+            "labels": len(self.model.labels) if self.model else 0
+        }
+
+    async def run(self):
+        """Train (when holding the lease) or pick up the trainer's model, until stopped"""
+        while self.running:
+            try:
+                await self.load()
+                if await self._claim():
+                    # Catch up in full batches, then wait for new labels
+                    while self.running and await self.train() >= settings.CLASSIFIER_TRAIN_LIMIT:
+                        pass
+            except Exception as e:
+                logger.error(f"Error training classifier: {str(e)}")
+            await asyncio.sleep(settings.CLASSIFIER_TRAIN_INTERVAL)
+
+    async def start(self):
+        """Start the training task"""
+        if not settings.CLASSIFIER_ENABLED:
+            return
+        self.running = True
+        self.task = asyncio.create_task(self.run())
+        logger.info("Started local classifier training")
+
+    async def stop(self):
+        """Stop the training task"""
+        if self.running:
+            self.running = False
+            if self.task:
+                self.task.cancel()
+                try:
+                    await self.task
+                except asyncio.CancelledError:
+                    pass
+            logger.info("Stopped local classifier training")
+
+@lru_cache()
+def get_local_classifier() -> LocalClassifier:
+    """Get the shared local classifier instance"""
+    return LocalClassifier()
@@ -1,15 +1,26 @@
 from typing import List
 from app.models.category import Category
 from app.models.tag import Tag
+from app.services.autocomplete import get_autocomplete_service
+from app.services.bulk import BulkMetadataService
+from app.services.catalog import get_catalog_cache
 
 class ConfigService:
+    def __init__(self):
+        self.autocomplete = get_autocomplete_service()
+        self.catalog = get_catalog_cache()
+        self.bulk = BulkMetadataService()
+
     async def get_categories(self) -> List[Category]:
         """Get all categories"""
-        return await Category.find_all().to_list()
+        return await self.catalog.get_categories()
 
     async def create_category(self, category: Category) -> Category:
         """Create a new category"""
-        return await category.create()
+        category = await category.create()
+        await self.catalog.invalidate()
+        self.autocomplete.categories.add(category.name, 0)
+        return category
 
     async def delete_category(self, name: str):
         """Delete a category"""
@@ -17,18 +28,41 @@ class ConfigService:
         if not category:
             raise ValueError(f"Category {name} not found")
         await category.delete()
+        await self.catalog.invalidate()
+        self.autocomplete.categories.remove(name)
+
+    async def rename_category(self, name: str, new_name: str) -> dict:
+        """Rename a category and every document reference to it"""
+        if not await Category.find_one(Category.name == name):
+            raise ValueError(f"Category {name} not found")
+        result = await self.bulk.rename_label("categories", name, new_name)
+        await self.catalog.invalidate()
+        return result
 
     async def get_tags(self) -> List[Tag]:
         """Get all tags"""
-        return await Tag.find_all().to_list()
+        return await self.catalog.get_tags()
 
     async def create_tag(self, tag: Tag) -> Tag:
         """Create a new tag"""
-        return await tag.create()
+        tag = await tag.create()
+        await self.catalog.invalidate()
+        self.autocomplete.tags.add(tag.name, 0)
+        return tag
 
     async def delete_tag(self, name: str):
         """Delete a tag"""
         tag = await Tag.find_one(Tag.name == name)
         if not tag:
             raise ValueError(f"Tag {name} not found")
-        await tag.delete() 
\ No newline at end of file
+        await tag.delete()
+        await self.catalog.invalidate()
+        self.autocomplete.tags.remove(name) 
+
+    async def rename_tag(self, name: str, new_name: str) -> dict:
+        """Rename a tag and every document reference to it"""
+        if not await Tag.find_one(Tag.name == name):
+            raise ValueError(f"Tag {name} not found")
+        result = await self.bulk.rename_label("tags", name, new_name)
+        await self.catalog.invalidate()
+        return result
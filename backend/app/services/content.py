@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ..core.config import settings
+from ..core.database import read_collection
+from ..models.content import DocumentContent
+from ..models.document import Document, LIVE
+from .extraction import get_extraction_service
+from .similarity import signature_fields
+from .vector_index import embedding_fields
+from .storage.factory import get_storage_provider
+
+logger = logging.getLogger(__name__)
+
+# GridFS bucket for texts too large to inline
+GRIDFS_BUCKET = "document_content_files"
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), settings.CONTENT_COMPRESSION_LEVEL)
+
+def decompress_text(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+def derived_fields(text: str) -> Dict:
+    """Near-duplicate signature and embedding of a text"""
+    return {**signature_fields(text), **embedding_fields(text)}
+
+class DocumentContentService:
+    """Stores and lazily loads extracted text, summaries and page data"""
+
+    def _gridfs(self) -> AsyncIOMotorGridFSBucket:
+        database = DocumentContent.get_motor_collection().database
+        return AsyncIOMotorGridFSBucket(database, bucket_name=GRIDFS_BUCKET)
+
+    async def extract(self, file_content: bytes, mime_type: str) -> Optional[str]:
+        """Extract text from a file, returning None for unsupported types"""
+        try:
+            result = await get_extraction_service().extract(file_content, mime_type)
+            return result["text"]
+        except ValueError:
+            logger.debug(f"No extractable text for mime type {mime_type}")
+            return None
+
+    async def save(
+        self,
+        document: Document,
+        text: Optional[str] = None,
+        summary: Optional[str] = None,
+        pages: Optional[List[Dict]] = None
+    ) -> None:
+        """
+        Create or update the content of a document (None leaves a field as is).
+
+        Only the given fields are written, with one upsert, so concurrent
+        saves of different fields (e.g. the upload's extraction and the
+        enrichment's summary) don't overwrite each other.
+        """
+        document_id = str(document.id)
+        now = datetime.utcnow()
+        fields: Dict = {"updated_at": now}
+        if text is not None:
+            compressed = compress_text(text)
+            if len(compressed) > settings.CONTENT_INLINE_MAX_BYTES:
+                fields["text_file_id"] = await self._gridfs().upload_from_stream(
+                    f"{document_id}.txt.z",
+                    compressed,
+                    metadata={"document_id": document_id}
+                )
+                fields["text"] = None
+            else:
+                fields["text"] = compressed
+                fields["text_file_id"] = None
+            fields["text_length"] = len(text)
+            fields["compressed_size"] = len(compressed)
+            fields["extracted_at"] = now
+            fields.update(await asyncio.get_running_loop().run_in_executor(None, derived_fields, text))
+        if summary is not None:
+            fields["summary"] = summary
+        if pages is not None:
+            fields["pages"] = zlib.compress(json.dumps(pages).encode("utf-8"), settings.CONTENT_COMPRESSION_LEVEL)
+
+        # A new entry gets every other field at its default
+        on_insert = {
+            name: field.get_default(call_default_factory=True)
+            for name, field in DocumentContent.model_fields.items()
+            if name not in fields and name not in ("id", "revision_id", "document_id", "owner_id")
+        }
+        on_insert.update(owner_id=document.owner_id, created_at=now)
+        collection = DocumentContent.get_motor_collection()
+        for attempt in range(2):
+            try:
+                before = await collection.find_one_and_update(
+                    {"document_id": document_id},
+                    {"$set": fields, "$setOnInsert": on_insert},
+                    projection={"text_file_id": 1},
+                    upsert=True,
+                    return_document=ReturnDocument.BEFORE
+                )
+                break
+            except DuplicateKeyError:
+                # Another save inserted the entry first: update it instead
+                if attempt:
+                    raise
+
+        # The text was replaced: drop its old GridFS file
+        if text is not None and before and before.get("text_file_id"):
+            await self._gridfs().delete(before["text_file_id"])
+
+    async def extract_and_save(self, document: Document, file_content: bytes) -> Optional[str]:
+        """Extract a file's text and store it; returns the text"""
+        text = await self.extract(file_content, document.mime_type)
+        if text is not None:
+            await self.save(document, text=text)
+        return text
+
+    async def _load_text(self, row: Dict) -> Optional[str]:
+        if row.get("text") is not None:
+            return decompress_text(row["text"])
+        if row.get("text_file_id") is not None:
+            stream = await self._gridfs().open_download_stream(row["text_file_id"])
+            return decompress_text(await stream.read())
+        return None
+
+    async def get_text(self, document_id: str) -> Optional[str]:
+        """Load and decompress one document's text"""
+        texts = await self.get_texts([document_id])
+        return texts.get(document_id)
+
+    async def get_texts(self, document_ids: List[str], workload: str = "search") -> Dict[str, str]:
+        """Load the texts of several documents in one query"""
+        texts = {}
+        cursor = read_collection(DocumentContent, workload).find(
+            {"document_id": {"$in": document_ids}},
+            {"document_id": 1, "text": 1, "text_file_id": 1}
+        )
+        async for row in cursor:
+            text = await self._load_text(row)
+            if text is not None:
+                texts[row["document_id"]] = text
+        return texts
+
+    async def get(self, document_id: str) -> Optional[Dict]:
+        """Everything stored for a document, decompressed"""
+        row = await DocumentContent.get_motor_collection().find_one({"document_id": document_id})
+        if row is None:
+            return None
+        return {
+            "document_id": document_id,
+            "text": await self._load_text(row),
+            "text_length": row.get("text_length", 0),
+            "compressed_size": row.get("compressed_size", 0),
+            "summary": row.get("summary"),
+            "pages": json.loads(zlib.decompress(row["pages"])) if row.get("pages") else None,
+            "extracted_at": row.get("extracted_at")
+        }
+
+    async def delete(self, document_id: str) -> None:
+        """Remove a document's content (and its GridFS file)"""
+        try:
+            content = await DocumentContent.find_one(DocumentContent.document_id == document_id)
+            if content is None:
+                return
+            if content.text_file_id:
+                await self._gridfs().delete(content.text_file_id)
+            await content.delete()
+        except Exception as e:
+            logger.error(f"Error deleting content of document {document_id}: {str(e)}")
+
+    async def delete_many(self, document_ids: List[str]) -> None:
+        """Remove the content of many documents with one delete"""
+        collection = DocumentContent.get_motor_collection()
+        query = {"document_id": {"$in": document_ids}}
+        async for row in collection.find({**query, "text_file_id": {"$ne": None}}, {"text_file_id": 1}):
+            await self._gridfs().delete(row["text_file_id"])
+        await collection.delete_many(query)
+
+    async def backfill(self, batch_size: int = 50, limit: Optional[int] = None, dry_run: bool = False) -> Dict:
+        """
+        Create content entries for documents that have none.
+
+        Documents without content are downloaded and extracted. Existing
+        content without a near-duplicate signature or embedding gets them.
+        Safe to interrupt and re-run.
+        """
+        results = {"extracted": 0, "signed": 0, "unsupported": 0, "failed": 0, "failed_documents": []}
+
+        # 1. Documents with no content at all: download and extract
+        storage = get_storage_provider()
+        existing = set(await DocumentContent.get_motor_collection().distinct("document_id"))
+        processed = 0
+        batch = []
+        async for document in Document.find(LIVE):
+            if str(document.id) in existing:
+                continue
+            if limit is not None and processed >= limit:
+                break
+            processed += 1
+            batch.append(document)
+            if len(batch) >= batch_size:
+                await self._backfill_batch(batch, storage, results, dry_run)
+                batch = []
+        if batch:
+            await self._backfill_batch(batch, storage, results, dry_run)
+
+        # 2. Content extracted before near-duplicate signatures and
+        # embeddings existed
+        collection = DocumentContent.get_motor_collection()
+        query = {"$or": [{"minhash": None}, {"embedded_at": None}], "text_length": {"$gt": 0}}
+        async for row in collection.find(query, {"text": 1, "text_file_id": 1}):
+            if not dry_run:
+                text = await self._load_text(row)
+                if text is not None:
+                    await collection.update_one(
+                        {"_id": row["_id"]},
+                        {"$set": await asyncio.get_running_loop().run_in_executor(None, derived_fields, text)}
+                    )
+            results["signed"] += 1
+
+        return results
+
+    async def _backfill_batch(self, documents: List[Document], storage, results: Dict, dry_run: bool) -> None:
+        for document in documents:
+            try:
+                if dry_run:
+                    results["extracted"] += 1
+                    continue
+                file_content = (await storage.download_file(document.s3_key)).read()
+                if await self.extract_and_save(document, file_content) is None:
+                    results["unsupported"] += 1
+                else:
+                    results["extracted"] += 1
+            except Exception as e:
+                logger.error(f"Error backfilling content of {document.id}: {str(e)}")
+                results["failed"] += 1
+                results["failed_documents"].append(str(document.id))
+        logger.info(
+            f"Backfill progress: {results['extracted']} extracted, "
+            f"{results['unsupported']} unsupported, {results['failed']} failed"
+        )
+
+@lru_cache()
+def get_content_service() -> DocumentContentService:
+    """Get the shared document content service instance"""
+    return DocumentContentService()
@@ -1,14 +1,64 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from fastapi import UploadFile, HTTPException
+from bson import ObjectId
+from pymongo import ReturnDocument
 import mimetypes
 from datetime import datetime
 
-from ..models.document import Document
+from ..models.document import Document, LIVE
 from .storage.factory import get_storage_provider
+from .storage.inventory import get_storage_inventory
+from .storage.key_filter import get_storage_key_filter
+from .search.service import get_search_service
+from .autocomplete import get_autocomplete_service
+from .content import get_content_service
+from .purge import get_document_purger
+
+def merged_labels(field: str, add: List[str], remove: List[str]) -> Dict:
+    """Aggregation expression: a label array without remove, then with add appended once"""
+    return {"$let": {
+        "vars": {"kept": {"$filter": {
+            "input": {"$ifNull": [f"${field}", []]},
+            "cond": {"$not": [{"$in": ["$$this", {"$literal": remove}]}]}
+        }}},
+        "in": {"$concatArrays": ["$$kept", {"$filter": {
+            "input": {"$literal": add},
+            "cond": {"$not": [{"$in": ["$$this", "$$kept"]}]}
+        }}]}
+    }}
+
+def _patch_update(set_fields: Dict, add: Dict, remove: Dict, now: datetime):
+    """
+    Build the update for patch_document.
+
+    Plain operators are used whenever possible. MongoDB rejects $addToSet
+    and $pull on the same array in one update, so a field that gets both
+    is rewritten with an (equally atomic) aggregation pipeline instead.
+    """
+    if not set(add) & set(remove):
+        update = {"$set": {**set_fields, "updated_at": now}, "$inc": {"revision": 1}}
+        if add:
+            update["$addToSet"] = {field: {"$each": values} for field, values in add.items()}
+        if remove:
+            update["$pull"] = {field: {"$in": values} for field, values in remove.items()}
+        return update
+
+    stage = {field: {"$literal": value} for field, value in set_fields.items()}
+    stage["updated_at"] = now
+    stage["revision"] = {"$add": [{"$ifNull": ["$revision", 0]}, 1]}
+    for field in set(add) | set(remove):
+        stage[field] = merged_labels(field, add.get(field, []), remove.get(field, []))
+    return [{"$set": stage}]
 
 class DocumentService:
     def __init__(self):
         self.storage = get_storage_provider()
+        self.inventory = get_storage_inventory()
+        self.key_filter = get_storage_key_filter()
+        self.search = get_search_service()
+        self.content = get_content_service()
+        self.autocomplete = get_autocomplete_service()
+        self.purger = get_document_purger()
 
     async def create_document(
         self,
@@ -54,6 +104,10 @@ class DocumentService:
             try:
                 # Then save document metadata
                 await document.insert()
+                await self.inventory.object_added(file_path, file_size)
+                self.key_filter.key_added(file_path)
+                await self.search.index_document(document, file_content)
+                self.autocomplete.document_added(document)
                 return document
             except Exception as e:
                 # If MongoDB insert fails, clean up storage
@@ -73,16 +127,24 @@ class DocumentService:
     async def get_document(self, document_id: str, owner_id: str) -> Document:
         """Get a document by ID"""
         document = await Document.get(document_id)
-        if not document or document.owner_id != owner_id:
+        if not document or document.owner_id != owner_id or document.deleted_at:
             raise HTTPException(status_code=404, detail="Document not found")
         
+        # A definite miss from the key filter needs no round-trip. It only
+        # answers 404 here; removing the metadata is left to the inventory
+        # based cleanup, which is authoritative
+        if not self.key_filter.might_exist(document.s3_key, document.created_at):
+            raise HTTPException(status_code=404, detail="Document not found in storage")
+        
         try:
             # Verify file exists in storage
             await self.storage.get_file_info(document.s3_key)
+            self.key_filter.confirm(document.s3_key, True)
         except HTTPException as e:
             if e.status_code == 404:
+                self.key_filter.confirm(document.s3_key, False)
                 # File doesn't exist in storage, clean up orphaned metadata
-                await document.delete()
+                await self._tombstone_orphans([document])
                 raise HTTPException(
                     status_code=404,
                     detail="Document not found in storage. Metadata has been cleaned up."
@@ -100,7 +162,7 @@ class DocumentService:
         tag: Optional[str] = None
     ) -> List[Document]:
         """List documents with optional filtering"""
-        query = Document.find(Document.owner_id == owner_id)
+        query = Document.find(Document.owner_id == owner_id, LIVE)
         
         if category:
             query = query.find(Document.categories == category)
@@ -112,13 +174,17 @@ class DocumentService:
         
         # Check each document's file existence and clean up orphaned ones
         for doc in documents:
+            if not self.key_filter.might_exist(doc.s3_key, doc.created_at):
+                continue
             try:
                 await self.storage.get_file_info(doc.s3_key)
+                self.key_filter.confirm(doc.s3_key, True)
                 valid_documents.append(doc)
             except HTTPException as e:
                 if e.status_code == 404:
+                    self.key_filter.confirm(doc.s3_key, False)
                     # File doesn't exist in storage, delete the orphaned metadata
-                    await doc.delete()
+                    await self._tombstone_orphans([doc])
                 else:
                     # For other errors, keep the document in the list
                     valid_documents.append(doc)
@@ -128,19 +194,65 @@ class DocumentService:
         end = min(start + limit, len(valid_documents))
         return valid_documents[start:end]
 
+    def _tombstone_update(self, now: datetime) -> Dict:
+        return {
+            "$set": {"deleted_at": now, "purge_after": now, "updated_at": now},
+            "$inc": {"revision": 1}
+        }
+
+    async def _hide(self, documents: List[Document]) -> None:
+        # Search entries go right away: a restart must not load them again
+        await self.search.remove_documents([str(document.id) for document in documents])
+        for document in documents:
+            self.autocomplete.document_removed(document)
+
+    async def _tombstone_orphans(self, documents: List[Document]) -> int:
+        # Orphans go through the purger like any delete, so their shares,
+        # jobs and index entries are removed with them
+        result = await Document.get_motor_collection().update_many(
+            {"_id": {"$in": [document.id for document in documents]}, **LIVE},
+            self._tombstone_update(datetime.utcnow())
+        )
+        await self._hide(documents)
+        self.purger.wake()
+        return result.modified_count
+
     async def delete_document(self, document_id: str, owner_id: str) -> None:
-        """Delete a document"""
-        document = await self.get_document(document_id, owner_id)
-        
-        try:
-            # Delete from storage first
-            await self.storage.delete_file(document.s3_key)
-        except HTTPException as e:
-            if e.status_code != 404:  # Ignore if already deleted
-                raise
-        
-        # Then delete metadata
-        await document.delete()
+        """
+        Delete a document.
+
+        Only writes the tombstone; the file, shares and metadata are removed
+        by the background purger.
+        """
+        if not ObjectId.is_valid(document_id):
+            raise HTTPException(status_code=404, detail="Document not found")
+        before = await Document.get_motor_collection().find_one_and_update(
+            {"_id": ObjectId(document_id), "owner_id": owner_id, **LIVE},
+            self._tombstone_update(datetime.utcnow()),
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        await self._hide([Document.model_validate(before)])
+        self.purger.wake()
+
+    async def delete_documents(self, document_ids: List[str], owner_id: str) -> List[str]:
+        """Delete many documents (tombstones only); returns the ids deleted"""
+        ids = [ObjectId(doc_id) for doc_id in document_ids if ObjectId.is_valid(doc_id)]
+        collection = Document.get_motor_collection()
+        documents = [
+            Document.model_validate(row)
+            async for row in collection.find({"_id": {"$in": ids}, "owner_id": owner_id, **LIVE})
+        ]
+        if not documents:
+            return []
+        await collection.update_many(
+            {"_id": {"$in": [document.id for document in documents]}, **LIVE},
+            self._tombstone_update(datetime.utcnow())
+        )
+        await self._hide(documents)
+        self.purger.wake()
+        return [str(document.id) for document in documents]
 
     async def generate_download_url(self, document_id: str, owner_id: str) -> str:
         """Generate a download URL for a document"""
@@ -157,28 +269,93 @@ class DocumentService:
         tags: Optional[List[str]] = None
     ) -> Document:
         """Update document metadata"""
-        document = await self.get_document(document_id, owner_id)
-        
-        if title is not None:
-            document.title = title
-        if description is not None:
-            document.description = description
-        if categories is not None:
-            document.categories = categories
-        if tags is not None:
-            document.tags = tags
-            
-        await document.save()
+        return await self.patch_document(
+            document_id,
+            owner_id,
+            set_fields={
+                "title": title,
+                "description": description,
+                "categories": categories,
+                "tags": tags
+            }
+        )
+
+    async def patch_document(
+        self,
+        document_id: str,
+        owner_id: str,
+        revision: Optional[int] = None,
+        set_fields: Optional[Dict] = None,
+        add_tags: Optional[List[str]] = None,
+        remove_tags: Optional[List[str]] = None,
+        add_categories: Optional[List[str]] = None,
+        remove_categories: Optional[List[str]] = None
+    ) -> Document:
+        """
+        Apply a partial metadata update in a single atomic write.
+
+        Only the given fields are written ($set), labels are added/removed
+        with $addToSet/$pull, and every update bumps the revision. When a
+        revision is given the update only applies if the document is still
+        at that revision, otherwise a 409 is raised.
+        """
+        set_fields = {key: value for key, value in (set_fields or {}).items() if value is not None}
+        add = {
+            field: list(dict.fromkeys(values))
+            for field, values in (("tags", add_tags), ("categories", add_categories)) if values
+        }
+        remove = {
+            field: values
+            for field, values in (("tags", remove_tags), ("categories", remove_categories)) if values
+        }
+        if set(set_fields) & (set(add) | set(remove)):
+            raise HTTPException(
+                status_code=400,
+                detail="A field cannot be replaced and modified in the same update"
+            )
+        if not set_fields and not add and not remove:
+            raise HTTPException(status_code=400, detail="No changes requested")
+
+        if not ObjectId.is_valid(document_id):
+            raise HTTPException(status_code=404, detail="Document not found")
+        query = {"_id": ObjectId(document_id), "owner_id": owner_id, **LIVE}
+        if revision is not None:
+            # Documents written before revisions existed have no field yet
+            query["revision"] = revision if revision else {"$in": [0, None]}
+
+        now = datetime.utcnow()
+        before = await Document.get_motor_collection().find_one_and_update(
+            query,
+            _patch_update(set_fields, add, remove, now),
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            current = await Document.find_one({"_id": ObjectId(document_id), "owner_id": owner_id, **LIVE})
+            if current is None:
+                raise HTTPException(status_code=404, detail="Document not found")
+            raise HTTPException(
+                status_code=409,
+                detail=f"Document was modified concurrently (current revision {current.revision})"
+            )
+
+        old = Document.model_validate(before)
+        document = old.model_copy(deep=True)
+        for field, value in set_fields.items():
+            setattr(document, field, value)
+        for field in ("tags", "categories"):
+            values = [value for value in getattr(document, field) if value not in remove.get(field, [])]
+            values += [value for value in add.get(field, []) if value not in values]
+            setattr(document, field, values)
+        document.updated_at = now
+        document.revision = old.revision + 1
+
+        await self.search.index_document(document)
+        self.autocomplete.document_updated(owner_id, old.title, old.categories, old.tags, document)
         return document
 
     async def cleanup_orphaned_documents(self) -> int:
-        """Clean up documents where storage file is missing"""
-        cleaned = 0
-        async for doc in Document.find_all():
-            try:
-                await self.storage.get_file_info(doc.s3_key)
-            except HTTPException as e:
-                if e.status_code == 404:
-                    await doc.delete()
-                    cleaned += 1
-        return cleaned 
\ No newline at end of file
+        """Clean up documents whose storage file is missing from the inventory"""
+        documents = await self.inventory.missing_objects()
+        if not documents:
+            return 0
+        return await self._tombstone_orphans(documents)
@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+
+from ..core.config import settings
+from ..models.analysis import AnalysisJob
+from ..models.document import Document
+from .ai_analysis import AIAnalysisService, AIServiceError
+from .content import get_content_service
+from .extraction import is_supported
+from .document import DocumentService
+from .storage.factory import get_storage_provider
+
+logger = logging.getLogger(__name__)
+
+# AI errors that retrying cannot fix
+PERMANENT_ERRORS = {"configuration_error", "authentication_error"}
+
+class EnrichmentQueue:
+    """
+    Persistent queue of AI enrichment jobs, processed by a pool of workers.
+
+    Jobs live in MongoDB, one per document. Workers claim the oldest due
+    job with find_one_and_update and hold it under a lease, so any number
+    of workers (in any number of processes) can share the queue and a job
+    whose worker died is picked up again once the lease expires. Failed
+    jobs are retried with exponential backoff; after
+    ENRICHMENT_MAX_ATTEMPTS, or on an error retrying cannot fix, they are
+    dead-lettered (status "dead") until enqueued again.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.storage = get_storage_provider()
+        self.content = get_content_service()
+        self.documents = DocumentService()
+        self.ai_service: Optional[AIAnalysisService] = None
+        self.workers: List[asyncio.Task] = []
+        self.running = False
+        self._wake = asyncio.Event()
+        self.stats = {"done": 0, "retried": 0, "dead": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.ANTHROPIC_API_KEY)
+
+    @staticmethod
+    def _collection():
+        return AnalysisJob.get_motor_collection()
+
+    @staticmethod
+    def _enqueue_update(document: Document, now: datetime) -> UpdateOne:
+        return UpdateOne(
+            {"document_id": str(document.id)},
+            {
+                "$set": {
+                    "owner_id": document.owner_id,
+                    "status": "queued",
+                    "attempts": 0,
+                    "run_after": now,
+                    "locked_by": None,
+                    "locked_until": None,
+                    "error": None,
+                    "updated_at": now
+                },
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True
+        )
+
+    async def enqueue_many(self, documents: List[Document]) -> int:
+        """Queue (or re-queue) enrichment of documents; returns how many were queued"""
+        documents = [document for document in documents if is_supported(document.mime_type)]
+        if not documents or not self.enabled:
+            return 0
+        now = datetime.utcnow()
+        try:
+            await self._collection().bulk_write(
+                [self._enqueue_update(document, now) for document in documents],
+                ordered=False
+            )
+        except Exception as e:
+            # Enrichment is best effort; the upload itself has succeeded
+            logger.error(f"Error queueing AI enrichment: {str(e)}")
+            return 0
+        self._wake.set()
+        return len(documents)
+
+    async def enqueue(self, document: Document) -> bool:
+        return await self.enqueue_many([document]) == 1
+
+    async def status(self, document_id: str) -> Optional[Dict]:
+        """The enrichment job of a document, if any"""
+        return await self._collection().find_one(
+            {"document_id": document_id},
+            {"_id": 0, "locked_by": 0}
+        )
+
+    async def claim(self) -> Optional[Dict]:
+        """Take the oldest due job (or one whose worker's lease ran out)"""
+        now = datetime.utcnow()
+        return await self._collection().find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_after": {"$lte": now}},
+                {"status": "running", "locked_until": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "locked_by": self.worker_id,
+                    "locked_until": now + timedelta(seconds=settings.ENRICHMENT_LEASE_SECONDS),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_after", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, job: Dict, update: Dict) -> None:
+        now = datetime.utcnow()
+        update.setdefault("$set", {}).update({"locked_by": None, "locked_until": None, "updated_at": now})
+        # Only if still ours: a re-upload may have re-queued it meanwhile
+        await self._collection().update_one(
+            {"_id": job["_id"], "locked_by": self.worker_id, "attempts": job["attempts"]},
+            update
+        )
+
+    async def _enrich(self, job: Dict) -> Optional[Dict]:
+        """Analyze the document and write the results onto it; None if it's gone"""
+        document = await Document.get(job["document_id"])
+        if document is None or document.deleted_at:
+            return None
+
+        file_content = (await self.storage.download_file(document.s3_key)).read()
+        if self.ai_service is None:
+            self.ai_service = AIAnalysisService()
+        # A summary is only needed to fill an empty description; labels
+        # alone can come from the local classifier
+        result = await self.ai_service.analyze(file_content, document.mime_type, summary=not document.description)
+        return await self.save_result(document, result)
+
+    async def save_result(self, document: Document, result: Dict) -> Dict:
+        """Write an analysis onto a document (also used by the re-analysis backfill)"""
+        await self.content.save(document, summary=result["summary"])
+        # Keep what the user entered: the summary only fills an empty
+        # description, suggested labels are added to the existing ones
+        set_fields = {} if document.description or not result["summary"] else {"description": result["summary"]}
+        add_tags = [tag for tag in result["tags"] if tag not in document.tags]
+        add_categories = [category for category in result["categories"] if category not in document.categories]
+        if set_fields or add_tags or add_categories:
+            await self.documents.patch_document(
+                str(document.id),
+                document.owner_id,
+                revision=document.revision,
+                set_fields=set_fields,
+                add_tags=add_tags,
+                add_categories=add_categories
+            )
+        return {"summary": result["summary"], "categories": result["categories"], "tags": result["tags"]}
+
+    def _retry_delay(self, attempts: int) -> timedelta:
+        seconds = settings.ENRICHMENT_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        return timedelta(seconds=min(seconds, settings.ENRICHMENT_RETRY_MAX_SECONDS))
+
+    async def process(self, job: Dict) -> None:
+        """Run one claimed job and record the outcome"""
+        try:
+            result = await self._enrich(job)
+        except Exception as e:
+            retry_after = None
+            if isinstance(e, AIServiceError):
+                error, permanent = e.message, e.error_type in PERMANENT_ERRORS
+                retry_after = e.retry_after
+            elif isinstance(e, HTTPException):
+                # 409: the document was edited meanwhile, try again with the new revision
+                error, permanent = str(e.detail), e.status_code == 404
+            else:
+                error, permanent = str(e), False
+
+            if permanent or job["attempts"] >= settings.ENRICHMENT_MAX_ATTEMPTS:
+                logger.error(f"Giving up on enrichment of {job['document_id']}: {error}")
+                self.stats["dead"] += 1
+                await self._finish(job, {"$set": {
+                    "status": "dead",
+                    "error": error,
+                    "finished_at": datetime.utcnow()
+                }})
+            else:
+                delay = self._retry_delay(job["attempts"])
+                if retry_after:
+                    delay = max(delay, timedelta(seconds=retry_after))
+                logger.warning(f"Enrichment of {job['document_id']} failed, retrying in {delay}: {error}")
+                self.stats["retried"] += 1
+                await self._finish(job, {"$set": {
+                    "status": "queued",
+                    "error": error,
+                    "run_after": datetime.utcnow() + delay
+                }})
+            return
+
+        self.stats["done"] += 1
+        await self._finish(job, {"$set": {
+            "status": "done" if result is not None else "cancelled",
+            "result": result,
+            "error": None,
+            "finished_at": datetime.utcnow()
+        }})
+
+    async def worker(self):
+        """Claim and process jobs until stopped"""
+        while self.running:
+            try:
+                job = await self.claim()
+            except Exception as e:
+                logger.error(f"Error claiming enrichment job: {str(e)}")
+                job = None
+            if job is None:
+                # Idle: wait for a local enqueue, or poll for other workers' jobs
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=settings.ENRICHMENT_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.process(job)
+
+    async def queue_depth(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        pipeline = [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+        return {
+            row["_id"]: row["count"]
+            async for row in self._collection().aggregate(pipeline)
+        }
+
+    def metrics(self) -> Dict:
+        return {**self.stats, "workers": len(self.workers)}
+
+    async def start(self):
+        """Start the worker pool"""
+        if not self.enabled:
+            logger.info("AI enrichment disabled (no API key configured)")
+            return
+        self.running = True
+        self.workers = [
+            asyncio.create_task(self.worker())
+            for _ in range(settings.ENRICHMENT_WORKERS)
+        ]
+        logger.info(f"Started {len(self.workers)} AI enrichment workers")
+
+    async def stop(self):
+        """Stop the workers; running jobs are picked up again after their lease"""
+        if self.running:
+            self.running = False
+            for task in self.workers:
+                task.cancel()
+            await asyncio.gather(*self.workers, return_exceptions=True)
+            self.workers = []
+            logger.info("Stopped AI enrichment workers")
+
+@lru_cache()
+def get_enrichment_queue() -> EnrichmentQueue:
+    """Get the shared AI enrichment queue instance"""
+    return EnrichmentQueue()
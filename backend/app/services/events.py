@@ -0,0 +1,350 @@
+import asyncio
+import fcntl
+import inspect
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+from pydantic import BaseModel, Field
+from pymongo.errors import OperationFailure, PyMongoError
+
+from ..core.config import settings
+from ..models.document import Document
+
+logger = logging.getLogger(__name__)
+
+# Collections watched by the bus
+WATCHED_COLLECTIONS = ["documents", "categories", "tags", "shares", "catalog_version", "search_index"]
+
+# Polling fallback: field used as a change watermark, or None to diff a
+# full snapshot (only for small collections; it is the only way to see deletes).
+# Polled in this order: search entries before the tombstones that drop them
+POLL_WATERMARKS = {
+    "search_index": "updated_at",
+    "documents": "updated_at",
+    "shares": "updated_at",
+    "catalog_version": None
+}
+
+# Snapshots only diffed when another collection changes: every catalog
+# write bumps catalog_version, so categories and tags are read only then
+POLL_FOLLOWERS = {"catalog_version": ["categories", "tags"]}
+
+# Rows read per query while polling
+POLL_PAGE_SIZE = 1000
+
+# Where each consumer's resume token is persisted
+TOKEN_COLLECTION = "change_stream_tokens"
+
+# Tokens of consumers that stopped (e.g. a restarted worker) expire
+TOKEN_TTL_SECONDS = 7 * 24 * 3600
+
+# Server error codes: change streams need a replica set / history is gone
+NOT_A_REPLICA_SET = 40573
+HISTORY_LOST = 286
+
+class ChangeEvent(BaseModel):
+    """A change to one document in a watched collection"""
+    collection: str
+    operation: str  # insert, update, replace, delete, or resync after lost history
+    document_id: Optional[str] = None
+    document: Optional[Dict[str, Any]] = None  # Full document (not for deletes)
+    updated_fields: Dict[str, Any] = Field(default_factory=dict)
+    removed_fields: List[str] = Field(default_factory=list)
+
+Handler = Callable[[ChangeEvent], Any]
+
+class ChangeEventBus:
+    """
+    Fans out MongoDB changes to in-process subscribers.
+
+    On a replica set one database-level change stream covers all watched
+    collections, and its resume token is saved every few seconds so a
+    restarted worker continues where it left off. If the token is too old
+    to resume, subscribers get a "resync" event and should reload. On a
+    standalone server (no change streams) the bus polls instead.
+    """
+
+    def __init__(self):
+        # Resume token owner, set on start (see _claim_slot)
+        self.consumer: Optional[str] = settings.EVENT_BUS_CONSUMER or None
+        self._slot_file = None
+        self.subscribers: Dict[str, List[Handler]] = {}
+        self.mode: Optional[str] = None  # "change_stream" or "polling"
+        self.events_published = 0
+        self.task = None
+        self.running = False
+        self._token = None
+        self._token_saved_at = datetime.min
+
+    def subscribe(self, collection: str, handler: Handler) -> None:
+        """Call handler for every event on collection ("*" for all)"""
+        self.subscribers.setdefault(collection, []).append(handler)
+
+    def unsubscribe(self, collection: str, handler: Handler) -> None:
+        handlers = self.subscribers.get(collection, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    async def publish(self, event: ChangeEvent) -> None:
+        self.events_published += 1
+        handlers = self.subscribers.get(event.collection, []) + self.subscribers.get("*", [])
+        for handler in handlers:
+            try:
+                result = handler(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error in change event handler {handler}: {str(e)}", exc_info=True)
+
+    async def resync(self) -> None:
+        """Tell every subscriber to reload, e.g. after missed events"""
+        for collection in WATCHED_COLLECTIONS:
+            await self.publish(ChangeEvent(collection=collection, operation="resync"))
+
+    def _database(self):
+        return Document.get_motor_collection().database
+
+    def _claim_slot(self) -> str:
+        """
+        Consumer id of the lowest worker slot on this host not held by a live process.
+
+        Workers on a host must not share a token, and a restarted worker
+        should get its predecessor's back; the slot's lock file is released
+        when the process exits, so the replacement takes the same slot.
+        """
+        path = settings.EVENT_BUS_SLOT_PATH
+        os.makedirs(path, exist_ok=True)
+        slot = 0
+        while True:
+            lock_file = open(os.path.join(path, f"slot-{slot}.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                slot += 1
+                continue
+            self._slot_file = lock_file
+            return f"{socket.gethostname()}:{slot}"
+
+    async def _load_token(self):
+        await self._database()[TOKEN_COLLECTION].create_index("saved_at", expireAfterSeconds=TOKEN_TTL_SECONDS)
+        doc = await self._database()[TOKEN_COLLECTION].find_one({"_id": self.consumer})
+        return doc["token"] if doc else None
+
+    async def _save_token(self, force: bool = False) -> None:
+        now = datetime.utcnow()
+        if self._token is None:
+            return
+        if not force and (now - self._token_saved_at).total_seconds() < settings.EVENT_BUS_TOKEN_SAVE_INTERVAL:
+            return
+        await self._database()[TOKEN_COLLECTION].update_one(
+            {"_id": self.consumer},
+            {"$set": {"token": self._token, "saved_at": now}},
+            upsert=True
+        )
+        self._token_saved_at = now
+
+    @staticmethod
+    def _to_event(change: Dict) -> ChangeEvent:
+        description = change.get("updateDescription") or {}
+        return ChangeEvent(
+            collection=change["ns"]["coll"],
+            operation=change["operationType"],
+            document_id=str(change["documentKey"]["_id"]),
+            document=change.get("fullDocument"),
+            updated_fields=description.get("updatedFields", {}),
+            removed_fields=description.get("removedFields", [])
+        )
+
+    async def _watch(self) -> None:
+        """Consume the change stream until stopped"""
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": WATCHED_COLLECTIONS},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]}
+        }}]
+        token = await self._load_token()
+        try:
+            stream = self._database().watch(
+                pipeline,
+                full_document="updateLookup",
+                resume_after=token,
+                max_await_time_ms=1000
+            )
+            async with stream:
+                self.mode = "change_stream"
+                logger.info(f"Watching changes as {self.consumer} (resuming: {token is not None})")
+                while self.running and stream.alive:
+                    change = await stream.try_next()
+                    if change is not None:
+                        await self.publish(self._to_event(change))
+                    # Also advances while idle (post-batch resume token)
+                    self._token = stream.resume_token
+                    await self._save_token()
+        except OperationFailure as e:
+            if e.code == HISTORY_LOST and token is not None:
+                logger.warning("Change stream history lost, resyncing subscribers")
+                self._token = None
+                await self._database()[TOKEN_COLLECTION].delete_one({"_id": self.consumer})
+                await self.resync()
+                return
+            raise
+        finally:
+            await self._save_token(force=True)
+
+    async def _poll(self) -> None:
+        """Polling fallback for servers without change streams"""
+        self.mode = "polling"
+        logger.info("Change streams unavailable, polling for changes")
+        database = self._database()
+        watermarks: Dict[str, Any] = {}
+        recent: Dict[str, Dict[str, Any]] = {}
+        snapshots: Dict[str, Dict[str, Dict]] = {}
+
+        # Start from the current state; only later changes become events
+        for collection, field in POLL_WATERMARKS.items():
+            if field is None:
+                for name in [collection] + POLL_FOLLOWERS.get(collection, []):
+                    snapshots[name] = {str(doc["_id"]): doc async for doc in database[name].find()}
+                continue
+            latest = await database[collection].find_one({}, {field: 1}, sort=[(field, -1)])
+            watermarks[collection] = (latest or {}).get(field)
+            recent[collection] = {}
+            if watermarks[collection] is not None:
+                # Rows in the re-read window are already known
+                lag = timedelta(seconds=settings.EVENT_BUS_POLL_LAG)
+                async for doc in database[collection].find(
+                    {field: {"$gte": watermarks[collection] - lag}},
+                    {field: 1}
+                ):
+                    recent[collection][str(doc["_id"])] = doc[field]
+
+        while self.running:
+            await asyncio.sleep(settings.EVENT_BUS_POLL_INTERVAL)
+            for collection, field in POLL_WATERMARKS.items():
+                try:
+                    if field is None:
+                        await self._poll_snapshot(collection, snapshots)
+                    else:
+                        await self._poll_watermark(collection, field, watermarks, recent[collection])
+                except PyMongoError as e:
+                    logger.error(f"Error polling {collection} for changes: {str(e)}")
+
+    async def _poll_watermark(self, collection: str, field: str, watermarks: Dict, recent: Dict[str, Any]) -> None:
+        """
+        Publish the rows whose field moved past the collection's watermark.
+
+        Rows are read in (field, _id) order a page at a time, so rows that
+        share a timestamp are not lost at a page boundary. Timestamps come
+        from the writers' clocks and a write can commit after later ones
+        were seen, so the last EVENT_BUS_POLL_LAG seconds are read again;
+        recent holds the versions already published in that window.
+        """
+        watermark = watermarks[collection]
+        lag = timedelta(seconds=settings.EVENT_BUS_POLL_LAG)
+        query = {} if watermark is None else {field: {"$gte": watermark - lag}}
+        sort = [(field, 1), ("_id", 1)]
+
+        while True:
+            rows = await self._database()[collection].find(query).sort(sort).limit(POLL_PAGE_SIZE).to_list(length=None)
+            for doc in rows:
+                key = str(doc["_id"])
+                if doc.get(field) is None or recent.get(key) == doc[field]:
+                    continue
+                recent[key] = doc[field]
+                if watermark is None or doc[field] > watermark:
+                    watermark = doc[field]
+                await self.publish(ChangeEvent(
+                    collection=collection,
+                    # A changed updated_at can be an insert or an update
+                    operation="update",
+                    document_id=key,
+                    document=doc
+                ))
+            if len(rows) < POLL_PAGE_SIZE:
+                break
+            last = rows[-1]
+            query = {"$or": [
+                {field: {"$gt": last[field]}},
+                {field: last[field], "_id": {"$gt": last["_id"]}}
+            ]}
+        watermarks[collection] = watermark
+
+        # Forget rows that left the re-read window
+        if watermark is not None:
+            for key in [key for key, value in recent.items() if value < watermark - lag]:
+                del recent[key]
+
+    async def _poll_snapshot(self, collection: str, snapshots: Dict) -> None:
+        previous = snapshots[collection]
+        current = {str(doc["_id"]): doc async for doc in self._database()[collection].find()}
+        if current != previous:
+            # Followers change first, so their events precede this one's
+            for follower in POLL_FOLLOWERS.get(collection, []):
+                await self._poll_snapshot(follower, snapshots)
+        for doc_id, doc in current.items():
+            if doc_id in previous and previous[doc_id] == doc:
+                continue
+            await self.publish(ChangeEvent(
+                collection=collection,
+                operation="insert" if doc_id not in previous else "replace",
+                document_id=doc_id,
+                document=doc
+            ))
+        for doc_id in previous.keys() - current.keys():
+            await self.publish(ChangeEvent(collection=collection, operation="delete", document_id=doc_id))
+        snapshots[collection] = current
+
+    async def run(self) -> None:
+        """Watch changes (or poll), reconnecting after errors"""
+        while self.running:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                if e.code == NOT_A_REPLICA_SET or "replica set" in str(e):
+                    await self._poll()
+                    return
+                logger.error(f"Change stream failed: {str(e)}")
+            except PyMongoError as e:
+                logger.error(f"Change stream interrupted: {str(e)}")
+            if self.running:
+                await asyncio.sleep(settings.EVENT_BUS_POLL_INTERVAL)
+
+    def metrics(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "consumer": self.consumer,
+            "events_published": self.events_published,
+            "subscribers": {collection: len(handlers) for collection, handlers in self.subscribers.items()}
+        }
+
+    async def start(self):
+        """Start consuming changes"""
+        if self.consumer is None:
+            self.consumer = self._claim_slot()
+        self.running = True
+        self.task = asyncio.create_task(self.run())
+        logger.info("Started change event bus")
+
+    async def stop(self):
+        """Stop consuming changes"""
+        if self.running:
+            self.running = False
+            if self.task:
+                self.task.cancel()
+                try:
+                    await self.task
+                except asyncio.CancelledError:
+                    pass
+            if self._slot_file is not None:
+                self._slot_file.close()
+                self._slot_file = None
+                self.consumer = None
+            logger.info("Stopped change event bus")
+
+@lru_cache()
+def get_event_bus() -> ChangeEventBus:
+    """Get the shared change event bus instance"""
+    return ChangeEventBus()
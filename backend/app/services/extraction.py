@@ -0,0 +1,288 @@
+import asyncio
+import codecs
+import io
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+import PyPDF2
+from docx.api import Document
+from pptx import Presentation
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WORD_TYPES = [
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+]
+PPTX_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+class ExtractionError(ValueError):
+    """Text could not be extracted: unsupported type, malformed file, timeout or crash"""
+
+def is_supported(mime_type: str) -> bool:
+    return mime_type == "application/pdf" or mime_type in WORD_TYPES or mime_type == PPTX_TYPE or mime_type.startswith("text/")
+
+def page_sections(total: int, max_pages: Optional[int], sample: bool) -> List[List[int]]:
+    """
+    Page indexes to read, in sections.
+
+    Without a page budget all pages are read; with one, either the first
+    max_pages or, when sampling, the first half, a middle quarter and the
+    last quarter of the budget.
+    """
+    if not max_pages or total <= max_pages:
+        return [list(range(total))]
+    if not sample or max_pages < 3:
+        return [list(range(max_pages))]
+    head = max_pages // 2
+    tail = max_pages // 4
+    middle = max_pages - head - tail
+    middle_start = (total - middle) // 2
+    return [
+        list(range(head)),
+        list(range(middle_start, middle_start + middle)),
+        list(range(total - tail, total))
+    ]
+
+def _collect(sections: List[List[int]], page_text: Callable[[int], str], max_chars: Optional[int]) -> Dict:
+    """
+    Read pages section by section until the character budget is spent.
+
+    Each section gets an equal share of what is left of the budget, so a
+    wordy first section can't crowd out the sampled middle and end.
+    """
+    parts: List[str] = []
+    used = extracted = 0
+    truncated = False
+    for position, section in enumerate(sections):
+        budget = None if max_chars is None else (max_chars - used) // (len(sections) - position)
+        section_used = 0
+        for index in section:
+            if budget is not None and section_used >= budget:
+                truncated = True
+                break
+            text = page_text(index) or ""
+            extracted += 1
+            if budget is not None and section_used + len(text) > budget:
+                text = text[:budget - section_used]
+                truncated = True
+            parts.append(text)
+            section_used += len(text)
+        used += section_used
+    return {"text": "\n".join(parts), "pages_extracted": extracted, "truncated": truncated}
+
+# Extractors: run inside the worker processes
+
+def _extract_pdf(file_content: bytes, max_chars: Optional[int], max_pages: Optional[int], sample: bool) -> Dict:
+    pages = PyPDF2.PdfReader(io.BytesIO(file_content)).pages
+    sections = page_sections(len(pages), max_pages, sample)
+    result = _collect(sections, lambda index: pages[index].extract_text(), max_chars)
+    return {**result, "pages": len(pages), "truncated": result["truncated"] or result["pages_extracted"] < len(pages)}
+
+def _extract_word(file_content: bytes, max_chars: Optional[int], max_pages: Optional[int], sample: bool) -> Dict:
+    # Word files have no pages before layout; the character budget still applies
+    paragraphs = Document(io.BytesIO(file_content)).paragraphs
+    result = _collect([range(len(paragraphs))], lambda index: paragraphs[index].text, max_chars)
+    return {**result, "pages": 1, "pages_extracted": 1}
+
+def _extract_pptx(file_content: bytes, max_chars: Optional[int], max_pages: Optional[int], sample: bool) -> Dict:
+    slides = Presentation(io.BytesIO(file_content)).slides
+
+    def slide_text(index: int) -> str:
+        return "\n".join(filter(None, (
+            shape.text for shape in slides[index].shapes if hasattr(shape, "text")
+        )))
+
+    sections = page_sections(len(slides), max_pages, sample)
+    result = _collect(sections, slide_text, max_chars)
+    return {**result, "pages": len(slides), "truncated": result["truncated"] or result["pages_extracted"] < len(slides)}
+
+def _extract_plain(file_content: bytes, max_chars: Optional[int], max_pages: Optional[int], sample: bool) -> Dict:
+    # At most 4 bytes per character; the incremental decoder holds back a
+    # character cut in half instead of failing on it
+    data = file_content if max_chars is None else file_content[:max_chars * 4]
+    text = codecs.getincrementaldecoder("utf-8")().decode(data, final=data is file_content)
+    truncated = data is not file_content or (max_chars is not None and len(text) > max_chars)
+    return {"text": text[:max_chars], "pages": 1, "pages_extracted": 1, "truncated": truncated}
+
+def extract_sync(
+    file_content: bytes,
+    mime_type: str,
+    max_chars: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    sample: bool = False
+) -> Dict:
+    """
+    Extract text in the current process (blocking).
+
+    Reading stops as soon as max_chars characters or max_pages pages are
+    collected, so the cost is bounded by the budget, not the file size.
+    Returns text, pages (in the file), pages_extracted and truncated.
+    """
+    if mime_type == "application/pdf":
+        extractor = _extract_pdf
+    elif mime_type in WORD_TYPES:
+        extractor = _extract_word
+    elif mime_type == PPTX_TYPE:
+        extractor = _extract_pptx
+    elif mime_type.startswith("text/"):
+        extractor = _extract_plain
+    else:
+        raise ExtractionError(
+            f"Unsupported file type: {mime_type}. Supported types are: PDF, Word, PowerPoint, and text files."
+        )
+    return extractor(file_content, max_chars, max_pages, sample)
+
+def _init_worker(memory_limit_mb: int) -> None:
+    """Cap the worker's address space, so a decompression bomb fails with MemoryError"""
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        # Not available on every platform; the timeout still applies
+        logger.warning(f"Could not cap extraction worker memory: {str(e)}")
+
+def _run_extraction(
+    file_content: bytes,
+    mime_type: str,
+    max_chars: Optional[int],
+    max_pages: Optional[int],
+    sample: bool
+) -> Dict:
+    start = time.perf_counter()
+    result = extract_sync(file_content, mime_type, max_chars, max_pages, sample)
+    return {**result, "extract_seconds": time.perf_counter() - start}
+
+class ExtractionService:
+    """
+    Runs text extraction in a pool of worker processes.
+
+    PDF, Word and PowerPoint parsing is CPU-bound Python; in the pool it
+    no longer blocks the event loop and spreads over all cores. Workers
+    have an address-space cap and every task a timeout. At most one task
+    per worker is handed to the pool, so the timeout only counts time
+    spent extracting, not time queued behind other files. A task that
+    times out or crashes its worker only fails that file: the pool is
+    replaced, and other tasks caught in the restart are retried once.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        memory_limit_mb: Optional[int] = None
+    ):
+        self.workers = workers or settings.EXTRACTION_WORKERS or os.cpu_count() or 1
+        self.timeout = timeout or settings.EXTRACTION_TIMEOUT
+        self.memory_limit_mb = settings.EXTRACTION_MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.workers)
+        self._generation = 0
+        self.stats = {"tasks": 0, "timeouts": 0, "crashes": 0, "restarts": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,)
+            )
+        return self._pool
+
+    def _restart(self, generation: int) -> None:
+        """Kill the pool, unless another task already replaced it"""
+        if generation != self._generation or self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        self._generation += 1
+        self.stats["restarts"] += 1
+        # shutdown() waits for running tasks; a hung parser has to be killed
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Restarted the extraction worker pool")
+
+    async def extract(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        max_chars: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        sample: bool = False
+    ) -> Dict:
+        """
+        Extract text, optionally within a character/page budget (see
+        extract_sync). Returns text, pages, pages_extracted, truncated,
+        extract_seconds (in the worker) and seconds (including queueing).
+        Raises ExtractionError.
+        """
+        if not is_supported(mime_type):
+            raise ExtractionError(
+                f"Unsupported file type: {mime_type}. Supported types are: PDF, Word, PowerPoint, and text files."
+            )
+        start = time.perf_counter()
+        self.stats["tasks"] += 1
+        loop = asyncio.get_running_loop()
+
+        for attempt in (1, 2):
+            try:
+                async with self._slots:
+                    generation = self._generation
+                    future = loop.run_in_executor(
+                        self._get_pool(),
+                        _run_extraction,
+                        file_content,
+                        mime_type,
+                        max_chars,
+                        max_pages,
+                        sample
+                    )
+                    result = await asyncio.wait_for(future, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                self._restart(generation)
+                raise ExtractionError(f"Text extraction timed out after {self.timeout:.0f}s")
+            except BrokenProcessPool:
+                self._restart(generation)
+                if attempt == 1:
+                    # Possibly another file's crash; try once more in a fresh pool
+                    continue
+                self.stats["crashes"] += 1
+                raise ExtractionError("Text extraction crashed the worker process")
+            except MemoryError:
+                raise ExtractionError(f"Text extraction exceeded the {self.memory_limit_mb} MB memory cap")
+            except ExtractionError:
+                raise
+            except Exception as e:
+                raise ExtractionError(f"Error extracting text: {str(e)}")
+
+            result["seconds"] = time.perf_counter() - start
+            logger.info(
+                f"Extracted {len(result['text'])} characters from "
+                f"{result['pages_extracted']}/{result['pages']} pages "
+                f"in {result['extract_seconds']:.2f}s ({mime_type})"
+            )
+            return result
+
+    def metrics(self) -> Dict:
+        return {**self.stats, "workers": self.workers}
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+@lru_cache()
+def get_extraction_service() -> ExtractionService:
+    """Get the shared extraction service instance"""
+    return ExtractionService()
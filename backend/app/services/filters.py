@@ -0,0 +1,259 @@
+"""
+Boolean document filter expressions.
+
+Examples:
+    Invoice AND 2024 AND NOT paid
+    category:Contract AND (tag:urgent OR tag:"due soon")
+    tag:2024 AND created>=2024-01-01 AND created<2024-07-01 AND size<5MB
+
+Bare words and tag:X match tags, category:X matches categories, and
+created/size accept >, >=, < and <= comparisons. Adjacent terms without an
+operator are AND-ed. Expressions compile to MongoDB queries that use $all,
+$in and $nin on the multikey fields so they stay index-backed.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+import re
+
+class FilterSyntaxError(ValueError):
+    """Raised when a filter expression cannot be parsed"""
+    pass
+
+# Field aliases accepted in expressions -> document field
+LABEL_FIELDS = {
+    "tag": "tags",
+    "tags": "tags",
+    "category": "categories",
+    "categories": "categories",
+}
+RANGE_FIELDS = {
+    "created": "created_at",
+    "created_at": "created_at",
+    "size": "file_size",
+    "file_size": "file_size",
+}
+RANGE_OPERATORS = {">": "$gt", ">=": "$gte", "<": "$lt", "<=": "$lte"}
+
+SIZE_UNITS = {"": 1, "b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+
+_FIELD_NAMES = "|".join(sorted(list(LABEL_FIELDS) + list(RANGE_FIELDS), key=len, reverse=True))
+_TOKEN = re.compile(rf"""
+    \s*(?:
+        (?P<lparen>\() |
+        (?P<rparen>\)) |
+        (?P<field>{_FIELD_NAMES})\s*(?P<op>>=|<=|>|<|:) |
+        "(?P<quoted>(?:[^"\\]|\\.)*)" |
+        (?P<word>[^\s()"]+)
+    )""", re.VERBOSE | re.IGNORECASE)
+
+KEYWORDS = {"AND", "OR", "NOT"}
+
+# AST nodes are plain tuples:
+#   ("label", field, value)      tag/category membership
+#   ("range", field, op, value)  created_at/file_size comparison
+#   ("and", [nodes]), ("or", [nodes]), ("not", node)
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise FilterSyntaxError(f"Unexpected character at position {position}: {text[position:]!r}")
+        position = match.end()
+        if match.group("lparen"):
+            tokens.append(("(", None))
+        elif match.group("rparen"):
+            tokens.append((")", None))
+        elif match.group("field"):
+            tokens.append(("field", (match.group("field").lower(), match.group("op"))))
+        elif match.group("quoted") is not None:
+            tokens.append(("value", re.sub(r"\\(.)", r"\1", match.group("quoted"))))
+        elif match.group("word").upper() in KEYWORDS:
+            tokens.append((match.group("word").upper(), None))
+        else:
+            tokens.append(("value", match.group("word")))
+    return tokens
+
+
+def _parse_range_value(field: str, raw: str):
+    if field == "created_at":
+        try:
+            value = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+        except ValueError:
+            raise FilterSyntaxError(f"Invalid date {raw!r}, expected YYYY-MM-DD or ISO 8601")
+        # Stored timestamps are naive UTC
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([kmg]?b?)", raw.strip(), re.IGNORECASE)
+    if not match or match.group(2).lower() not in SIZE_UNITS:
+        raise FilterSyntaxError(f"Invalid size {raw!r}, expected e.g. 2048, 500KB or 5MB")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, Any]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> str:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else "end"
+
+    def take(self) -> Tuple[str, Any]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() != "end":
+            raise FilterSyntaxError(f"Unexpected {self.peek()!r} in filter expression")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() in ("AND", "NOT", "(", "field", "value"):
+            if self.peek() == "AND":
+                self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind = self.peek()
+        if kind == "(":
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise FilterSyntaxError("Missing closing parenthesis")
+            self.take()
+            return node
+        if kind == "value":
+            return ("label", "tags", self.take()[1])
+        if kind == "field":
+            name, op = self.take()[1]
+            if self.peek() != "value":
+                raise FilterSyntaxError(f"Missing value after {name}{op}")
+            raw = self.take()[1]
+            if name in LABEL_FIELDS:
+                if op != ":":
+                    raise FilterSyntaxError(f"{name} only supports ':'")
+                return ("label", LABEL_FIELDS[name], raw)
+            field = RANGE_FIELDS[name]
+            if op not in RANGE_OPERATORS:
+                raise FilterSyntaxError(f"{name} needs one of >, >=, <, <=")
+            return ("range", field, RANGE_OPERATORS[op], _parse_range_value(field, raw))
+        raise FilterSyntaxError("Empty filter expression" if kind == "end" else f"Unexpected {kind!r}")
+
+
+def parse_filter(text: str):
+    """Parse a filter expression into a tuple-based syntax tree"""
+    return _Parser(_tokenize(text or "")).parse()
+
+
+def merge_clauses(clauses: List[Dict]) -> Dict:
+    """AND together query dicts, flattening them into one dict when keys don't collide"""
+    merged: Dict[str, Any] = {}
+    rest = []
+    for clause in clauses:
+        if any(key in merged for key in clause):
+            rest.append(clause)
+        else:
+            merged.update(clause)
+    if rest:
+        return {"$and": ([merged] if merged else []) + rest}
+    return merged
+
+
+def _flatten_and(nodes) -> List:
+    """Inline nested ANDs and rewrite NOT (a OR b) as NOT a, NOT b"""
+    flat = []
+    for node in nodes:
+        if node[0] == "and":
+            flat.extend(_flatten_and(node[1]))
+        elif node[0] == "not" and node[1][0] == "or" and all(child[0] == "label" for child in node[1][1]):
+            flat.extend(("not", child) for child in node[1][1])
+        else:
+            flat.append(node)
+    return flat
+
+
+def _compile_and(nodes) -> Dict:
+    all_values: Dict[str, List] = {}
+    none_values: Dict[str, List] = {}
+    ranges: Dict[str, Dict] = {}
+    others = []
+
+    for node in _flatten_and(nodes):
+        if node[0] == "label":
+            all_values.setdefault(node[1], []).append(node[2])
+        elif node[0] == "not" and node[1][0] == "label":
+            none_values.setdefault(node[1][1], []).append(node[1][2])
+        elif node[0] == "range" and node[2] not in ranges.get(node[1], {}):
+            ranges.setdefault(node[1], {})[node[2]] = node[3]
+        else:
+            others.append(compile_filter(node))
+
+    clauses = []
+    for field in set(all_values) | set(none_values):
+        condition = {}
+        if field in all_values:
+            condition["$all"] = list(dict.fromkeys(all_values[field]))
+        if field in none_values:
+            condition["$nin"] = list(dict.fromkeys(none_values[field]))
+        if list(condition) == ["$all"] and len(condition["$all"]) == 1:
+            condition = condition["$all"][0]
+        clauses.append({field: condition})
+    for field, condition in ranges.items():
+        clauses.append({field: condition})
+    return merge_clauses(sorted(clauses, key=lambda clause: next(iter(clause))) + others)
+
+
+def compile_filter(node) -> Dict:
+    """Compile a syntax tree into a MongoDB query document"""
+    kind = node[0]
+    if kind == "label":
+        return {node[1]: node[2]}
+    if kind == "range":
+        return {node[1]: {node[2]: node[3]}}
+    if kind == "and":
+        return _compile_and(node[1])
+    if kind == "or":
+        children = node[1]
+        fields = {child[1] for child in children if child[0] == "label"}
+        if len(fields) == 1 and all(child[0] == "label" for child in children):
+            return {fields.pop(): {"$in": list(dict.fromkeys(child[2] for child in children))}}
+        return {"$or": [compile_filter(child) for child in children]}
+    if kind == "not":
+        child = node[1]
+        if child[0] == "label":
+            return {child[1]: {"$nin": [child[2]]}}
+        if child[0] == "range":
+            return {child[1]: {"$not": {child[2]: child[3]}}}
+        if child[0] == "not":
+            return compile_filter(child[1])
+        if child[0] == "or" and all(grandchild[0] == "label" for grandchild in child[1]):
+            return _compile_and([node])
+        return {"$nor": [compile_filter(child)]}
+    raise FilterSyntaxError(f"Unknown filter node {kind!r}")
+
+
+def build_filter_query(text: str) -> Dict:
+    """Parse and compile a filter expression in one step"""
+    return compile_filter(parse_filter(text))
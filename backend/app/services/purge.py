@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Optional
+from pymongo import UpdateOne
+
+from ..core.config import settings
+from ..models.analysis import AnalysisJob
+from ..models.document import Document, LIVE
+from ..models.share import Share
+from .content import get_content_service
+from .search.service import get_search_service
+from .storage.factory import get_storage_provider
+from .storage.inventory import get_storage_inventory
+from .storage.key_filter import get_storage_key_filter
+from .vector_index import get_related_documents_service
+
+logger = logging.getLogger(__name__)
+
+class DocumentPurger:
+    """
+    Removes tombstoned documents in the background.
+
+    Deleting a document only sets deleted_at, which hides it everywhere.
+    Each pass takes a batch of due tombstones, deletes their files with the
+    storage provider's batch delete (skipping files a live document still
+    uses), then drops their shares, analysis jobs, search entries, content
+    and metadata with one delete_many each.
+    Documents whose file could not be deleted are retried with exponential
+    backoff.
+    Every step is idempotent, so workers purging the same tombstone
+    concurrently do no harm.
+    """
+
+    def __init__(self):
+        self.storage = get_storage_provider()
+        self.inventory = get_storage_inventory()
+        self.key_filter = get_storage_key_filter()
+        self.search = get_search_service()
+        self.content = get_content_service()
+        self.related = get_related_documents_service()
+        self.stats = {"purged": 0, "failed": 0}
+        self.task = None
+        self.running = False
+        self._wake = asyncio.Event()
+
+    def wake(self) -> None:
+        """Start a pass now instead of at the next interval"""
+        self._wake.set()
+
+    @staticmethod
+    def _collection():
+        return Document.get_motor_collection()
+
+    def _retry_delay(self, attempts: int) -> timedelta:
+        seconds = settings.PURGE_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        return timedelta(seconds=min(seconds, settings.PURGE_RETRY_MAX_SECONDS))
+
+    async def purge_batch(self, limit: Optional[int] = None) -> Dict:
+        """Purge up to limit due tombstones"""
+        now = datetime.utcnow()
+        rows = await self._collection().find(
+            {"deleted_at": {"$type": "date"}, "purge_after": {"$lte": now}},
+            {"s3_key": 1, "purge_attempts": 1}
+        ).sort("purge_after", 1).limit(limit or settings.PURGE_BATCH_SIZE).to_list(length=None)
+        if not rows:
+            return {"purged": 0, "failed": 0}
+
+        # Keys are not unique (same filename, same day): a live document may
+        # still point at the file of a tombstone
+        keys = {row["s3_key"] for row in rows}
+        shared = set(await self._collection().distinct("s3_key", {**LIVE, "s3_key": {"$in": list(keys)}}))
+        keys -= shared
+
+        errors = await self.storage.delete_files(list(keys)) if keys else {}
+        done = [row for row in rows if row["s3_key"] not in errors]
+        failed = [row for row in rows if row["s3_key"] in errors]
+
+        if done:
+            ids = [row["_id"] for row in done]
+            keys = list({row["s3_key"] for row in done} - shared)
+            await Share.get_motor_collection().delete_many({"document_id": {"$in": ids}})
+            await AnalysisJob.get_motor_collection().delete_many(
+                {"document_id": {"$in": [str(doc_id) for doc_id in ids]}}
+            )
+            await self.search.remove_documents([str(doc_id) for doc_id in ids])
+            await self.content.delete_many([str(doc_id) for doc_id in ids])
+            await self.related.remove([str(doc_id) for doc_id in ids])
+            await self.inventory.objects_removed(keys)
+            for key in keys:
+                self.key_filter.key_removed(key)
+            await self._collection().delete_many({"_id": {"$in": ids}, "deleted_at": {"$type": "date"}})
+
+        if failed:
+            await self._collection().bulk_write([
+                UpdateOne({"_id": row["_id"]}, {
+                    "$set": {
+                        "purge_after": now + self._retry_delay(row.get("purge_attempts", 0) + 1),
+                        "purge_error": errors[row["s3_key"]]
+                    },
+                    "$inc": {"purge_attempts": 1}
+                })
+                for row in failed
+            ], ordered=False)
+            logger.warning(f"Could not delete {len(failed)} files, will retry: {list(errors.values())[:3]}")
+
+        self.stats["purged"] += len(done)
+        self.stats["failed"] += len(failed)
+        return {"purged": len(done), "failed": len(failed)}
+
+    async def pending(self) -> int:
+        """Number of tombstones not purged yet"""
+        return await self._collection().count_documents({"deleted_at": {"$type": "date"}})
+
+    def metrics(self) -> Dict:
+        return dict(self.stats)
+
+    async def run(self):
+        """Purge until stopped; full batches are followed immediately by the next"""
+        while self.running:
+            self._wake.clear()
+            try:
+                result = await self.purge_batch()
+            except Exception as e:
+                logger.error(f"Error purging deleted documents: {str(e)}")
+                result = None
+            if result and result["purged"] + result["failed"] >= settings.PURGE_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.PURGE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        """Start the purge task"""
+        self.running = True
+        self.task = asyncio.create_task(self.run())
+        logger.info("Started document purger")
+
+    async def stop(self):
+        """Stop the purge task"""
+        if self.running:
+            self.running = False
+            if self.task:
+                self.task.cancel()
+                try:
+                    await self.task
+                except asyncio.CancelledError:
+                    pass
+            logger.info("Stopped document purger")
+
+@lru_cache()
+def get_document_purger() -> DocumentPurger:
+    """Get the shared document purger instance"""
+    return DocumentPurger()
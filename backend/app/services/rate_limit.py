@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import random
+import time
+from functools import lru_cache
+from typing import Dict
+from pymongo import ReturnDocument
+
+from ..core.config import settings
+from ..models.document import Document
+
+logger = logging.getLogger(__name__)
+
+# One bucket document per rate-limited API
+BUCKET_COLLECTION = "rate_limits"
+
+class RateLimitExceeded(Exception):
+    """The bucket won't have capacity within the queue timeout"""
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit reached, retry in {retry_after:.0f}s")
+
+class LLMRateLimiter:
+    """
+    Cluster-wide token bucket for LLM calls, plus a local concurrency cap.
+
+    Requests per minute and tokens per minute are two buckets in a single
+    MongoDB document. One pipeline update refills them by the time elapsed
+    (on the server clock) and takes a request plus its estimated tokens
+    only if both are available, so all worker processes share one budget
+    without a lock. When the bucket is empty callers wait until it has
+    refilled enough, up to LLM_QUEUE_TIMEOUT; a 429 blocks the bucket for
+    everyone until its retry-after has passed.
+    """
+
+    def __init__(self, name: str = "anthropic"):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        self.stats = {"granted": 0, "waited": 0, "wait_seconds": 0.0, "rejected": 0, "throttled": 0}
+
+    def _collection(self):
+        return Document.get_motor_collection().database[BUCKET_COLLECTION]
+
+    async def _try_acquire(self, tokens: int) -> float:
+        """Take one request and tokens; returns 0, or the seconds until they would be available"""
+        rpm = settings.LLM_REQUESTS_PER_MINUTE
+        tpm = settings.LLM_TOKENS_PER_MINUTE
+        minutes = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 60000]}
+
+        def refilled(field: str, capacity: int) -> Dict:
+            # A missing document starts full
+            return {"$min": [capacity, {"$add": [{"$ifNull": [f"${field}", capacity]}, {"$multiply": [minutes, capacity]}]}]}
+
+        pipeline = [
+            {"$set": {"requests": refilled("requests", rpm), "tokens": refilled("tokens", tpm)}},
+            {"$set": {"granted": {"$and": [
+                {"$lte": [{"$ifNull": ["$blocked_until", "$$NOW"]}, "$$NOW"]},
+                {"$gte": ["$requests", 1]},
+                {"$gte": ["$tokens", tokens]}
+            ]}}},
+            {"$set": {
+                "requests": {"$cond": ["$granted", {"$subtract": ["$requests", 1]}, "$requests"]},
+                "tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", tokens]}, "$tokens"]},
+                "updated_at": "$$NOW"
+            }}
+        ]
+        bucket = await self._collection().find_one_and_update(
+            {"_id": self.name},
+            pipeline,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["granted"]:
+            return 0.0
+
+        waits = [0.05]
+        blocked_until = bucket.get("blocked_until")
+        if blocked_until and blocked_until > bucket["updated_at"]:
+            waits.append((blocked_until - bucket["updated_at"]).total_seconds())
+        if bucket["requests"] < 1:
+            waits.append((1 - bucket["requests"]) / rpm * 60)
+        if bucket["tokens"] < tokens:
+            waits.append((tokens - bucket["tokens"]) / tpm * 60)
+        return max(waits)
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait for one request and tokens; raises RateLimitExceeded past the queue timeout"""
+        tokens = min(tokens, settings.LLM_TOKENS_PER_MINUTE)
+        deadline = time.monotonic() + settings.LLM_QUEUE_TIMEOUT
+        while True:
+            wait = await self._try_acquire(tokens)
+            if not wait:
+                self.stats["granted"] += 1
+                return
+            if time.monotonic() + wait > deadline:
+                self.stats["rejected"] += 1
+                raise RateLimitExceeded(wait)
+            self.stats["waited"] += 1
+            self.stats["wait_seconds"] += wait
+            # Jitter, so waiters in different processes don't retry in lockstep
+            await asyncio.sleep(wait + random.uniform(0, 0.1))
+
+    async def settle(self, estimated: int, actual: int) -> None:
+        """Correct the bucket once a response reports the tokens really used"""
+        if actual != estimated:
+            await self._collection().update_one({"_id": self.name}, {"$inc": {"tokens": estimated - actual}})
+
+    async def block(self, seconds: float) -> None:
+        """Stop every worker from calling the API for a while (after a 429)"""
+        self.stats["throttled"] += 1
+        await self._collection().update_one(
+            {"_id": self.name},
+            [{"$set": {"blocked_until": {"$max": [
+                {"$ifNull": ["$blocked_until", "$$NOW"]},
+                {"$add": ["$$NOW", int(seconds * 1000)]}
+            ]}}}],
+            upsert=True
+        )
+
+    def metrics(self) -> Dict:
+        return {**self.stats, "wait_seconds": round(self.stats["wait_seconds"], 1)}
+
+@lru_cache()
+def get_llm_rate_limiter() -> LLMRateLimiter:
+    """Get the shared LLM rate limiter instance"""
+    return LLMRateLimiter()
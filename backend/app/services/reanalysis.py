@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from bson import ObjectId
+
+from ..core.config import settings
+from ..models.content import DocumentContent
+from ..models.document import Document, LIVE
+from .ai_analysis import AIAnalysisService, AIServiceError
+from .enrichment import get_enrichment_queue
+from .extraction import is_supported
+from .storage.factory import get_storage_provider
+
+logger = logging.getLogger(__name__)
+
+# Progress of each backfill, so an interrupted run resumes where it stopped
+CHECKPOINT_COLLECTION = "backfill_checkpoints"
+
+# Failed document ids kept in the checkpoint
+MAX_FAILED_RECORDED = 1000
+
+class AnalysisBackend(ABC):
+    """Where the backfill sends extracted text to be analyzed"""
+
+    name = "base"
+
+    @abstractmethod
+    async def analyze(self, file_content: bytes, mime_type: str, text: str) -> Dict:
+        """Summary, categories and tags of a document"""
+        pass
+
+class LLMAnalysisBackend(AnalysisBackend):
+    """The live API, through the analysis cache and the shared rate limiter"""
+
+    name = "llm"
+
+    def __init__(self):
+        self.service = AIAnalysisService()
+
+    async def analyze(self, file_content: bytes, mime_type: str, text: str) -> Dict:
+        return await self.service.analyze(file_content, mime_type, text=text)
+
+class FakeAnalysisBackend(AnalysisBackend):
+    """
+    Deterministic local stand-in for the API, for tests and dry runs.
+
+    The summary is the start of the text and the tags its most frequent
+    long words; latency simulates the API's response time.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def analyze(self, file_content: bytes, mime_type: str, text: str) -> Dict:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        words = re.findall(r"[^\W\d_]{5,}", text.lower())
+        return {
+            "summary": " ".join(text.split())[:200],
+            "categories": ["Other"],
+            "tags": [word for word, _ in Counter(words).most_common(3)]
+        }
+
+BACKENDS = {"llm": LLMAnalysisBackend, "fake": FakeAnalysisBackend}
+
+class ReanalysisBackfill:
+    """
+    Analyzes every document that has no AI summary yet.
+
+    Documents are streamed in _id order in batches. Files are downloaded
+    up to prefetch documents ahead of the analysis, text is extracted in
+    the extraction process pool, and at most concurrency analyses run at
+    once. Results are written like background enrichment does. The
+    checkpoint (the last _id before which every document is finished) is
+    saved every few seconds, so an interrupted run resumes where it
+    stopped; documents that already have a summary are skipped anyway.
+    A dry run analyzes but writes neither results nor the checkpoint.
+    """
+
+    def __init__(
+        self,
+        backend: AnalysisBackend,
+        batch_size: int = 100,
+        concurrency: int = 8,
+        prefetch: int = 32,
+        limit: Optional[int] = None,
+        name: str = "analysis",
+        dry_run: bool = False,
+        checkpoint_interval: float = 10.0,
+        report_interval: float = 30.0
+    ):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.prefetch = prefetch
+        self.limit = limit
+        self.name = name
+        self.dry_run = dry_run
+        self.checkpoint_interval = checkpoint_interval
+        self.report_interval = report_interval
+        self.storage = get_storage_provider()
+        self.enrichment = get_enrichment_queue()
+        self.extractor = AIAnalysisService()
+        self.results = {"scanned": 0, "analyzed": 0, "skipped": 0, "failed": 0, "failed_documents": []}
+        # Scan order and finished documents, to move the checkpoint only
+        # past documents that are all done
+        self._order: deque = deque()
+        self._finished = set()
+        self._checkpoint: Optional[ObjectId] = None
+        self._checkpoint_saved = time.monotonic()
+        self._saved_counts = {"analyzed": 0, "failed": 0, "failed_documents": 0}
+        self._reported = time.monotonic()
+        self._started = time.monotonic()
+        self._total = 0
+
+    def _checkpoints(self):
+        return Document.get_motor_collection().database[CHECKPOINT_COLLECTION]
+
+    async def load_checkpoint(self) -> Optional[ObjectId]:
+        row = await self._checkpoints().find_one({"_id": self.name})
+        return row["last_id"] if row else None
+
+    async def reset_checkpoint(self) -> None:
+        await self._checkpoints().delete_one({"_id": self.name})
+
+    async def _save_checkpoint(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checkpoint_saved < self.checkpoint_interval:
+            return
+        self._checkpoint_saved = now
+        if self._checkpoint is None or self.dry_run:
+            return
+        await self._checkpoints().update_one(
+            {"_id": self.name},
+            {
+                "$set": {"last_id": self._checkpoint, "backend": self.backend.name, "updated_at": datetime.utcnow()},
+                "$inc": {
+                    "analyzed": self.results["analyzed"] - self._saved_counts["analyzed"],
+                    "failed": self.results["failed"] - self._saved_counts["failed"]
+                },
+                "$push": {"failed_documents": {
+                    "$each": self.results["failed_documents"][self._saved_counts["failed_documents"]:],
+                    "$slice": -MAX_FAILED_RECORDED
+                }}
+            },
+            upsert=True
+        )
+        self._saved_counts = {
+            "analyzed": self.results["analyzed"],
+            "failed": self.results["failed"],
+            "failed_documents": len(self.results["failed_documents"])
+        }
+
+    def _finish(self, document_id: ObjectId) -> None:
+        self._finished.add(document_id)
+        while self._order and self._order[0] in self._finished:
+            self._checkpoint = self._order.popleft()
+            self._finished.discard(self._checkpoint)
+
+    def _report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._reported < self.report_interval:
+            return
+        self._reported = now
+        elapsed = now - self._started
+        rate = self.results["scanned"] / elapsed if elapsed else 0.0
+        remaining = max(self._total - self.results["scanned"], 0)
+        eta = f"{remaining / rate / 60:.1f} min" if rate else "unknown"
+        logger.info(
+            f"Re-analysis: {self.results['scanned']}/{self._total} scanned, "
+            f"{self.results['analyzed']} analyzed, {self.results['skipped']} skipped, "
+            f"{self.results['failed']} failed, "
+            f"{self.results['analyzed'] / elapsed if elapsed else 0.0:.2f} docs/s analyzed, ETA {eta}"
+        )
+
+    async def _documents(self, after: Optional[ObjectId]) -> AsyncIterator[Tuple[Dict, bool]]:
+        """Live documents after the checkpoint, and whether each needs analysis"""
+        query = dict(LIVE)
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        cursor = Document.get_motor_collection().find(
+            query,
+            {"s3_key": 1, "mime_type": 1}
+        ).sort("_id", 1).batch_size(self.batch_size)
+        if self.limit:
+            cursor = cursor.limit(self.limit)
+        batch: List[Dict] = []
+        async for row in cursor:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                async for item in self._classify(batch):
+                    yield item
+                batch = []
+        async for item in self._classify(batch):
+            yield item
+
+    async def _classify(self, batch: List[Dict]) -> AsyncIterator[Tuple[Dict, bool]]:
+        if not batch:
+            return
+        summarized = set(await DocumentContent.get_motor_collection().distinct(
+            "document_id",
+            {"document_id": {"$in": [str(row["_id"]) for row in batch]}, "summary": {"$ne": None}}
+        ))
+        for row in batch:
+            yield row, is_supported(row["mime_type"]) and str(row["_id"]) not in summarized
+
+    async def _analyze(self, row: Dict, file_content: bytes, text: str) -> Dict:
+        """Analyze with the backend, waiting out rate limits"""
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            try:
+                return await self.backend.analyze(file_content, row["mime_type"], text)
+            except AIServiceError as e:
+                if e.error_type != "rate_limited" or attempt == settings.LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(e.retry_after or settings.LLM_QUEUE_TIMEOUT)
+
+    async def _process(self, row: Dict, downloads: asyncio.Semaphore, analyses: asyncio.Semaphore) -> None:
+        try:
+            async with downloads:
+                file_content = (await self.storage.download_file(row["s3_key"])).read()
+            # The extraction pool queues work beyond its workers itself
+            text = await self.extractor.prompt_text(file_content, row["mime_type"])
+            async with analyses:
+                result = await self._analyze(row, file_content, text)
+            # Read the document now: it may have been edited meanwhile
+            document = await Document.get(row["_id"])
+            if document is not None and not document.deleted_at and not self.dry_run:
+                await self.enrichment.save_result(document, result)
+            self.results["analyzed"] += 1
+        except Exception as e:
+            error = e.message if isinstance(e, AIServiceError) else str(e)
+            logger.error(f"Error re-analyzing document {row['_id']}: {error}")
+            self.results["failed"] += 1
+            self.results["failed_documents"].append(str(row["_id"]))
+        finally:
+            self._finish(row["_id"])
+
+    async def run(self) -> Dict:
+        """Analyze the backlog from the checkpoint on; returns counts"""
+        after = await self.load_checkpoint()
+        query = dict(LIVE)
+        if after is not None:
+            query["_id"] = {"$gt": after}
+            logger.info(f"Resuming re-analysis after document {after}")
+        self._total = await Document.get_motor_collection().count_documents(query)
+        if self.limit:
+            self._total = min(self._total, self.limit)
+        downloads = asyncio.Semaphore(self.prefetch)
+        analyses = asyncio.Semaphore(self.concurrency)
+        # Bounds the documents held in memory: downloaded ahead, or being analyzed
+        in_flight = asyncio.Semaphore(self.prefetch + self.concurrency)
+        tasks = set()
+
+        async for row, needed in self._documents(after):
+            self.results["scanned"] += 1
+            self._order.append(row["_id"])
+            if not needed:
+                self.results["skipped"] += 1
+                self._finish(row["_id"])
+            else:
+                await in_flight.acquire()
+                task = asyncio.create_task(self._process(row, downloads, analyses))
+                task.add_done_callback(lambda _: in_flight.release())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await self._save_checkpoint()
+            self._report()
+
+        await asyncio.gather(*tasks)
+        await self._save_checkpoint(force=True)
+        self._report(force=True)
+        return self.results
@@ -0,0 +1,66 @@
+from typing import List, Optional, Set
+from .tokenizer import iter_tokens
+
+# Default snippet width in characters
+SNIPPET_LENGTH = 200
+
+
+def highlight(text: str, terms: Set[str], pre: str = "**", post: str = "**") -> str:
+    """Wrap every occurrence of the query terms in text with pre/post markers"""
+    parts = []
+    last = 0
+    for token, start, end in iter_tokens(text):
+        if token in terms:
+            parts.append(text[last:start])
+            parts.append(f"{pre}{text[start:end]}{post}")
+            last = end
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def make_snippet(
+    text: str,
+    terms: Set[str],
+    length: int = SNIPPET_LENGTH,
+    pre: str = "**",
+    post: str = "**"
+) -> Optional[str]:
+    """
+    Pick the window of text with the most distinct query terms and highlight it.
+
+    Returns None when no query term occurs in the text.
+    """
+    if not text or not terms:
+        return None
+
+    hits: List[tuple] = [(start, token) for token, start, _ in iter_tokens(text) if token in terms]
+    if not hits:
+        return None
+
+    # Slide a window over the hits and keep the one covering most distinct terms
+    best_start, best_score = hits[0][0], 0
+    left = 0
+    for right in range(len(hits)):
+        while hits[right][0] - hits[left][0] > length:
+            left += 1
+        score = len({token for _, token in hits[left:right + 1]}) * 1000 + (right - left)
+        if score > best_score:
+            best_start, best_score = hits[left][0], score
+
+    # Start a little before the first hit, on a word boundary
+    start = max(0, best_start - length // 4)
+    if start > 0:
+        space = text.rfind(" ", 0, start)
+        start = space + 1 if space >= 0 else 0
+    end = min(len(text), start + length)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+
+    snippet = " ".join(text[start:end].split())
+    snippet = highlight(snippet, terms, pre, post)
+    if start > 0:
+        snippet = "…" + snippet
+    if end < len(text):
+        snippet = snippet + "…"
+    return snippet
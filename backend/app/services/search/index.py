@@ -0,0 +1,184 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import heapq
+import math
+
+# BM25 parameters (standard Robertson/Sparck Jones defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Compact postings once this share of slots belongs to removed documents
+COMPACTION_RATIO = 0.25
+COMPACTION_MIN_DEAD = 1000
+
+
+class InvertedIndex:
+    """
+    In-memory BM25 inverted index over a single corpus.
+
+    Documents are mapped to integer slots. Each term keeps two parallel arrays
+    (slots and term frequencies) so postings stay compact even for large
+    corpora. Removing a document only frees its slot; stale postings are
+    skipped at query time and dropped by compact().
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._doc_ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._labels: List[Optional[Tuple[frozenset, frozenset]]] = []
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._total_length = 0
+        self._dead = 0
+        self._norms: List[float] = []
+        self._norms_key: Optional[Tuple[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slots
+
+    @property
+    def average_length(self) -> float:
+        return self._total_length / len(self._slots) if self._slots else 0.0
+
+    def add(
+        self,
+        doc_id: str,
+        frequencies: Dict[str, int],
+        length: int,
+        categories: Iterable[str] = (),
+        tags: Iterable[str] = ()
+    ) -> None:
+        """Add or replace a document"""
+        if doc_id in self._slots:
+            self.remove(doc_id)
+
+        slot = len(self._doc_ids)
+        self._doc_ids.append(doc_id)
+        self._slots[doc_id] = slot
+        self._lengths.append(length)
+        self._labels.append((frozenset(categories), frozenset(tags)))
+        self._total_length += length
+
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("I"))
+            postings[0].append(slot)
+            postings[1].append(frequency)
+
+    def remove(self, doc_id: str) -> bool:
+        """Remove a document; returns False if it was not indexed"""
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return False
+
+        self._doc_ids[slot] = None
+        self._labels[slot] = None
+        self._total_length -= self._lengths[slot]
+        self._dead += 1
+
+        if self._dead >= COMPACTION_MIN_DEAD and self._dead > COMPACTION_RATIO * len(self._doc_ids):
+            self.compact()
+        return True
+
+    def labels(self, doc_id: str) -> Optional[Tuple[frozenset, frozenset]]:
+        """Return the (categories, tags) recorded for a document"""
+        slot = self._slots.get(doc_id)
+        return None if slot is None else self._labels[slot]
+
+    def compact(self) -> None:
+        """Drop postings of removed documents and renumber slots"""
+        remap = array("i", [-1]) * len(self._doc_ids)
+        doc_ids: List[Optional[str]] = []
+        lengths = array("I")
+        labels = []
+        for slot, doc_id in enumerate(self._doc_ids):
+            if doc_id is None:
+                continue
+            remap[slot] = len(doc_ids)
+            doc_ids.append(doc_id)
+            lengths.append(self._lengths[slot])
+            labels.append(self._labels[slot])
+
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (slots, frequencies) in self._postings.items():
+            new_slots, new_frequencies = array("I"), array("I")
+            for slot, frequency in zip(slots, frequencies):
+                target = remap[slot]
+                if target >= 0:
+                    new_slots.append(target)
+                    new_frequencies.append(frequency)
+            if new_slots:
+                postings[term] = (new_slots, new_frequencies)
+
+        self._doc_ids = doc_ids
+        self._slots = {doc_id: slot for slot, doc_id in enumerate(doc_ids)}
+        self._lengths = lengths
+        self._labels = labels
+        self._postings = postings
+        self._dead = 0
+
+    def search(
+        self,
+        terms: List[str],
+        categories: Optional[Set[str]] = None,
+        tags: Optional[Set[str]] = None,
+        limit: int = 10,
+        skip: int = 0
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank documents against the query terms with BM25.
+
+        Documents must carry every requested category and tag. Returns
+        (doc_id, score) pairs, best first.
+        """
+        live = len(self._slots)
+        if not live or not terms:
+            return []
+
+        k1 = self.k1
+        doc_ids, labels = self._doc_ids, self._labels
+        norms = self._length_norms()
+        has_dead = self._dead > 0
+        filtered = bool(categories or tags)
+        scores: Dict[int, float] = {}
+
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            slots, frequencies = postings
+
+            df = sum(1 for slot in slots if doc_ids[slot] is not None) if has_dead else len(slots)
+            if not df:
+                continue
+            weight = math.log(1.0 + (live - df + 0.5) / (df + 0.5)) * (k1 + 1.0)
+
+            for slot, frequency in zip(slots, frequencies):
+                if has_dead and doc_ids[slot] is None:
+                    continue
+                if filtered:
+                    doc_categories, doc_tags = labels[slot]
+                    if categories and not categories <= doc_categories:
+                        continue
+                    if tags and not tags <= doc_tags:
+                        continue
+                scores[slot] = scores.get(slot, 0.0) + weight * frequency / (frequency + norms[slot])
+
+        best = heapq.nlargest(skip + limit, scores.items(), key=lambda item: item[1])
+        return [(doc_ids[slot], score) for slot, score in best[skip:]]
+
+    def _length_norms(self) -> List[float]:
+        """BM25 length normalization per slot, cached until the corpus changes"""
+        key = (len(self._doc_ids), self._total_length)
+        if self._norms_key != key:
+            average_length = self.average_length or 1.0
+            k1, b = self.k1, self.b
+            self._norms = [k1 * (1.0 - b + b * length / average_length) for length in self._lengths]
+            self._norms_key = key
+        return self._norms
@@ -0,0 +1,263 @@
+from typing import Dict, List, Optional, Set
+from functools import lru_cache
+from beanie.operators import In
+from bson import ObjectId
+from datetime import datetime
+import asyncio
+import logging
+
+from ...core.config import settings
+from ...core.database import read_collection
+from ...models.document import Document, LIVE
+from ...models.search import SearchEntry, SearchEntryTerms
+from ..content import get_content_service
+from ..events import get_event_bus
+from .highlight import highlight, make_snippet
+from .index import InvertedIndex
+from .tokenizer import term_frequencies, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Field weights: a title match counts as much as three content matches
+TITLE_WEIGHT = 3
+LABEL_WEIGHT = 2
+DESCRIPTION_WEIGHT = 2
+CONTENT_WEIGHT = 1
+
+class SearchService:
+    """
+    Embedded full-text search over document metadata and extracted content.
+
+    Each worker keeps the index of every owner in memory. Entries are
+    persisted in the search_index collection, and changes made by other
+    workers arrive through the change event bus: saved entries are added,
+    deleted documents are dropped.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, InvertedIndex] = {}
+        self.content = get_content_service()
+        self._tasks: Set[asyncio.Task] = set()
+        self.running = False
+
+    def _index_for(self, owner_id: str, indexes: Optional[Dict[str, InvertedIndex]] = None) -> InvertedIndex:
+        indexes = self._indexes if indexes is None else indexes
+        index = indexes.get(owner_id)
+        if index is None:
+            index = indexes[owner_id] = InvertedIndex()
+        return index
+
+    def _add_to_index(self, entry, indexes: Optional[Dict[str, InvertedIndex]] = None) -> None:
+        self._index_for(entry.owner_id, indexes).add(
+            entry.document_id,
+            entry.terms,
+            entry.length,
+            entry.categories,
+            entry.tags
+        )
+
+    async def load(self) -> int:
+        """Rebuild the in-memory index from the persisted entries"""
+        # Searches keep using the old index until the new one is complete
+        indexes: Dict[str, InvertedIndex] = {}
+        count = 0
+        async for entry in SearchEntry.find_all().project(SearchEntryTerms):
+            self._add_to_index(entry, indexes)
+            count += 1
+        self._indexes = indexes
+        logger.info(f"Loaded {count} documents into the search index")
+        return count
+
+    async def _on_entry_change(self, event) -> None:
+        # Entries saved by any worker (this one's own are simply re-added)
+        if event.operation == "resync":
+            await self.load()
+        elif event.document:
+            self._add_to_index(SearchEntryTerms.model_validate(event.document))
+
+    def _on_document_change(self, event) -> None:
+        # Documents deleted on other workers
+        if event.document and event.document.get("deleted_at"):
+            self.hide_document(event.document_id)
+
+    async def start(self):
+        """Load the index and follow changes made by other workers"""
+        await self.load()
+        bus = get_event_bus()
+        bus.subscribe("search_index", self._on_entry_change)
+        bus.subscribe("documents", self._on_document_change)
+        self.running = True
+        logger.info("Search index subscribed to change events")
+
+    async def stop(self):
+        """Stop following changes"""
+        if self.running:
+            self.running = False
+            bus = get_event_bus()
+            bus.unsubscribe("search_index", self._on_entry_change)
+            bus.unsubscribe("documents", self._on_document_change)
+
+    async def index_document(
+        self,
+        document: Document,
+        file_content: Optional[bytes] = None
+    ) -> None:
+        """
+        Index (or re-index) a document.
+
+        With file_content the text is extracted and stored in the content
+        collection; without it the stored text is reused, so metadata-only
+        updates don't need to download the file again.
+        """
+        try:
+            entry = await SearchEntry.find_one(SearchEntry.document_id == str(document.id))
+            if file_content is not None:
+                content = await self.content.extract_and_save(document, file_content)
+            else:
+                content = await self.content.get_text(str(document.id))
+            await self._save_entry(document, content, entry)
+        except Exception as e:
+            # Search must never break the write path
+            logger.error(f"Error indexing document {document.id}: {str(e)}", exc_info=True)
+
+    async def _save_entry(
+        self,
+        document: Document,
+        content: Optional[str],
+        entry: Optional[SearchEntry]
+    ) -> None:
+        frequencies, length = term_frequencies([
+            (document.title, TITLE_WEIGHT),
+            (" ".join(document.categories + document.tags), LABEL_WEIGHT),
+            (document.description or "", DESCRIPTION_WEIGHT),
+            ((content or "")[:settings.SEARCH_MAX_CONTENT_CHARS], CONTENT_WEIGHT)
+        ])
+
+        if entry is None:
+            entry = SearchEntry(document_id=str(document.id), owner_id=document.owner_id)
+        entry.owner_id = document.owner_id
+        entry.terms = frequencies
+        entry.length = length
+        entry.categories = list(document.categories)
+        entry.tags = list(document.tags)
+        # Other workers pick up saved entries by this timestamp when polling
+        entry.updated_at = datetime.utcnow()
+        await entry.save()
+
+        self._add_to_index(entry)
+
+    async def reindex_documents(self, document_ids: List[str], batch_size: int = 500) -> int:
+        """Re-index many documents after bulk metadata changes, reusing stored content"""
+        count = 0
+        for start in range(0, len(document_ids), batch_size):
+            batch = document_ids[start:start + batch_size]
+            try:
+                entries = {
+                    entry.document_id: entry
+                    async for entry in SearchEntry.find(In(SearchEntry.document_id, batch))
+                }
+                contents = await self.content.get_texts(batch, workload="primary")
+                async for document in Document.find(In(Document.id, [ObjectId(i) for i in batch]), LIVE):
+                    doc_id = str(document.id)
+                    await self._save_entry(document, contents.get(doc_id), entries.get(doc_id))
+                    count += 1
+            except Exception as e:
+                logger.error(f"Error re-indexing documents: {str(e)}", exc_info=True)
+        return count
+
+    def schedule_reindex(self, document_ids: List[str]) -> None:
+        """Re-index documents in the background"""
+        if not document_ids:
+            return
+        task = asyncio.create_task(self.reindex_documents(document_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def hide_document(self, document_id: str) -> None:
+        """Drop a document from the in-memory index, keeping its stored entry"""
+        for index in self._indexes.values():
+            if index.remove(document_id):
+                break
+
+    async def remove_document(self, document_id: str) -> None:
+        """Remove a document from the index"""
+        try:
+            self.hide_document(document_id)
+            await SearchEntry.find(SearchEntry.document_id == document_id).delete()
+        except Exception as e:
+            logger.error(f"Error removing document {document_id} from search index: {str(e)}")
+
+    async def remove_documents(self, document_ids: List[str]) -> None:
+        """Remove many documents from the index with one delete"""
+        try:
+            for document_id in document_ids:
+                self.hide_document(document_id)
+            await SearchEntry.find(In(SearchEntry.document_id, document_ids)).delete()
+        except Exception as e:
+            logger.error(f"Error removing documents from search index: {str(e)}")
+
+    async def rebuild_missing(self) -> int:
+        """Index metadata of documents that have no search entry yet"""
+        count = 0
+        async for document in Document.find(LIVE):
+            index = self._indexes.get(document.owner_id)
+            if index is None or str(document.id) not in index:
+                await self.index_document(document)
+                count += 1
+        return count
+
+    async def search(
+        self,
+        owner_id: str,
+        query: str,
+        categories: Optional[List[str]] = None,
+        tags: Optional[List[str]] = None,
+        limit: int = 10,
+        skip: int = 0
+    ) -> List[Dict]:
+        """Search an owner's documents, best matches first"""
+        terms = tokenize(query)
+        index = self._indexes.get(owner_id)
+        if not terms or index is None:
+            return []
+
+        ranked = index.search(
+            terms,
+            categories=set(categories) if categories else None,
+            tags=set(tags) if tags else None,
+            limit=limit,
+            skip=skip
+        )
+        if not ranked:
+            return []
+
+        ids = [doc_id for doc_id, _ in ranked]
+        documents = {
+            str(row["_id"]): Document.model_validate(row)
+            async for row in read_collection(Document, "search").find(
+                {"_id": {"$in": [ObjectId(i) for i in ids]}, **LIVE}
+            )
+        }
+        contents = await self.content.get_texts(ids)
+
+        term_set = set(terms)
+        results = []
+        for doc_id, score in ranked:
+            document = documents.get(doc_id)
+            if document is None:
+                continue
+            results.append({
+                "document": document,
+                "score": round(score, 4),
+                "highlights": {
+                    "title": highlight(document.title, term_set),
+                    "description": make_snippet(document.description or "", term_set),
+                    "content": make_snippet(contents.get(doc_id) or "", term_set)
+                }
+            })
+        return results
+
+@lru_cache()
+def get_search_service() -> SearchService:
+    """Get the shared search service instance"""
+    return SearchService()
@@ -0,0 +1,56 @@
+from typing import Dict, Iterator, List, Tuple
+import re
+import unicodedata
+
+# Words shorter than this (after normalization) are not indexed
+MIN_TOKEN_LENGTH = 2
+
+# Words longer than this are almost always hashes, ids or base64 noise
+MAX_TOKEN_LENGTH = 40
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it
+its of on or our she so than that the their them then there these they this
+to was we were which will with you your
+""".split())
+
+
+def normalize(word: str) -> str:
+    """Lowercase a word and strip accents so 'Café' matches 'cafe'"""
+    word = unicodedata.normalize("NFKD", word.lower())
+    return "".join(c for c in word if not unicodedata.combining(c))
+
+
+def _accept(token: str) -> bool:
+    return MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH and token not in STOPWORDS
+
+
+def iter_tokens(text: str) -> Iterator[Tuple[str, int, int]]:
+    """Yield (token, start, end) for every indexable word in text"""
+    for match in TOKEN_PATTERN.finditer(text or ""):
+        token = normalize(match.group())
+        if _accept(token):
+            yield token, match.start(), match.end()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized, indexable tokens"""
+    return [token for token, _, _ in iter_tokens(text)]
+
+
+def term_frequencies(fields: List[Tuple[str, int]]) -> Tuple[Dict[str, int], int]:
+    """
+    Count weighted term frequencies over several fields.
+
+    Each field is a (text, weight) pair; a token found in a field with weight 3
+    counts as three occurrences. Returns the frequencies and the weighted length.
+    """
+    frequencies: Dict[str, int] = {}
+    length = 0
+    for text, weight in fields:
+        for token in tokenize(text):
+            frequencies[token] = frequencies.get(token, 0) + weight
+            length += weight
+    return frequencies, length
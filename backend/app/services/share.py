@@ -7,6 +7,7 @@ import os
 from ..models.document import Document
 from ..models.share import Share
 from .storage.factory import get_storage_provider
+from .storage.key_filter import get_storage_key_filter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +16,7 @@ logger = logging.getLogger(__name__)
 class ShareService:
     def __init__(self):
         self.storage = get_storage_provider()
+        self.key_filter = get_storage_key_filter()
         self.shortener = pyshorteners.Shortener()
         logger.info("ShareService initialized")
     
@@ -32,13 +34,18 @@ class ShareService:
             doc_obj_id = ObjectId(document_id)
             document = await Document.get(doc_obj_id)
             
-            if not document:
+            if not document or document.deleted_at:
                 logger.error(f"Document {document_id} not found")
                 raise ValueError("Document not found")
             if document.owner_id != owner_id:
                 logger.error(f"Access denied: {owner_id} does not own document {document_id}")
                 raise ValueError("Access denied")
             
+            # Don't hand out links to files that are definitely gone
+            if not self.key_filter.might_exist(document.s3_key, document.created_at):
+                logger.error(f"File for document {document_id} is not in storage")
+                raise ValueError("Document file not found in storage")
+            
             # Generate B2 download URL
             long_url = await self.storage.generate_download_url(
                 document.s3_key,
@@ -56,6 +63,7 @@ class ShareService:
             
             # Create share record
             current_time = datetime.now(timezone.utc)
+            now = datetime.utcnow()
             expiry_time = current_time + timedelta(days=expires_in_days)
             
             share = Share(
@@ -63,7 +71,10 @@ class ShareService:
                 owner_id=owner_id,
                 short_url=short_url,
                 long_url=long_url,
-                expires_at=expiry_time
+                expires_at=expiry_time,
+                # The change bus polls on updated_at without change streams
+                created_at=now,
+                updated_at=now
             )
             
             # Save share
@@ -86,9 +97,9 @@ class ShareService:
             if not share:
                 raise ValueError("Share not found")
             
-            # Check if expired
+            # The TTL monitor deletes expired shares within about a minute;
+            # until then they are just treated as expired
             if share.expires_at < datetime.now(timezone.utc):
-                await share.delete()
                 raise ValueError("Share link has expired")
             
             return share
@@ -128,14 +139,3 @@ class ShareService:
             raise
         except Exception as e:
             raise ValueError(f"Error deleting share: {str(e)}")
-    
-    async def cleanup_expired_shares(self) -> int:
-        """Delete all expired shares"""
-        try:
-            result = await Share.find(
-                Share.expires_at < datetime.now(timezone.utc)
-            ).delete()
-            return result.deleted_count
-            
-        except Exception as e:
-            raise ValueError(f"Error cleaning up expired shares: {str(e)}") 
\ No newline at end of file
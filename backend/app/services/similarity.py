@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import re
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from bson import ObjectId
+
+from ..core.config import settings
+from ..models.content import DocumentContent
+from ..models.document import Document, LIVE
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Words per shingle: short enough that a re-scan's OCR errors only break a few
+SHINGLE_SIZE = 3
+
+# 128 hash functions in 16 bands of 8 rows: documents sharing a band are
+# candidates, which catches ~90% of pairs at Jaccard 0.8 and few below 0.5
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Universal hashing (a * x + b) mod p; fixed seed, so signatures are
+# comparable across processes and restarts
+PRIME = (1 << 31) - 1
+_random = np.random.RandomState(20240229)
+_A = _random.randint(1, PRIME, size=NUM_PERM).astype(np.uint64)
+_B = _random.randint(0, PRIME, size=NUM_PERM).astype(np.uint64)
+
+# Shingles hashed per step, to bound memory on long texts
+CHUNK_SIZE = 8192
+
+def shingles(text: str) -> np.ndarray:
+    """Distinct CRC32 hashes of a text's overlapping word shingles"""
+    words = TOKEN_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = (" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+    hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64)
+    return np.unique(hashes % PRIME)
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of a text, or None if it has no words"""
+    values = shingles(text)
+    if not values.size:
+        return None
+    signature = np.full(NUM_PERM, PRIME, dtype=np.uint64)
+    for start in range(0, values.size, CHUNK_SIZE):
+        chunk = values[start:start + CHUNK_SIZE, None]
+        np.minimum(signature, ((chunk * _A + _B) % PRIME).min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+def band_keys(signature: np.ndarray) -> List[int]:
+    """One LSH key per band: the band index in the top byte, a hash of its rows below"""
+    return [
+        (band << 56) | int.from_bytes(
+            hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=7).digest(),
+            "big"
+        )
+        for band in range(BANDS)
+    ]
+
+def signature_fields(text: str) -> Dict:
+    """Content fields for a text's signature (cleared when it has none)"""
+    signature = minhash(text)
+    if signature is None:
+        return {"minhash": None, "lsh_bands": []}
+    return {"minhash": signature.tobytes(), "lsh_bands": band_keys(signature)}
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two stored signatures"""
+    return float(np.mean(np.frombuffer(a, dtype=np.uint32) == np.frombuffer(b, dtype=np.uint32)))
+
+class SimilarityService:
+    """
+    Finds near-duplicate documents from MinHash signatures.
+
+    Each document's signature is stored with its content, along with one
+    key per LSH band in a multikey index. Looking up a document fetches
+    only the documents sharing at least one band, then ranks them by the
+    signatures' estimated Jaccard similarity, so no pairwise scan is
+    needed.
+    """
+
+    async def find_similar(
+        self,
+        document_id: str,
+        owner_id: str,
+        threshold: Optional[float] = None,
+        limit: int = 10
+    ) -> Optional[List[Dict]]:
+        """Near-duplicates of a document, most similar first; None if it has no signature"""
+        collection = DocumentContent.get_motor_collection()
+        row = await collection.find_one(
+            {"document_id": document_id},
+            {"minhash": 1, "lsh_bands": 1}
+        )
+        if row is None or not row.get("minhash"):
+            return None
+        return await self.find_by_signature(
+            row["minhash"],
+            row["lsh_bands"],
+            owner_id,
+            threshold,
+            limit,
+            exclude=[document_id]
+        )
+
+    async def find_by_signature(
+        self,
+        signature: bytes,
+        bands: List[int],
+        owner_id: str,
+        threshold: Optional[float] = None,
+        limit: int = 10,
+        exclude: Optional[List[str]] = None
+    ) -> List[Dict]:
+        threshold = settings.SIMILARITY_THRESHOLD if threshold is None else threshold
+        # Candidates sharing the most bands are the likeliest duplicates, so
+        # they are kept when the candidate cap applies
+        cursor = DocumentContent.get_motor_collection().aggregate([
+            {"$match": {
+                "owner_id": owner_id,
+                "lsh_bands": {"$in": bands},
+                "document_id": {"$nin": exclude or []}
+            }},
+            {"$project": {
+                "document_id": 1,
+                "minhash": 1,
+                "matched": {"$size": {"$setIntersection": ["$lsh_bands", bands]}}
+            }},
+            {"$sort": {"matched": -1, "_id": 1}},
+            {"$limit": settings.SIMILARITY_MAX_CANDIDATES}
+        ])
+
+        scored: List[Tuple[float, str]] = []
+        async for candidate in cursor:
+            score = similarity(signature, candidate["minhash"])
+            if score >= threshold:
+                scored.append((score, candidate["document_id"]))
+        scored.sort(reverse=True)
+        if not scored:
+            return []
+
+        # Content outlives its document until the purger runs
+        rows = await Document.get_motor_collection().find(
+            {**LIVE, "_id": {"$in": [ObjectId(doc_id) for _, doc_id in scored]}},
+            {"title": 1, "file_name": 1, "created_at": 1}
+        ).to_list(length=None)
+        documents = {str(row["_id"]): row for row in rows}
+        return [
+            {
+                "document_id": doc_id,
+                "title": documents[doc_id]["title"],
+                "file_name": documents[doc_id]["file_name"],
+                "created_at": documents[doc_id]["created_at"],
+                "similarity": round(score, 3)
+            }
+            for score, doc_id in scored if doc_id in documents
+        ][:limit]
+
+@lru_cache()
+def get_similarity_service() -> SimilarityService:
+    """Get the shared similarity service instance"""
+    return SimilarityService()
@@ -1,7 +1,10 @@
-from typing import BinaryIO, Optional, Dict, Union
+from typing import BinaryIO, Optional, Dict, List, Tuple, Union
 from fastapi import HTTPException
 from b2sdk.v2 import B2Api, InMemoryAccountInfo
 from b2sdk.v2.exception import B2Error, FileNotPresent
+from functools import partial
+import asyncio
+from datetime import datetime, timezone
 import io
 import logging
 from .base import StorageProvider
@@ -44,10 +47,11 @@ class B2StorageProvider(StorageProvider):
             else:
                 file_content = file
             
-            # Upload the file
-            uploaded_file = self.bucket.upload_bytes(
-                file_content,
-                file_path
+            # Upload the file in a worker thread so concurrent uploads overlap
+            loop = asyncio.get_running_loop()
+            uploaded_file = await loop.run_in_executor(
+                None,
+                partial(self.bucket.upload_bytes, file_content, file_path)
             )
             
             logger.debug(f"Successfully uploaded file: {uploaded_file.file_name}")
@@ -86,10 +90,14 @@ class B2StorageProvider(StorageProvider):
     async def delete_file(self, file_path: str) -> None:
         try:
             logger.debug(f"Deleting file from B2: {file_path}")
-            file_version = self.bucket.get_file_info_by_name(file_path)
-            self.bucket.delete_file_version(
-                file_version.id_,
-                file_version.file_name
+            loop = asyncio.get_running_loop()
+            file_version = await loop.run_in_executor(
+                None,
+                partial(self.bucket.get_file_info_by_name, file_path)
+            )
+            await loop.run_in_executor(
+                None,
+                partial(self.bucket.delete_file_version, file_version.id_, file_version.file_name)
             )
             logger.debug("File deleted successfully")
             
@@ -166,4 +174,55 @@ class B2StorageProvider(StorageProvider):
             raise HTTPException(
                 status_code=500,
                 detail=error_msg
-            ) 
\ No newline at end of file
+            )
+    
+    async def list_files(
+        self,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: int = 1000
+    ) -> Tuple[List[Dict], Optional[str]]:
+        try:
+            # b2_list_file_names starts at (not after) start_file_name, so
+            # ask for one extra file and drop the one we already have
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, partial(
+                self.api.session.list_file_names,
+                self.bucket.id_,
+                start_file_name=start_after,
+                max_file_count=min(limit + 1, 10000),
+                prefix=prefix
+            ))
+            files = [
+                {
+                    "key": item["fileName"],
+                    "size": item["contentLength"],
+                    "modified": datetime.fromtimestamp(item["uploadTimestamp"] / 1000, tz=timezone.utc)
+                }
+                for item in response["files"]
+                if item["action"] == "upload" and item["fileName"] != start_after
+            ]
+            has_more = response.get("nextFileName") is not None or len(files) > limit
+            files = files[:limit]
+            next_key = files[-1]["key"] if files and has_more else None
+            return files, next_key
+            
+        except B2Error as e:
+            error_msg = f"Error listing files: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            raise HTTPException(status_code=500, detail=error_msg)
+    
+    async def list_prefixes(self, prefix: str = "", delimiter: str = "/") -> List[str]:
+        try:
+            # ls() skips over each folder's contents, so this stays cheap
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: [
+                folder_name
+                for _, folder_name in self.bucket.ls(prefix, recursive=False)
+                if folder_name is not None
+            ])
+            
+        except B2Error as e:
+            error_msg = f"Error listing prefixes: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            raise HTTPException(status_code=500, detail=error_msg)
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Optional, Dict, Union
+from typing import BinaryIO, Optional, Dict, List, Tuple, Union
+from fastapi import HTTPException
+import asyncio
 
 class StorageProvider(ABC):
     """Abstract base class for storage providers"""
@@ -19,6 +21,29 @@ class StorageProvider(ABC):
         """Delete a file"""
         pass
     
+    async def delete_files(self, file_paths: List[str]) -> Dict[str, str]:
+        """
+        Delete many files; returns an error message per file that failed.
+
+        Files that don't exist count as deleted. The default runs
+        delete_file concurrently; providers with a batch API override it.
+        """
+        semaphore = asyncio.Semaphore(10)
+        errors = {}
+
+        async def delete(file_path: str):
+            async with semaphore:
+                try:
+                    await self.delete_file(file_path)
+                except HTTPException as e:
+                    if e.status_code != 404:
+                        errors[file_path] = str(e.detail)
+                except Exception as e:
+                    errors[file_path] = str(e)
+
+        await asyncio.gather(*(delete(file_path) for file_path in file_paths))
+        return errors
+    
     @abstractmethod
     async def generate_download_url(self, file_path: str, duration_in_seconds: int = 3600) -> str:
         """Generate a download URL"""
@@ -28,3 +53,23 @@ class StorageProvider(ABC):
     async def get_file_info(self, file_path: str) -> Dict:
         """Get file metadata"""
         pass
+    
+    @abstractmethod
+    async def list_files(
+        self,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: int = 1000
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        List one page of files under a prefix in key order.
+
+        Returns the files (key, size, modified) with keys greater than
+        start_after, and the key to resume from (None on the last page).
+        """
+        pass
+    
+    @abstractmethod
+    async def list_prefixes(self, prefix: str = "", delimiter: str = "/") -> List[str]:
+        """List the immediate "folders" under a prefix"""
+        pass
@@ -0,0 +1,404 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument, UpdateOne
+
+from ...core.config import settings
+from ...core.database import read_collection
+from ...models.document import Document, LIVE
+from ...models.storage_object import StorageObject
+from .factory import get_storage_provider
+
+logger = logging.getLogger(__name__)
+
+# Per-shard listing state: {_id: prefix, watermark, pass_started_at,
+# completed_at, locked_by, locked_until}
+SHARD_COLLECTION = "storage_inventory_shards"
+
+# Sorts after every key (MongoDB compares strings by their UTF-8 bytes)
+KEY_MAX = "\U0010ffff"
+
+# Keys per listing request (the S3 and B2 maximum for one call is 1000/10000)
+PAGE_SIZE = 1000
+
+def shard_for_key(key: str) -> str:
+    """Shard prefix of a key: the first folder below the inventory root"""
+    root = settings.STORAGE_INVENTORY_ROOT
+    folder, separator, _ = key[len(root):].partition("/")
+    if key.startswith(root) and separator:
+        return f"{root}{folder}/"
+    return root
+
+def owner_for_shard(shard: str) -> Optional[str]:
+    root = settings.STORAGE_INVENTORY_ROOT
+    if shard.startswith(root) and len(shard) > len(root):
+        return shard[len(root):-1]
+    return None
+
+class StorageInventory:
+    """
+    MongoDB copy of the bucket listing.
+
+    The bucket is split into shards (one per folder below
+    STORAGE_INVENTORY_ROOT, i.e. one per owner). Each refresh step lists a
+    bounded number of pages of one shard, resuming from the last key seen
+    (the watermark), so a restart or a huge bucket never means starting
+    over. When a shard's listing is exhausted, entries not seen since the
+    pass started are dropped. Uploads and deletes update the inventory
+    directly so it stays exact between passes. A worker leases the shard
+    it lists, renewing the lease with every page, so workers never list
+    the same shard at once; a dead worker's shard is resumed from its
+    watermark once the lease runs out.
+    """
+
+    def __init__(self):
+        self.storage = get_storage_provider()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.discovered_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+        self.refresh_task = None
+        self.running = False
+
+    def _objects(self):
+        return StorageObject.get_motor_collection()
+
+    def _shards(self):
+        return self._objects().database[SHARD_COLLECTION]
+
+    @staticmethod
+    def _upsert(key: str, size: int, modified: Optional[datetime], now: datetime) -> UpdateOne:
+        shard = shard_for_key(key)
+        return UpdateOne(
+            {"key": key},
+            {
+                "$set": {
+                    "shard": shard,
+                    "owner_id": owner_for_shard(shard),
+                    "size": size,
+                    "modified": modified,
+                    "seen_at": now,
+                    "updated_at": now
+                },
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True
+        )
+
+    async def objects_added(self, objects: List[Dict]) -> None:
+        """Record freshly uploaded objects ({"key", "size"})"""
+        if not objects:
+            return
+        now = datetime.utcnow()
+        try:
+            await self._objects().bulk_write(
+                [self._upsert(obj["key"], obj["size"], now, now) for obj in objects],
+                ordered=False
+            )
+        except Exception as e:
+            # The next listing pass picks them up anyway
+            logger.error(f"Error recording uploads in the storage inventory: {str(e)}")
+
+    async def object_added(self, key: str, size: int) -> None:
+        await self.objects_added([{"key": key, "size": size}])
+
+    async def objects_removed(self, keys: List[str]) -> None:
+        """Drop deleted objects from the inventory"""
+        if not keys:
+            return
+        try:
+            await self._objects().delete_many({"key": {"$in": keys}})
+        except Exception as e:
+            logger.error(f"Error removing deletes from the storage inventory: {str(e)}")
+
+    async def object_removed(self, key: str) -> None:
+        await self.objects_removed([key])
+
+    async def _discover_shards(self, now: datetime) -> None:
+        """Sync the shard list with the folders below the inventory root"""
+        prefixes = set(await self.storage.list_prefixes(settings.STORAGE_INVENTORY_ROOT))
+        known = {shard["_id"] async for shard in self._shards().find({}, {"_id": 1})}
+
+        for prefix in prefixes - known:
+            await self._shards().update_one(
+                {"_id": prefix},
+                {"$setOnInsert": {"watermark": None, "pass_started_at": None, "completed_at": None}},
+                upsert=True
+            )
+        # A folder that disappeared means all of its objects are gone
+        for prefix in known - prefixes:
+            await self._objects().delete_many({"shard": prefix})
+            await self._shards().delete_one({"_id": prefix})
+
+        self.discovered_at = now
+        logger.debug(f"Storage inventory has {len(prefixes)} shards")
+
+    def _lease(self, now: datetime) -> Dict:
+        return {
+            "locked_by": self.worker_id,
+            "locked_until": now + timedelta(seconds=settings.STORAGE_INVENTORY_LEASE_SECONDS)
+        }
+
+    async def _claim(self, query: Dict, now: datetime, sort: Optional[List] = None) -> Optional[Dict]:
+        """Lease a matching shard that no other worker holds"""
+        return await self._shards().find_one_and_update(
+            {"$and": [query, {"$or": [
+                {"locked_until": None},
+                {"locked_until": {"$lt": now}},
+                {"locked_by": self.worker_id}
+            ]}]},
+            {"$set": self._lease(now)},
+            sort=sort,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _next_shard(self, now: datetime) -> Optional[Dict]:
+        """Lease a shard with a pass in progress, else the stalest one that is due"""
+        shard = await self._claim({"watermark": {"$ne": None}}, now)
+        if shard:
+            return shard
+
+        interval = timedelta(seconds=settings.STORAGE_INVENTORY_INTERVAL)
+        if self.discovered_at is None or now - self.discovered_at > interval:
+            await self._discover_shards(now)
+
+        return await self._claim(
+            {"$or": [{"completed_at": None}, {"completed_at": {"$lt": now - interval}}]},
+            now,
+            sort=[("completed_at", 1)]
+        )
+
+    async def refresh_step(self, max_pages: Optional[int] = None) -> Optional[Dict]:
+        """
+        List up to max_pages pages of one shard.
+
+        Returns progress information, or None when no shard is due.
+        """
+        async with self._lock:
+            now = datetime.utcnow()
+            shard = await self._next_shard(now)
+            if shard is None:
+                return None
+
+            prefix = shard["_id"]
+            watermark = shard.get("watermark")
+            started = shard.get("pass_started_at") or now
+            listed = 0
+
+            for _ in range(max_pages or settings.STORAGE_INVENTORY_PAGES):
+                files, next_key = await self.storage.list_files(
+                    prefix,
+                    start_after=watermark,
+                    limit=PAGE_SIZE
+                )
+                seen_at = datetime.utcnow()
+                if files:
+                    await self._objects().bulk_write(
+                        [self._upsert(f["key"], f["size"], f["modified"], seen_at) for f in files],
+                        ordered=False
+                    )
+                listed += len(files)
+
+                if next_key is None:
+                    removed = await self._objects().delete_many(
+                        {"shard": prefix, "seen_at": {"$lt": started}}
+                    )
+                    await self._shards().update_one({"_id": prefix, "locked_by": self.worker_id}, {"$set": {
+                        "watermark": None,
+                        "pass_started_at": None,
+                        "completed_at": datetime.utcnow(),
+                        "last_pass_started_at": started,
+                        "locked_by": None,
+                        "locked_until": None
+                    }})
+                    logger.info(
+                        f"Storage inventory pass of {prefix} done "
+                        f"({listed} listed in this step, {removed.deleted_count} removed)"
+                    )
+                    return {"shard": prefix, "listed": listed, "completed": True}
+
+                watermark = next_key
+                renewed = await self._shards().update_one(
+                    {"_id": prefix, "locked_by": self.worker_id},
+                    {"$set": {
+                        "watermark": watermark,
+                        "pass_started_at": started,
+                        **self._lease(datetime.utcnow())
+                    }}
+                )
+                if not renewed.matched_count:
+                    # The lease ran out and another worker took the shard over
+                    logger.warning(f"Lost the storage inventory lease on {prefix}")
+                    break
+
+            return {"shard": prefix, "listed": listed, "completed": False}
+
+    async def refresh_all(self) -> Dict:
+        """Run refresh steps until every due shard has completed a pass"""
+        shards, listed = set(), 0
+        while True:
+            step = await self.refresh_step()
+            if step is None:
+                return {"shards": len(shards), "listed": listed}
+            shards.add(step["shard"])
+            listed += step["listed"]
+
+    async def missing_objects(self, owner_id: Optional[str] = None) -> List[Document]:
+        """
+        Documents whose object is not in the bucket.
+
+        Only shards with a completed pass are checked, and only documents
+        created before that pass started, so in-flight uploads never count.
+        """
+        query = {"last_pass_started_at": {"$ne": None}}
+        if owner_id is not None:
+            query["_id"] = f"{settings.STORAGE_INVENTORY_ROOT}{owner_id}/"
+
+        documents = []
+        async for shard in self._shards().find(query):
+            pipeline = [
+                {"$match": {
+                    "owner_id": owner_for_shard(shard["_id"]),
+                    "created_at": {"$lt": shard["last_pass_started_at"]},
+                    **LIVE
+                }},
+                {"$lookup": {
+                    "from": StorageObject.Settings.name,
+                    "localField": "s3_key",
+                    "foreignField": "key",
+                    "as": "stored"
+                }},
+                {"$match": {"stored": {"$size": 0}}},
+                {"$project": {"stored": 0}}
+            ]
+            async for row in Document.get_motor_collection().aggregate(pipeline):
+                documents.append(Document.model_validate(row))
+        return documents
+
+    async def unreferenced_objects(
+        self,
+        owner_id: Optional[str] = None,
+        limit: int = 1000
+    ) -> List[Dict]:
+        """Objects in the bucket that no document points to"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.STORAGE_ORPHAN_GRACE_SECONDS)
+        match = {"modified": {"$lt": cutoff}}
+        if owner_id is not None:
+            match["owner_id"] = owner_id
+
+        pipeline = [
+            {"$match": match},
+            {"$lookup": {
+                "from": Document.Settings.name,
+                "localField": "key",
+                "foreignField": "s3_key",
+                "as": "documents"
+            }},
+            {"$match": {"documents": {"$size": 0}}},
+            {"$project": {"_id": 0, "key": 1, "size": 1, "owner_id": 1, "modified": 1}},
+            {"$limit": limit}
+        ]
+        return await self._objects().aggregate(pipeline).to_list(length=None)
+
+    async def browse(
+        self,
+        prefix: str = "",
+        delimiter: str = "/",
+        start_after: Optional[str] = None,
+        limit: int = 100
+    ) -> Dict:
+        """
+        List the folders and files directly under a prefix.
+
+        Folders are found by skipping over their contents with an index
+        seek (like S3's delimiter listing), so browsing a folder costs one
+        query per subfolder plus one per page of files.
+        """
+        collection = read_collection(StorageObject, "listing")
+        upper = prefix + KEY_MAX
+        cursor_key, inclusive = (start_after, False) if start_after else (prefix, True)
+        folders, files = [], []
+
+        while len(folders) + len(files) < limit:
+            wanted = limit - len(folders) - len(files)
+            query = {"key": {"$gte" if inclusive else "$gt": cursor_key, "$lt": upper}}
+            rows = await collection.find(
+                query,
+                {"_id": 0, "key": 1, "size": 1, "modified": 1, "owner_id": 1}
+            ).sort("key", 1).limit(wanted).to_list(length=None)
+            if not rows:
+                cursor_key = None
+                break
+
+            inclusive = False
+            skipped = False
+            for row in rows:
+                rest = row["key"][len(prefix):]
+                position = rest.find(delimiter) if delimiter else -1
+                if position >= 0:
+                    folder = prefix + rest[:position + len(delimiter)]
+                    folders.append(folder)
+                    cursor_key = folder + KEY_MAX
+                    skipped = True
+                    break
+                files.append(row)
+                cursor_key = row["key"]
+
+            if not skipped and len(rows) < wanted:
+                cursor_key = None
+                break
+
+        return {
+            "prefix": prefix,
+            "folders": folders,
+            "files": files,
+            "next_start_after": cursor_key
+        }
+
+    async def usage(self, owner_id: Optional[str] = None) -> List[Dict]:
+        """Object count and bytes stored per owner"""
+        pipeline = []
+        if owner_id is not None:
+            pipeline.append({"$match": {"owner_id": owner_id}})
+        pipeline += [
+            {"$group": {"_id": "$owner_id", "objects": {"$sum": 1}, "bytes": {"$sum": "$size"}}},
+            {"$project": {"_id": 0, "owner_id": "$_id", "objects": 1, "bytes": 1}},
+            {"$sort": {"bytes": -1}}
+        ]
+        return await read_collection(StorageObject, "stats").aggregate(pipeline).to_list(length=None)
+
+    async def refresh_loop(self):
+        """Keep listing shards; back off once everything is fresh"""
+        while self.running:
+            try:
+                step = await self.refresh_step()
+            except Exception as e:
+                logger.error(f"Error refreshing storage inventory: {str(e)}")
+                step = None
+            await asyncio.sleep(1 if step else settings.STORAGE_INVENTORY_INTERVAL)
+
+    async def start(self):
+        """Start the incremental refresh task"""
+        self.running = True
+        self.refresh_task = asyncio.create_task(self.refresh_loop())
+        logger.info("Started storage inventory refresh")
+
+    async def stop(self):
+        """Stop the refresh task"""
+        if self.running:
+            self.running = False
+            if self.refresh_task:
+                self.refresh_task.cancel()
+                try:
+                    await self.refresh_task
+                except asyncio.CancelledError:
+                    pass
+            logger.info("Stopped storage inventory refresh")
+
+@lru_cache()
+def get_storage_inventory() -> StorageInventory:
+    """Get the shared storage inventory instance"""
+    return StorageInventory()
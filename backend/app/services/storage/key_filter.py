@@ -0,0 +1,307 @@
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from ...core.config import settings
+from ...models.document import Document
+from ..events import get_event_bus
+from .factory import get_storage_provider
+
+logger = logging.getLogger(__name__)
+
+# Never size the filter below this many keys, so an empty bucket can grow
+MIN_CAPACITY = 10000
+
+# Counters stop at this value; saturated slots are never decremented
+MAX_COUNT = 255
+
+# A document's creation time is taken before its file is uploaded, and
+# clocks differ between workers: only documents created this long before
+# a build are known to be in it
+BUILD_MARGIN = timedelta(minutes=5)
+
+# "Maybe" answers waiting for confirm; the oldest are forgotten beyond this
+MAX_OPEN_LOOKUPS = 10000
+
+def key_digest(key: str) -> int:
+    """64-bit fingerprint of a key, for tracking which keys were counted"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+class CountingBloomFilter:
+    """
+    Bloom filter with 8-bit counters instead of bits, so keys can be removed.
+
+    Answers "definitely not present" or "maybe present". Indexes come from
+    one blake2b digest split into two 64-bit hashes (h1 + i * h2).
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.counters = bytearray(self.size)
+        self.count = 0
+
+    def _indexes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        counters = self.counters
+        for index in self._indexes(key):
+            if counters[index] < MAX_COUNT:
+                counters[index] += 1
+        self.count += 1
+
+    def remove(self, key: str) -> bool:
+        """Remove a key that was added before (removing others breaks the filter)"""
+        indexes = self._indexes(key)
+        counters = self.counters
+        if not all(counters[index] for index in indexes):
+            return False
+        for index in indexes:
+            if counters[index] < MAX_COUNT:
+                counters[index] -= 1
+        self.count -= 1
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        counters = self.counters
+        return all(counters[index] for index in self._indexes(key))
+
+    def expected_error_rate(self) -> float:
+        """Theoretical false-positive rate at the current fill"""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+class StorageKeyFilter:
+    """
+    In-memory existence oracle for storage keys.
+
+    A definite miss means the object does not exist and callers can answer
+    without a remote HEAD; only "maybe" answers go to storage. The filter
+    is seeded from the documents collection at startup, kept current on
+    upload/delete and from document change events (uploads on other
+    workers), and periodically rebuilt from a full storage listing (which
+    also clears keys whose objects vanished outside the app).
+
+    Events arrive with some delay, so a miss is only trusted for documents
+    created well before the last build; newer ones are checked in storage.
+    Fingerprints of the counted keys are kept next to the filter, so a key
+    is counted once however often it is reported, and only keys that were
+    counted are ever removed (removing others would clear counters that
+    unrelated keys share).
+    """
+
+    def __init__(self):
+        self.storage = get_storage_provider()
+        self.filter: Optional[CountingBloomFilter] = None
+        self.source: Optional[str] = None
+        self.built_at: Optional[datetime] = None  # When the current filter's build started
+        self.rebuild_task = None
+        self.running = False
+        # Sorted fingerprints of the keys the filter was built from, and
+        # keys added or removed since
+        self._digests = np.empty(0, dtype=np.uint64)
+        self._added = set()
+        self._removed = set()
+        # Changes made while a rebuild is listing storage, replayed afterwards
+        self._pending: Optional[List] = None
+        # Fingerprints of keys the filter answered "maybe" for, oldest first,
+        # so confirm only counts false positives of the filter itself
+        self._maybe: Dict[int, None] = {}
+        self.stats = {"lookups": 0, "definite_misses": 0, "maybe": 0, "unverified": 0, "false_positives": 0}
+
+    def _build(self, keys: Iterable[str]) -> Tuple[CountingBloomFilter, np.ndarray]:
+        keys = set(keys)
+        bloom = CountingBloomFilter(
+            max(len(keys) * 2, MIN_CAPACITY),
+            settings.STORAGE_KEY_FILTER_ERROR_RATE
+        )
+        for key in keys:
+            bloom.add(key)
+        digests = np.fromiter((key_digest(key) for key in keys), dtype=np.uint64, count=len(keys))
+        digests.sort()
+        return bloom, digests
+
+    def _swap(self, bloom: CountingBloomFilter, digests: np.ndarray, source: str, started_at: datetime) -> None:
+        self.filter, self._digests, self._added, self._removed = bloom, digests, set(), set()
+        self.source, self.built_at = source, started_at
+        pending, self._pending = self._pending or [], None
+        for action, key in pending:
+            if action == "add":
+                self._add(key)
+            else:
+                self._remove(key)
+        logger.info(
+            f"Storage key filter built from {source}: {bloom.count} keys, "
+            f"{bloom.size} counters, {bloom.hashes} hashes"
+        )
+
+    async def load_from_documents(self) -> int:
+        """Seed the filter with the storage keys of all documents"""
+        self._pending = []
+        started_at = datetime.utcnow()
+        keys = [
+            row["s3_key"]
+            async for row in Document.get_motor_collection().find({}, {"s3_key": 1, "_id": 0})
+            if "s3_key" in row
+        ]
+        loop = asyncio.get_running_loop()
+        bloom, digests = await loop.run_in_executor(None, self._build, keys)
+        self._swap(bloom, digests, "documents", started_at)
+        return len(keys)
+
+    async def rebuild_from_storage(self) -> int:
+        """Rebuild the filter from a paginated listing of the whole bucket"""
+        self._pending = []
+        started_at = datetime.utcnow()
+        try:
+            keys, start_after = [], None
+            while True:
+                files, start_after = await self.storage.list_files("", start_after=start_after)
+                keys.extend(f["key"] for f in files)
+                if start_after is None:
+                    break
+        except Exception:
+            self._pending = None
+            raise
+        loop = asyncio.get_running_loop()
+        bloom, digests = await loop.run_in_executor(None, self._build, keys)
+        self._swap(bloom, digests, "storage", started_at)
+        return len(keys)
+
+    def _counted(self, digest: int) -> bool:
+        if digest in self._added:
+            return True
+        if digest in self._removed:
+            return False
+        index = np.searchsorted(self._digests, np.uint64(digest))
+        return bool(index < len(self._digests) and self._digests[index] == digest)
+
+    def _add(self, key: str) -> None:
+        if self.filter is None:
+            return
+        digest = key_digest(key)
+        if self._counted(digest):
+            return
+        self._removed.discard(digest)
+        self._added.add(digest)
+        self.filter.add(key)
+
+    def _remove(self, key: str) -> None:
+        if self.filter is None:
+            return
+        digest = key_digest(key)
+        if not self._counted(digest):
+            return
+        self._added.discard(digest)
+        self._removed.add(digest)
+        self.filter.remove(key)
+
+    def key_added(self, key: str) -> None:
+        if self._pending is not None:
+            self._pending.append(("add", key))
+        self._add(key)
+
+    def key_removed(self, key: str) -> None:
+        if self._pending is not None:
+            self._pending.append(("remove", key))
+        self._remove(key)
+
+    def might_exist(self, key: str, created_at: Optional[datetime] = None) -> bool:
+        """
+        False only if the key is definitely not in storage.
+
+        Pass the document's creation time: keys of documents created since
+        the last build may not have reached the filter yet, so they (and
+        keys of unknown age) are always reported as maybe present.
+        """
+        if self.filter is None:
+            return True
+        self.stats["lookups"] += 1
+        if key in self.filter:
+            self.stats["maybe"] += 1
+            self._maybe[key_digest(key)] = None
+            if len(self._maybe) > MAX_OPEN_LOOKUPS:
+                del self._maybe[next(iter(self._maybe))]
+            return True
+        if created_at is None or created_at >= self.built_at - BUILD_MARGIN:
+            self.stats["unverified"] += 1
+            return True
+        self.stats["definite_misses"] += 1
+        return False
+
+    def confirm(self, key: str, exists: bool) -> None:
+        """
+        Record what storage said about a key might_exist let through.
+
+        Only keys the filter itself answered "maybe" for count: unverified
+        keys and lookups without a filter never were definite misses.
+        """
+        digest = key_digest(key)
+        if digest not in self._maybe:
+            return
+        del self._maybe[digest]
+        if not exists:
+            self.stats["false_positives"] += 1
+
+    def metrics(self) -> Dict:
+        """Lookup counters plus observed and expected false-positive rates"""
+        negatives = self.stats["definite_misses"] + self.stats["false_positives"]
+        return {
+            **self.stats,
+            "false_positive_rate": self.stats["false_positives"] / negatives if negatives else 0.0,
+            "expected_false_positive_rate": self.filter.expected_error_rate() if self.filter else None,
+            "keys": self.filter.count if self.filter else 0,
+            "capacity": self.filter.capacity if self.filter else 0,
+            "source": self.source
+        }
+
+    async def rebuild_loop(self):
+        """Periodically rebuild from storage (the first run right after startup)"""
+        while self.running:
+            try:
+                await self.rebuild_from_storage()
+            except Exception as e:
+                logger.error(f"Error rebuilding storage key filter: {str(e)}")
+            await asyncio.sleep(settings.STORAGE_KEY_FILTER_REBUILD_INTERVAL)
+
+    def _on_document_change(self, event) -> None:
+        # Uploads made by other workers. Polling reports every change as an
+        # update, so any live document's key is added (once: see _add)
+        document = event.document
+        if document and document.get("s3_key") and not document.get("deleted_at"):
+            self.key_added(document["s3_key"])
+
+    async def start(self):
+        """Seed from documents and start the periodic storage rebuild"""
+        await self.load_from_documents()
+        get_event_bus().subscribe("documents", self._on_document_change)
+        self.running = True
+        self.rebuild_task = asyncio.create_task(self.rebuild_loop())
+        logger.info("Started storage key filter rebuilds")
+
+    async def stop(self):
+        """Stop the rebuild task"""
+        if self.running:
+            self.running = False
+            if self.rebuild_task:
+                self.rebuild_task.cancel()
+                try:
+                    await self.rebuild_task
+                except asyncio.CancelledError:
+                    pass
+            logger.info("Stopped storage key filter rebuilds")
+
+@lru_cache()
+def get_storage_key_filter() -> StorageKeyFilter:
+    """Get the shared storage key filter instance"""
+    return StorageKeyFilter()
@@ -1,7 +1,9 @@
-from typing import BinaryIO, Optional, Dict, Union
+from typing import BinaryIO, Optional, Dict, List, Tuple, Union
 from fastapi import HTTPException
 import boto3
 from botocore.exceptions import ClientError
+from functools import partial
+import asyncio
 import io
 from .base import StorageProvider
 
@@ -23,8 +25,12 @@ class S3StorageProvider(StorageProvider):
             if isinstance(file, bytes):
                 file = io.BytesIO(file)
             
-            # Upload file
-            self.s3.upload_fileobj(file, self.bucket_name, file_path)
+            # Upload file in a worker thread so concurrent uploads overlap
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None,
+                partial(self.s3.upload_fileobj, file, self.bucket_name, file_path)
+            )
             return file_path
             
         except ClientError as e:
@@ -50,13 +56,35 @@ class S3StorageProvider(StorageProvider):
     
     async def delete_file(self, file_path: str) -> None:
         try:
-            self.s3.delete_object(Bucket=self.bucket_name, Key=file_path)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None,
+                partial(self.s3.delete_object, Bucket=self.bucket_name, Key=file_path)
+            )
         except ClientError as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Error deleting file from S3: {str(e)}"
             )
     
+    async def delete_files(self, file_paths: List[str]) -> Dict[str, str]:
+        # One DeleteObjects request per 1000 keys (missing keys succeed)
+        errors = {}
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(file_paths), 1000):
+            batch = file_paths[start:start + 1000]
+            try:
+                response = await loop.run_in_executor(None, partial(
+                    self.s3.delete_objects,
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                ))
+                for error in response.get("Errors", []):
+                    errors[error["Key"]] = error.get("Message", error.get("Code", "Delete failed"))
+            except ClientError as e:
+                errors.update({key: str(e) for key in batch})
+        return errors
+    
     async def generate_download_url(self, file_path: str, duration_in_seconds: int = 3600) -> str:
         try:
             url = self.s3.generate_presigned_url(
@@ -95,3 +123,49 @@ class S3StorageProvider(StorageProvider):
                 status_code=500,
                 detail=f"Error getting file info: {str(e)}"
             )
+    
+    async def list_files(
+        self,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: int = 1000
+    ) -> Tuple[List[Dict], Optional[str]]:
+        try:
+            params = {"Bucket": self.bucket_name, "Prefix": prefix, "MaxKeys": limit}
+            if start_after:
+                params["StartAfter"] = start_after
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, partial(self.s3.list_objects_v2, **params))
+            files = [
+                {
+                    "key": item["Key"],
+                    "size": item["Size"],
+                    "modified": item["LastModified"]
+                }
+                for item in response.get("Contents", [])
+            ]
+            next_key = files[-1]["key"] if files and response.get("IsTruncated") else None
+            return files, next_key
+            
+        except ClientError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error listing files: {str(e)}"
+            )
+    
+    async def list_prefixes(self, prefix: str = "", delimiter: str = "/") -> List[str]:
+        try:
+            paginator = self.s3.get_paginator("list_objects_v2")
+            pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter=delimiter)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: [
+                common["Prefix"]
+                for page in pages
+                for common in page.get("CommonPrefixes", [])
+            ])
+            
+        except ClientError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error listing prefixes: {str(e)}"
+            )
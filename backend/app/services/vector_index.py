@@ -0,0 +1,551 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from bson import ObjectId
+
+from ..core.config import settings
+from ..models.content import DocumentContent
+from ..models.document import Document, LIVE
+from .events import get_event_bus
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w{3,}")
+
+ID_DTYPE = np.dtype((np.void, 12))  # Raw ObjectId bytes
+
+def embed(text: str, dimensions: int) -> Optional[np.ndarray]:
+    """
+    Hashed n-gram embedding of a text, or None if it has no words.
+
+    Words and word bigrams are hashed with CRC32 into a few hundred signed
+    buckets, counts log-scaled and the vector L2-normalized, so cosine
+    similarity is a dot product. Purely local and deterministic: no
+    vocabulary or model to train.
+    """
+    words = [word for word in TOKEN_PATTERN.findall(text.lower()) if not word.isdigit()]
+    if not words:
+        return None
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint32)
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    counts = np.bincount(hashes % dimensions, weights=signs, minlength=dimensions)
+    vector = np.sign(counts) * np.log1p(np.abs(counts))
+    norm = np.linalg.norm(vector)
+    if not norm:
+        return None
+    return (vector / norm).astype(np.float32)
+
+def embedding_fields(text: str) -> Dict:
+    """Content fields for a text's embedding (cleared when it has none)"""
+    vector = embed(text, settings.VECTOR_DIMENSIONS)
+    return {
+        "embedding": vector.tobytes() if vector is not None else None,
+        "embedded_at": datetime.utcnow()
+    }
+
+class VectorIndex:
+    """
+    Append-only float32 matrix of document vectors, memory-mapped from disk.
+
+    Rows are appended to vectors.f32 (with the document and owner of each
+    row in ids.bin and owners.bin) and removed by recording them in
+    deleted.bin; compact() writes a new generation of the files without
+    removed rows. meta.json names the current generation and how many rows
+    and deletions are complete, and is replaced atomically after every
+    change. Only one writable instance may use a directory; read-only
+    instances (other processes) share its files through the page cache
+    and catch up with refresh().
+    Searches are one matrix product over the owner's rows: for a large
+    share of the index the whole contiguous matrix is scanned and other
+    rows masked, otherwise the owner's rows are gathered first.
+    """
+
+    def __init__(self, path: str, dimensions: int, writable: bool = True):
+        self.path = path
+        self.dimensions = dimensions
+        self.writable = writable
+        self.meta: Dict = {}
+        self._clear()
+
+    def _clear(self) -> None:
+        self.owner_names: List[str] = []
+        self.owner_codes: Dict[str, int] = {}
+        self.vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=ID_DTYPE)
+        self.owners = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self._deleted = 0  # Entries of deleted.bin applied to alive
+
+    def _file(self, name: str, generation: Optional[int] = None) -> str:
+        generation = self.meta["generation"] if generation is None else generation
+        return os.path.join(self.path, f"gen-{generation}", name)
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(os.path.join(self.path, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def open(self) -> None:
+        """Map the current generation (a writer starts empty if there is none or it doesn't match)"""
+        meta = self._read_meta()
+        if meta.get("dimensions") != self.dimensions or "generation" not in meta:
+            if not self.writable:
+                self.meta = {}
+                self._clear()
+                return
+            self.meta = meta
+            self._reset()
+            meta = self.meta
+
+        generation, rows, deleted = meta["generation"], meta["rows"], meta["deleted"]
+        if self.writable:
+            # A crash mid-append can leave rows meta.json doesn't count: cut them
+            os.truncate(self._file("ids.bin", generation), rows * ID_DTYPE.itemsize)
+            os.truncate(self._file("owners.bin", generation), rows * 4)
+            os.truncate(self._file("vectors.f32", generation), rows * 4 * self.dimensions)
+            os.truncate(self._file("deleted.bin", generation), deleted * 8)
+        # Read everything before switching over, so a failed open (e.g. a
+        # compaction removed the files) leaves the index as it was
+        with open(self._file("owners.json", generation)) as f:
+            owner_names = json.load(f)
+        ids = np.fromfile(self._file("ids.bin", generation), dtype=ID_DTYPE, count=rows)
+        owners = np.fromfile(self._file("owners.bin", generation), dtype=np.int32, count=rows)
+        vectors = self._map(rows, generation)
+        deleted_rows = np.fromfile(self._file("deleted.bin", generation), dtype=np.int64, count=deleted)
+
+        self.meta = meta
+        self.owner_names = owner_names
+        self.owner_codes = {owner: code for code, owner in enumerate(owner_names)}
+        self.ids, self.owners, self.vectors = ids, owners, vectors
+        self.alive = np.ones(rows, dtype=bool)
+        self.alive[deleted_rows[deleted_rows < rows]] = False
+        self._deleted = deleted
+
+    def refresh(self) -> bool:
+        """Catch up with the writer's changes (read-only instances); returns whether any"""
+        meta = self._read_meta()
+        if meta == self.meta:
+            return False
+        if meta.get("generation") != self.meta.get("generation") or meta.get("dimensions") != self.dimensions:
+            self.open()
+            return True
+
+        rows, known = meta["rows"], len(self.ids)
+        if rows > known:
+            self._load_owners()
+            ids = np.fromfile(self._file("ids.bin"), dtype=ID_DTYPE, count=rows - known, offset=known * ID_DTYPE.itemsize)
+            owners = np.fromfile(self._file("owners.bin"), dtype=np.int32, count=rows - known, offset=known * 4)
+            self.ids = np.concatenate([self.ids, ids])
+            self.owners = np.concatenate([self.owners, owners])
+            self.alive = np.concatenate([self.alive, np.ones(rows - known, dtype=bool)])
+            self.vectors = self._map(rows)
+        self._apply_deleted(meta["deleted"])
+        self.meta = meta
+        return True
+
+    def _load_owners(self) -> None:
+        with open(self._file("owners.json")) as f:
+            self.owner_names = json.load(f)
+        self.owner_codes = {owner: code for code, owner in enumerate(self.owner_names)}
+
+    def _apply_deleted(self, count: int) -> None:
+        if count > self._deleted:
+            deleted = np.fromfile(
+                self._file("deleted.bin"),
+                dtype=np.int64,
+                count=count - self._deleted,
+                offset=self._deleted * 8
+            )
+            self.alive[deleted[deleted < len(self.alive)]] = False
+            self._deleted = count
+
+    def _write_generation(self, generation: int, owner_names: List[str]) -> str:
+        """Create an empty generation directory; returns its path"""
+        directory = os.path.join(self.path, f"gen-{generation}")
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        for name in ("vectors.f32", "ids.bin", "owners.bin", "deleted.bin"):
+            open(os.path.join(directory, name), "wb").close()
+        with open(os.path.join(directory, "owners.json"), "w") as f:
+            json.dump(owner_names, f)
+        return directory
+
+    def _drop_generations(self, keep: int) -> None:
+        for entry in os.listdir(self.path):
+            if entry.startswith("gen-") and entry != f"gen-{keep}":
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    def _reset(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        generation = self.meta.get("generation", -1) + 1
+        self._write_generation(generation, [])
+        self.meta = {"dimensions": self.dimensions, "generation": generation, "rows": 0, "deleted": 0}
+        self.save_meta()
+        self._drop_generations(generation)
+
+    def _map(self, rows: int, generation: Optional[int] = None) -> np.ndarray:
+        if not rows:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return np.memmap(self._file("vectors.f32", generation), dtype=np.float32, mode="r", shape=(rows, self.dimensions))
+
+    def save_meta(self) -> None:
+        path = os.path.join(self.path, "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.meta, f)
+        os.replace(path + ".tmp", path)
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def _rows_of(self, document_ids: Iterable[str]) -> np.ndarray:
+        keys = np.array([bytes.fromhex(doc_id) for doc_id in document_ids], dtype=ID_DTYPE)
+        if not keys.size or not self.ids.size:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.isin(self.ids, keys) & self.alive)
+
+    def remove(self, document_ids: Iterable[str]) -> int:
+        """Mark documents' rows deleted (only in memory if read-only); returns how many"""
+        rows = self._rows_of(document_ids)
+        if rows.size:
+            self.alive[rows] = False
+            if self.writable:
+                with open(self._file("deleted.bin"), "ab") as f:
+                    f.write(rows.astype(np.int64).tobytes())
+                self._deleted += rows.size
+                self.meta["deleted"] = self._deleted
+                self.save_meta()
+        return int(rows.size)
+
+    def append(self, entries: List[Tuple[str, str, np.ndarray]]) -> None:
+        """Add (document_id, owner_id, vector) rows, replacing documents' previous rows if changed"""
+        current = self.vectors_of([doc_id for doc_id, _, _ in entries])
+        entries = [
+            (doc_id, owner, vector) for doc_id, owner, vector in entries
+            if doc_id not in current or not np.array_equal(current[doc_id], vector)
+        ]
+        if not entries:
+            return
+        self.remove(doc_id for doc_id, _, _ in entries)
+
+        new_owners = [owner for _, owner, _ in entries if owner not in self.owner_codes]
+        if new_owners:
+            for owner in dict.fromkeys(new_owners):
+                self.owner_codes[owner] = len(self.owner_names)
+                self.owner_names.append(owner)
+            with open(self._file("owners.json") + ".tmp", "w") as f:
+                json.dump(self.owner_names, f)
+            os.replace(self._file("owners.json") + ".tmp", self._file("owners.json"))
+
+        ids = np.array([bytes.fromhex(doc_id) for doc_id, _, _ in entries], dtype=ID_DTYPE)
+        owners = np.array([self.owner_codes[owner] for _, owner, _ in entries], dtype=np.int32)
+        vectors = np.stack([vector for _, _, vector in entries]).astype(np.float32)
+        with open(self._file("ids.bin"), "ab") as f:
+            f.write(ids.tobytes())
+        with open(self._file("owners.bin"), "ab") as f:
+            f.write(owners.tobytes())
+        with open(self._file("vectors.f32"), "ab") as f:
+            f.write(vectors.tobytes())
+
+        rows = len(self.ids) + len(entries)
+        self.ids = np.concatenate([self.ids, ids])
+        self.owners = np.concatenate([self.owners, owners])
+        self.alive = np.concatenate([self.alive, np.ones(len(entries), dtype=bool)])
+        self.vectors = self._map(rows)
+        # The rows are complete: count them
+        self.meta["rows"] = rows
+        self.save_meta()
+
+    def vectors_of(self, document_ids: List[str]) -> Dict[str, np.ndarray]:
+        rows = self._rows_of(document_ids)
+        return {self.ids[row].tobytes().hex(): np.array(self.vectors[row]) for row in rows}
+
+    def search(
+        self,
+        queries: np.ndarray,
+        owner_id: str,
+        k: int = 10,
+        exclude: Optional[List[str]] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """Top-k (document_id, cosine) of the owner's rows for each query vector"""
+        code = self.owner_codes.get(owner_id)
+        # Appends replace these one by one; use the rows all of them have
+        vectors, ids, owners, alive = self.vectors, self.ids, self.owners, self.alive
+        count = min(len(vectors), len(ids), len(owners), len(alive))
+        if code is None or not count:
+            return [[] for _ in queries]
+        vectors, ids = vectors[:count], ids[:count]
+        mask = (owners[:count] == code) & alive[:count]
+        if exclude:
+            mask &= ~np.isin(ids, np.array([bytes.fromhex(doc_id) for doc_id in exclude], dtype=ID_DTYPE))
+        rows = np.flatnonzero(mask)
+        if not rows.size:
+            return [[] for _ in queries]
+
+        queries = np.atleast_2d(queries).astype(np.float32)
+        if rows.size > count * settings.VECTOR_INDEX_FULL_SCAN_RATIO:
+            # Scanning contiguous memory beats gathering most of it
+            scores = vectors @ queries.T
+            scores[~mask] = -np.inf
+        else:
+            scores = vectors[rows] @ queries.T
+            ids = ids[rows]
+        # One contiguous row of scores per query for the partial sorts
+        scores = np.ascontiguousarray(np.asarray(scores).T)
+
+        k = min(k, rows.size)
+        results = []
+        for row in scores:
+            top = np.argpartition(row, -k)[-k:]
+            best = top[np.argsort(-row[top])]
+            results.append([(ids[i].tobytes().hex(), float(row[i])) for i in best])
+        return results
+
+    def garbage_ratio(self) -> float:
+        return 1 - len(self) / len(self.alive) if len(self.alive) else 0.0
+
+    def compact(self, keep: Optional[Set[str]] = None) -> int:
+        """Write a new generation with only live rows (and only documents in keep); returns rows dropped"""
+        alive = self.alive.copy()
+        if keep is not None:
+            alive &= np.array([row.tobytes().hex() in keep for row in self.ids], dtype=bool)
+        rows = np.flatnonzero(alive)
+        dropped = len(self.ids) - rows.size
+
+        owners_used = np.unique(self.owners[rows])
+        remap = np.zeros(len(self.owner_names), dtype=np.int32)
+        remap[owners_used] = np.arange(owners_used.size, dtype=np.int32)
+        owner_names = [self.owner_names[code] for code in owners_used]
+
+        generation = self.meta["generation"] + 1
+        directory = self._write_generation(generation, owner_names)
+        with open(os.path.join(directory, "vectors.f32"), "wb") as f:
+            for start in range(0, rows.size, 65536):
+                f.write(np.ascontiguousarray(self.vectors[rows[start:start + 65536]]).tobytes())
+        self.ids[rows].tofile(os.path.join(directory, "ids.bin"))
+        remap[self.owners[rows]].tofile(os.path.join(directory, "owners.bin"))
+
+        # Switch readers over, then drop the old files (their maps stay valid)
+        self.meta = {**self.meta, "generation": generation, "rows": int(rows.size), "deleted": 0}
+        self.save_meta()
+        self._drop_generations(generation)
+        self.open()
+        return dropped
+
+class RelatedDocumentsService:
+    """
+    "Related documents" from a vector index shared by the processes of a host.
+
+    Embeddings are computed from the extracted text when it is stored
+    (see DocumentContentService.save) and kept in MongoDB. The process
+    holding the index directory's lock is its only writer: it syncs the
+    embeddings stored since its last sync, drops documents as they are
+    deleted, and compacts. The other processes map the same files
+    read-only, follow the writer's changes, and take over if it exits.
+    Documents from any worker become searchable within
+    VECTOR_INDEX_SYNC_INTERVAL; tombstoned documents are also filtered at
+    query time.
+    """
+
+    def __init__(self):
+        self.index: Optional[VectorIndex] = None
+        self.task = None
+        self.running = False
+        self._lock_file = None
+        # Serializes changes to the index: a removal recorded during a
+        # compaction would point at rows of the old generation
+        self._lock = asyncio.Lock()
+        self.stats = {"searches": 0, "synced": 0, "compactions": 0, "search_ms": 0.0}
+
+    def _open(self) -> VectorIndex:
+        """Open the index: writable if this process gets the lock, read-only otherwise"""
+        path = settings.VECTOR_INDEX_PATH
+        os.makedirs(path, exist_ok=True)
+        if self._lock_file is None:
+            self._lock_file = open(os.path.join(path, ".lock"), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            writable = True
+        except OSError:
+            writable = False
+        index = VectorIndex(path, settings.VECTOR_DIMENSIONS, writable=writable)
+        index.open()
+        return index
+
+    def _follow(self) -> VectorIndex:
+        """Read-only: take over as writer if the lock is free, else catch up"""
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.index.refresh()
+            return self.index
+        logger.info("Vector index writer went away, taking over")
+        index = VectorIndex(settings.VECTOR_INDEX_PATH, settings.VECTOR_DIMENSIONS, writable=True)
+        index.open()
+        return index
+
+    async def sync(self) -> int:
+        """Add embeddings stored since the last sync (writer only); returns how many"""
+        index = self.index
+        loop = asyncio.get_running_loop()
+        watermark = index.meta.get("watermark")
+        query = {"embedding": {"$ne": None}}
+        if watermark:
+            query["embedded_at"] = {"$gte": datetime.fromisoformat(watermark)}
+        cursor = DocumentContent.get_motor_collection().find(
+            query,
+            {"document_id": 1, "owner_id": 1, "embedding": 1, "embedded_at": 1}
+        ).sort("embedded_at", 1)
+
+        synced = 0
+        batch, last = [], None
+        async for row in cursor:
+            vector = np.frombuffer(row["embedding"], dtype=np.float32)
+            if vector.size != index.dimensions:
+                continue
+            batch.append((row["document_id"], row["owner_id"], vector))
+            last = row["embedded_at"]
+            if len(batch) >= 10000:
+                async with self._lock:
+                    await loop.run_in_executor(None, index.append, batch)
+                synced += len(batch)
+                batch = []
+        async with self._lock:
+            await loop.run_in_executor(None, index.append, batch)
+            synced += len(batch)
+            if last is not None:
+                # Rows at the watermark itself are read again next time; unchanged ones are skipped
+                index.meta["watermark"] = last.isoformat()
+                index.save_meta()
+        self.stats["synced"] += synced
+        return synced
+
+    async def compact(self) -> int:
+        """Drop dead rows, and rows of documents whose content is gone (writer only)"""
+        keep = set()
+        async for row in DocumentContent.get_motor_collection().find({"embedding": {"$ne": None}}, {"document_id": 1}):
+            keep.add(row["document_id"])
+        async with self._lock:
+            dropped = await asyncio.get_running_loop().run_in_executor(None, self.index.compact, keep)
+        self.stats["compactions"] += 1
+        logger.info(f"Compacted vector index: {dropped} rows dropped, {len(self.index)} left")
+        return dropped
+
+    async def remove(self, document_ids: List[str]) -> None:
+        """Forget documents right away (e.g. once deleted)"""
+        if self.index is None:
+            return
+        async with self._lock:
+            await asyncio.get_running_loop().run_in_executor(None, self.index.remove, document_ids)
+
+    async def _on_document_change(self, event) -> None:
+        # Deletes on any worker; the writer records them for everyone
+        if event.document and event.document.get("deleted_at"):
+            await self.remove([event.document_id])
+
+    async def related(self, document_ids: List[str], owner_id: str, limit: int = 10) -> Dict[str, Optional[List[Dict]]]:
+        """Most similar documents of the owner for each document (None if it has no embedding)"""
+        if self.index is None:
+            return {doc_id: None for doc_id in document_ids}
+        vectors = self.index.vectors_of(document_ids)
+        found = [doc_id for doc_id in document_ids if doc_id in vectors]
+        results: Dict[str, Optional[List[Dict]]] = {doc_id: None for doc_id in document_ids}
+        if not found:
+            return results
+
+        start = time.perf_counter()
+        # Extra hits make up for tombstoned documents filtered below
+        hits = await asyncio.get_running_loop().run_in_executor(
+            None,
+            self.index.search,
+            np.stack([vectors[doc_id] for doc_id in found]),
+            owner_id,
+            limit + len(found) + 5,
+            found
+        )
+        self.stats["searches"] += 1
+        self.stats["search_ms"] += (time.perf_counter() - start) * 1000
+
+        ids = {doc_id for row in hits for doc_id, _ in row}
+        rows = await Document.get_motor_collection().find(
+            {**LIVE, "_id": {"$in": [ObjectId(doc_id) for doc_id in ids]}},
+            {"title": 1, "file_name": 1, "created_at": 1}
+        ).to_list(length=None)
+        documents = {str(row["_id"]): row for row in rows}
+        for doc_id, row in zip(found, hits):
+            results[doc_id] = [
+                {
+                    "document_id": other,
+                    "title": documents[other]["title"],
+                    "file_name": documents[other]["file_name"],
+                    "created_at": documents[other]["created_at"],
+                    "score": round(score, 3)
+                }
+                for other, score in row if other in documents
+            ][:limit]
+        return results
+
+    def metrics(self) -> Dict:
+        searches = self.stats["searches"]
+        return {
+            **self.stats,
+            "search_ms": round(self.stats["search_ms"] / searches, 2) if searches else None,
+            "writer": self.index.writable if self.index else None,
+            "rows": len(self.index.alive) if self.index else 0,
+            "live_rows": len(self.index) if self.index else 0
+        }
+
+    async def run(self):
+        """Sync and compact (writer) or follow the writer, until stopped"""
+        loop = asyncio.get_running_loop()
+        while self.running:
+            try:
+                if not self.index.writable:
+                    async with self._lock:
+                        self.index = await loop.run_in_executor(None, self._follow)
+                if self.index.writable:
+                    await self.sync()
+                    if self.index.garbage_ratio() > settings.VECTOR_INDEX_COMPACT_RATIO:
+                        await self.compact()
+            except Exception as e:
+                logger.error(f"Error syncing vector index: {str(e)}")
+            await asyncio.sleep(settings.VECTOR_INDEX_SYNC_INTERVAL)
+
+    async def start(self):
+        """Open the index and start syncing it"""
+        self.index = await asyncio.get_running_loop().run_in_executor(None, self._open)
+        get_event_bus().subscribe("documents", self._on_document_change)
+        self.running = True
+        self.task = asyncio.create_task(self.run())
+        role = "writer" if self.index.writable else "read-only"
+        logger.info(f"Started vector index sync ({role}, {len(self.index)} documents)")
+
+    async def stop(self):
+        """Stop syncing"""
+        if self.running:
+            self.running = False
+            get_event_bus().unsubscribe("documents", self._on_document_change)
+            if self.task:
+                self.task.cancel()
+                try:
+                    await self.task
+                except asyncio.CancelledError:
+                    pass
+            logger.info("Stopped vector index sync")
+
+@lru_cache()
+def get_related_documents_service() -> RelatedDocumentsService:
+    """Get the shared related documents service instance"""
+    return RelatedDocumentsService()
@@ -0,0 +1,126 @@
+import asyncio
+import argparse
+from app.core.init_db import init_db
+from app.services.reanalysis import BACKENDS, FakeAnalysisBackend, ReanalysisBackfill
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def backfill_analysis(args) -> bool:
+    """Summarize and label every document analyzed before AI features existed"""
+    await init_db()
+
+    dry_run = args.dry_run
+    if args.backend == "fake":
+        backend = FakeAnalysisBackend(latency=args.fake_latency)
+        # Fake summaries written to real documents would count as done and
+        # be skipped by every later run with the live API
+        if not args.allow_fake_writes:
+            dry_run = True
+    else:
+        backend = BACKENDS[args.backend]()
+    backfill = ReanalysisBackfill(
+        backend,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        prefetch=args.prefetch,
+        limit=args.limit,
+        dry_run=dry_run,
+        report_interval=args.report_interval
+    )
+    if args.restart:
+        await backfill.reset_checkpoint()
+
+    logger.info(f"Starting re-analysis with the {backend.name} backend" + (" (dry run)" if dry_run else ""))
+    results = await backfill.run()
+
+    # Log results
+    logger.info("Re-analysis completed:")
+    logger.info(f"Documents scanned: {results['scanned']}")
+    logger.info(f"Analyzed: {results['analyzed']}")
+    logger.info(f"Skipped (already analyzed or unsupported): {results['skipped']}")
+    logger.info(f"Failed: {results['failed']}")
+
+    if results['failed_documents']:
+        logger.warning("Failed documents (re-run with --restart to retry them):")
+        for document_id in results['failed_documents']:
+            logger.warning(f"  - {document_id}")
+
+    return results['failed'] == 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze documents that have no AI summary yet')
+    parser.add_argument(
+        '--backend',
+        choices=sorted(BACKENDS),
+        default='llm',
+        help='Analysis backend: the live API, or a local fake for tests'
+    )
+    parser.add_argument(
+        '--fake-latency',
+        type=float,
+        default=0.0,
+        help='Seconds the fake backend takes per document'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=100,
+        help='Documents read from the database at a time'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=8,
+        help='Analyses running at once'
+    )
+    parser.add_argument(
+        '--prefetch',
+        type=int,
+        default=32,
+        help='Files downloaded ahead of the analysis'
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=None,
+        help='Maximum number of documents to scan in this run'
+    )
+    parser.add_argument(
+        '--report-interval',
+        type=float,
+        default=30.0,
+        help='Seconds between progress reports'
+    )
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Ignore the checkpoint and scan from the first document'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Analyze without writing results or the checkpoint'
+    )
+    parser.add_argument(
+        '--allow-fake-writes',
+        action='store_true',
+        help='Write the fake backend\'s results (test databases only; the fake backend is a dry run otherwise)'
+    )
+
+    args = parser.parse_args()
+
+    success = asyncio.run(backfill_analysis(args))
+
+    if success:
+        logger.info("\nRe-analysis completed successfully!")
+    else:
+        logger.error("\nRe-analysis completed with errors. Please check the logs.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import asyncio
+import argparse
+from app.core.init_db import init_db
+from app.services.content import get_content_service
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def backfill_content(batch_size: int = 50, limit: int = None, dry_run: bool = False):
+    """Extract text for documents that have no content yet"""
+    await init_db()
+
+    logger.info("Starting content backfill" + (" (dry run)" if dry_run else ""))
+    results = await get_content_service().backfill(batch_size, limit, dry_run)
+
+    # Log results
+    logger.info("Backfill completed:")
+    logger.info(f"Extracted from storage: {results['extracted']}")
+    logger.info(f"Signatures and embeddings added: {results['signed']}")
+    logger.info(f"Unsupported file types: {results['unsupported']}")
+    logger.info(f"Failed: {results['failed']}")
+
+    if results['failed_documents']:
+        logger.warning("Failed documents:")
+        for document_id in results['failed_documents']:
+            logger.warning(f"  - {document_id}")
+
+    return results['failed'] == 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill the document content collection')
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=50,
+        help='Number of documents to extract in each batch'
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=None,
+        help='Maximum number of documents to download and extract'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Only count what would be backfilled'
+    )
+
+    args = parser.parse_args()
+
+    success = asyncio.run(backfill_content(args.batch_size, args.limit, args.dry_run))
+
+    if success:
+        logger.info("\nBackfill completed successfully!")
+    else:
+        logger.error("\nBackfill completed with errors. Please check the logs.")
+
+if __name__ == "__main__":
+    main()
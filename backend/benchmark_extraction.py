@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import io
+import mimetypes
+import os
+import random
+import time
+from docx.api import Document
+from pptx import Presentation
+from pptx.util import Inches
+from app.services.extraction import ExtractionService, extract_sync
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PPTX_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+def random_text(rng: random.Random, words: int) -> str:
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    return " ".join(
+        "".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 5)))
+        for _ in range(words)
+    )
+
+def make_docx(rng: random.Random, paragraphs: int) -> bytes:
+    doc = Document()
+    for _ in range(paragraphs):
+        doc.add_paragraph(random_text(rng, 60))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+def make_pptx(rng: random.Random, slides: int) -> bytes:
+    prs = Presentation()
+    for _ in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = random_text(rng, 5)
+        box = slide.shapes.add_textbox(Inches(1), Inches(2), Inches(8), Inches(4))
+        box.text_frame.text = random_text(rng, 80)
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+def load_corpus(args) -> list:
+    """Real files given with --files, else synthetic Word and PowerPoint files"""
+    if args.files:
+        corpus = []
+        for path in args.files:
+            mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            with open(path, "rb") as f:
+                corpus.append((f.read(), mime_type))
+        return corpus
+    rng = random.Random(args.seed)
+    return [
+        (make_docx(rng, args.size), DOCX_TYPE) if i % 2 == 0 else (make_pptx(rng, args.size // 4), PPTX_TYPE)
+        for i in range(4)
+    ]
+
+async def run_pool(service: ExtractionService, corpus: list, tasks: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    async def one(i: int):
+        async with semaphore:
+            file_content, mime_type = corpus[i % len(corpus)]
+            await service.extract(file_content, mime_type)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(tasks)))
+    return time.perf_counter() - start
+
+async def measure_loop_lag(work) -> tuple:
+    """Run work while sampling how late a 10ms timer fires (event loop blocking)"""
+    lags, done = [], False
+    async def probe():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+    probe_task = asyncio.create_task(probe())
+    elapsed = await work()
+    done = True
+    await probe_task
+    return elapsed, max(lags) if lags else 0.0
+
+async def benchmark(args):
+    corpus = load_corpus(args)
+    print(f"Corpus: {len(corpus)} files, {sum(len(c) for c, _ in corpus) / 1024:.0f} KB")
+
+    async def inline():
+        # What extract_text used to do: parse on the event loop, one at a time
+        start = time.perf_counter()
+        for i in range(args.tasks):
+            file_content, mime_type = corpus[i % len(corpus)]
+            extract_sync(file_content, mime_type)
+            await asyncio.sleep(0)
+        return time.perf_counter() - start
+
+    elapsed, lag = await measure_loop_lag(inline)
+    baseline = args.tasks / elapsed
+    print(f"{'inline':>14}: {baseline:7.1f} files/s, max loop lag {lag * 1000:7.1f} ms")
+
+    for workers in args.workers:
+        service = ExtractionService(workers=workers)
+        await run_pool(service, corpus, workers, workers)  # Warm up the processes
+        elapsed, lag = await measure_loop_lag(
+            lambda: run_pool(service, corpus, args.tasks, workers * 2)
+        )
+        rate = args.tasks / elapsed
+        print(
+            f"{f'{workers} workers':>14}: {rate:7.1f} files/s, max loop lag {lag * 1000:7.1f} ms, "
+            f"{rate / baseline:4.1f}x"
+        )
+        service.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent text extraction throughput")
+    parser.add_argument("--files", nargs="*", help="Real files to extract (default: synthetic DOCX/PPTX)")
+    parser.add_argument("--size", type=int, default=400, help="Paragraphs per synthetic Word file")
+    parser.add_argument("--tasks", type=int, default=64, help="Extractions per run")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="*",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+        help="Pool sizes to compare"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import shutil
+import tempfile
+import time
+import numpy as np
+from app.services.vector_index import VectorIndex
+
+def build(index: VectorIndex, rows: int, owners: int, seed: int, batch: int = 100000) -> float:
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        count = min(batch, rows - offset)
+        vectors = rng.standard_normal((count, index.dimensions)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.append([
+            (f"{offset + i:024x}", f"owner{(offset + i) % owners}", vectors[i])
+            for i in range(count)
+        ])
+    return time.perf_counter() - start
+
+def benchmark(args):
+    path = tempfile.mkdtemp(prefix="vector_index_")
+    try:
+        index = VectorIndex(path, args.dimensions)
+        index.open()
+        elapsed = build(index, args.rows, args.owners, args.seed)
+        print(f"Built {len(index)} x {args.dimensions} index in {elapsed:.1f}s")
+
+        # Reopen, so searches read through the memory map like after a restart
+        index = VectorIndex(path, args.dimensions)
+        index.open()
+        rng = np.random.default_rng(args.seed + 1)
+        for batch in args.batch:
+            queries = np.array(index.vectors[rng.integers(0, args.rows, size=batch)])
+            index.search(queries, "owner0", args.k)  # Warm the page cache
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                index.search(queries, "owner0", args.k)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(
+                f"top-{args.k}, {batch:3d} queries: {elapsed * 1000:8.1f} ms per batch, "
+                f"{elapsed * 1000 / batch:6.1f} ms per query"
+            )
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark top-k search in the related documents vector index")
+    parser.add_argument("--rows", type=int, default=1000000, help="Documents in the index")
+    parser.add_argument("--dimensions", type=int, default=128, help="Embedding dimensions")
+    parser.add_argument("--owners", type=int, default=1, help="Owners the documents are spread over")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--batch", type=int, nargs="*", default=[1, 16], help="Queries per search call")
+    parser.add_argument("--repeat", type=int, default=10, help="Searches timed per batch size")
+    parser.add_argument("--seed", type=int, default=42)
+    benchmark(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
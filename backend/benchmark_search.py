@@ -0,0 +1,92 @@
+import argparse
+import itertools
+import random
+import statistics
+import time
+from app.services.search.index import InvertedIndex
+from app.services.search.tokenizer import term_frequencies, tokenize
+
+CATEGORIES = ["Invoice", "Contract", "Report", "Other"]
+TAGS = ["2022", "2023", "2024", "paid", "unpaid", "urgent", "archive", "draft", "signed", "q1", "q2", "q3", "q4"]
+
+def build_vocabulary(size: int, rng: random.Random):
+    """Generate pronounceable pseudo-words"""
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    words = set()
+    while len(words) < size:
+        length = rng.randint(2, 5)
+        words.add("".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(length)))
+    return sorted(words)
+
+def zipf_sampler(vocabulary, rng: random.Random):
+    """Sample words with a Zipf-like frequency distribution"""
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+    def sample(k: int):
+        return rng.choices(vocabulary, cum_weights=cum_weights, k=k)
+    return sample
+
+def build_index(documents: int, owners: int, words_per_doc: int, seed: int):
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(20000, rng)
+    sample = zipf_sampler(vocabulary, rng)
+    indexes = {f"user{i}": InvertedIndex() for i in range(owners)}
+
+    start = time.perf_counter()
+    for i in range(documents):
+        title = " ".join(sample(rng.randint(2, 6)))
+        description = " ".join(sample(rng.randint(5, 20)))
+        content = " ".join(sample(words_per_doc))
+        categories = [rng.choice(CATEGORIES)]
+        tags = rng.sample(TAGS, rng.randint(1, 3))
+        frequencies, length = term_frequencies([
+            (title, 3),
+            (" ".join(categories + tags), 2),
+            (description, 2),
+            (content, 1)
+        ])
+        indexes[f"user{i % owners}"].add(f"doc{i}", frequencies, length, categories, tags)
+    elapsed = time.perf_counter() - start
+    return indexes, vocabulary, elapsed
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query latency of the search index")
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--owners", type=int, default=1, help="Spread documents over this many owners")
+    parser.add_argument("--words", type=int, default=200, help="Content words per document")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Indexing {args.documents} synthetic documents...")
+    indexes, vocabulary, elapsed = build_index(args.documents, args.owners, args.words, args.seed)
+    print(f"Indexed in {elapsed:.1f}s ({args.documents / elapsed:.0f} docs/s)")
+
+    rng = random.Random(args.seed + 1)
+    index = indexes["user0"]
+    scenarios = {
+        "1 rare term": lambda: [rng.choice(vocabulary[5000:])],
+        "2 mixed terms": lambda: [rng.choice(vocabulary[:200]), rng.choice(vocabulary[1000:])],
+        "3 common terms": lambda: rng.sample(vocabulary[:50], 3),
+    }
+
+    for name, make_query in scenarios.items():
+        for filters in ({}, {"categories": {"Invoice"}, "tags": {"paid"}}):
+            latencies = []
+            for _ in range(args.queries):
+                terms = tokenize(" ".join(make_query()))
+                start = time.perf_counter()
+                index.search(terms, limit=10, **filters)
+                latencies.append((time.perf_counter() - start) * 1000)
+            label = f"{name}{' + filters' if filters else ''}"
+            print(
+                f"{label:28s} p50={statistics.median(latencies):7.2f}ms "
+                f"p95={percentile(latencies, 0.95):7.2f}ms "
+                f"max={max(latencies):7.2f}ms"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import importlib
+import json
+from pathlib import Path
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+class AnalysisStub:
+    """AIAnalysisService that fails on "broken" and "limited" files and counts calls"""
+
+    calls = []
+    error = None  # The endpoint module's AIServiceError
+
+    async def analyze(self, file_content, mime_type, summary=True):
+        type(self).calls.append(file_content)
+        if b"broken" in file_content:
+            raise RuntimeError("Could not read the file")
+        if b"limited" in file_content:
+            raise self.error("Slow down", "rate_limited", retry_after=30)
+        text = file_content.decode()
+        return {"summary": text if summary else "", "categories": ["Invoice"], "tags": [text]}
+
+@pytest.fixture
+def documents(monkeypatch):
+    # The endpoint modules import the app as "app" and open storage at
+    # import time, so load them from backend/ with a storage stand-in
+    monkeypatch.syspath_prepend(str(Path(__file__).parent))
+    factory = importlib.import_module("app.services.storage.factory")
+    monkeypatch.setattr(factory.StorageFactory, "get_provider", staticmethod(lambda *args, **kwargs: None))
+    documents = importlib.import_module("app.api.v1.endpoints.documents")
+    AnalysisStub.calls, AnalysisStub.error = [], documents.AIServiceError
+    monkeypatch.setattr(documents, "AIAnalysisService", AnalysisStub)
+    return documents
+
+@pytest.fixture
+def client(documents):
+    app = FastAPI()
+    app.include_router(documents.router, prefix="/documents")
+    return TestClient(app)
+
+def _analyze(client, contents, **data):
+    files = [("files", (f"file{i}.txt", content, "text/plain")) for i, content in enumerate(contents)]
+    return client.post("/documents/analyze/batch", files=files, data=data)
+
+def test_identical_files_are_analyzed_once(client):
+    response = _analyze(client, [b"alpha", b"beta", b"alpha", b"alpha"])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+    assert sorted(AnalysisStub.calls) == [b"alpha", b"beta"]
+    assert [line["duplicate_of"] for line in lines] == [None, None, 0, 0]
+    assert [line["file_name"] for line in lines] == ["file0.txt", "file1.txt", "file2.txt", "file3.txt"]
+    assert all(line["status"] == "success" for line in lines)
+    assert lines[3]["result"] == lines[0]["result"] == {"summary": "alpha", "categories": ["Invoice"], "tags": ["alpha"]}
+
+def test_failures_are_reported_per_file(client):
+    response = _analyze(client, [b"alpha", b"broken", b"broken", b"limited"], summary="false")
+    assert response.status_code == 200
+    lines = {line["index"]: line for line in map(json.loads, response.text.splitlines())}
+    assert lines[0]["status"] == "success" and lines[0]["result"]["summary"] == ""
+    for index in (1, 2):
+        assert lines[index]["status"] == "failed"
+        assert lines[index]["status_code"] == 500 and lines[index]["error"] == "Could not read the file"
+    assert lines[2]["duplicate_of"] == 1
+    assert AnalysisStub.calls.count(b"broken") == 1
+    assert lines[3]["status_code"] == 429 and lines[3]["retry_after"] == 30
+
+def test_too_many_files_are_rejected(client, documents, monkeypatch):
+    monkeypatch.setattr(documents.settings, "ANALYZE_BATCH_MAX_FILES", 2)
+    response = _analyze(client, [b"a", b"b", b"c"])
+    assert response.status_code == 400
+    assert "At most 2 files" in response.json()["detail"]
+    assert not AnalysisStub.calls
@@ -0,0 +1,104 @@
+import asyncio
+from types import SimpleNamespace
+from backend.app.services import autocomplete
+from backend.app.services.autocomplete import CACHE_THRESHOLD, AutocompleteService, PrefixIndex
+from backend.app.services.events import ChangeEvent
+
+def _values(matches):
+    return [value for value, _ in matches]
+
+def test_prefixes_match_any_word():
+    index = PrefixIndex()
+    index.bulk_add([("Invoice 2024", 1), ("Tax return", 1), ("Invoices archive", 1)])
+    assert sorted(_values(index.suggest("inv"))) == ["Invoice 2024", "Invoices archive"]
+    assert _values(index.suggest("20")) == ["Invoice 2024"]
+    assert _values(index.suggest("RET")) == ["Tax return"]
+    assert index.suggest("xyz") == []
+
+def test_most_used_values_come_first():
+    index = PrefixIndex()
+    index.bulk_add([("paid", 1), ("pending", 5), ("personal", 3)])
+    assert _values(index.suggest("p")) == ["pending", "personal", "paid"]
+    index.add("paid", 10)
+    assert _values(index.suggest("p", limit=1)) == ["paid"]
+
+def test_pruning_drops_unused_values():
+    titles = PrefixIndex(prune=True)
+    titles.add("Lease agreement")
+    titles.add("Lease agreement")
+    titles.discard("Lease agreement")
+    assert _values(titles.suggest("lea")) == ["Lease agreement"]
+    titles.discard("Lease agreement")
+    assert titles.suggest("lea") == [] and len(titles) == 0
+
+    labels = PrefixIndex()
+    labels.add("urgent")
+    labels.discard("urgent")
+    assert labels.suggest("urg") == [("urgent", 0)]  # Catalog labels stay at zero uses
+
+def test_cached_rankings_follow_weight_changes():
+    index = PrefixIndex()
+    index.bulk_add([(f"tag{i:04d}", i % 7) for i in range(CACHE_THRESHOLD * 2)])
+    top = index.suggest("tag", limit=5)
+    assert "tag" in index._cache
+    index.add("tag0000", 100)
+    assert _values(index.suggest("tag", limit=1)) == ["tag0000"]
+    index.remove("tag0000")
+    assert index.suggest("tag", limit=5) == top
+
+def _event(collection, operation, document_id, document=None):
+    return ChangeEvent(collection=collection, operation=operation, document_id=document_id, document=document)
+
+def _row(title, tags=(), categories=(), **fields):
+    return {"owner_id": "u", "title": title, "tags": list(tags), "categories": list(categories), **fields}
+
+def _counts(index, prefix=""):
+    return dict(index.suggest(prefix, limit=50))
+
+def test_events_are_applied_as_deltas():
+    service = AutocompleteService()
+    service._on_change(_event("documents", "insert", "1", _row("Invoice March", ["paid"], ["Invoice"])))
+    service._on_change(_event("documents", "insert", "2", _row("Invoice April", ["paid"], ["Invoice"])))
+    assert _counts(service.tags) == {"paid": 2}
+
+    service._on_change(_event("documents", "update", "1", _row("Invoice March", ["open"], ["Invoice"])))
+    assert _counts(service.tags) == {"paid": 1, "open": 1}
+    assert _counts(service.categories) == {"Invoice": 2}
+
+    service._on_change(_event("documents", "update", "2", _row("Invoice April", ["paid"], ["Invoice"], deleted_at=1)))
+    service._on_change(_event("documents", "delete", "1"))
+    assert _counts(service.tags) == {"paid": 0, "open": 0}
+    assert service.suggest("inv", owner_id="u")["titles"] == []
+
+def test_own_writes_are_not_counted_twice():
+    service = AutocompleteService()
+    service._on_change(_event("documents", "insert", "1", _row("Contract", ["2024"])))
+    service.labels_changed("1", [], ["2024", "signed"])
+    # The bus reports the same write again
+    service._on_change(_event("documents", "update", "1", _row("Contract", ["2024", "signed"])))
+    assert _counts(service.tags) == {"2024": 1, "signed": 1}
+
+def test_catalog_events_follow_renames_and_deletes():
+    service = AutocompleteService()
+    service._on_change(_event("tags", "insert", "t", {"name": "urgent"}))
+    assert _counts(service.tags, "urg") == {"urgent": 0}
+    service._on_change(_event("tags", "update", "t", {"name": "important"}))
+    assert _counts(service.tags) == {"important": 0}
+    service._on_change(_event("tags", "delete", "t"))
+    assert _counts(service.tags) == {}
+
+def test_events_during_a_build_are_replayed(monkeypatch):
+    service = AutocompleteService()
+
+    class Rows:
+        async def __aiter__(self):
+            # A write lands while the build is reading
+            service._on_change(_event("documents", "insert", "2", _row("Late", ["new"])))
+            yield {"_id": "1", **_row("Early", ["old"])}
+
+    monkeypatch.setattr(autocomplete, "read_collection", lambda *args: SimpleNamespace(find=lambda *args: Rows()))
+    for model in (autocomplete.Tag, autocomplete.Category):
+        monkeypatch.setattr(model, "find_all", lambda: SimpleNamespace(to_list=lambda: asyncio.sleep(0, [])))
+    asyncio.run(service.load())
+    assert _counts(service.tags) == {"old": 1, "new": 1}
+    assert sorted(item["value"] for item in service.suggest("", owner_id="u")["titles"]) == ["Early", "Late"]
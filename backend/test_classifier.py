@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from backend.app.services.classifier import CATEGORY, TAG, LinearModel, vectorize
+
+FEATURES = 4096
+
+EXAMPLES = {
+    f"{CATEGORY}Invoice": "invoice amount due payment total vat billing",
+    f"{CATEGORY}Contract": "agreement parties clause termination signed obligations",
+    f"{CATEGORY}Report": "quarterly results analysis figures summary findings",
+}
+
+def _batch(rng):
+    batch = []
+    for label, text in EXAMPLES.items():
+        words = text.split()
+        sample = " ".join(rng.choice(words, size=5))
+        indices, values = vectorize(sample, FEATURES)
+        batch.append((indices, values, [label, f"{TAG}2024"]))
+    return batch
+
+def test_vectors_are_sparse_normalized_and_stable():
+    indices, values = vectorize("Invoice invoice total", FEATURES)
+    assert len(indices) == 2 and np.all(indices < FEATURES)
+    assert np.all(np.diff(indices) > 0)
+    assert np.linalg.norm(values) == pytest.approx(1.0, abs=1e-6)
+    again = vectorize("invoice TOTAL invoice", FEATURES)
+    assert np.array_equal(indices, again[0]) and np.array_equal(values, again[1])
+    assert vectorize("a 1 .", FEATURES)[0].size == 0
+
+def test_repeated_tokens_are_log_scaled():
+    indices, values = vectorize("invoice invoice invoice total", FEATURES)
+    magnitudes = sorted(np.abs(values))
+    assert magnitudes[1] / magnitudes[0] == pytest.approx(np.log1p(3) / np.log1p(1), rel=1e-5)
+
+def test_partial_fit_learns_the_labels():
+    model = LinearModel(FEATURES, list(EXAMPLES) + [f"{TAG}2024"])
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        model.partial_fit(_batch(rng), learning_rate=0.5)
+    assert model.examples == 600
+    for i, text in enumerate(EXAMPLES.values()):
+        probabilities = model.predict(*vectorize(text, FEATURES))
+        assert int(np.argmax(probabilities[:3])) == i
+        assert probabilities[i] > 0.9
+        assert probabilities[3] > 0.9  # The tag every example carries
+
+def _documents(rng, count):
+    """Two separable classes whose texts share most of their words"""
+    common = [f"common{i}" for i in range(5)]
+    vocabularies = {
+        f"{CATEGORY}Invoice": ["invoice", "payment", "amount", "due", "billing", "vat"],
+        f"{CATEGORY}Contract": ["agreement", "clause", "parties", "termination", "signed", "term"],
+    }
+    documents = []
+    for i in range(count):
+        label = list(vocabularies)[i % 2]
+        words = list(rng.choice(vocabularies[label], size=2)) + list(rng.choice(common, size=10))
+        documents.append((*vectorize(" ".join(words), FEATURES), [label]))
+    return documents
+
+def test_large_batches_stay_accurate():
+    # Full-size batches at the default learning rate: steps must not grow with the batch
+    model = LinearModel(FEATURES, [f"{CATEGORY}Invoice", f"{CATEGORY}Contract"])
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        model.partial_fit(_documents(rng, 256), learning_rate=0.5)
+        held_out = _documents(rng, 200)
+        correct = sum(
+            model.labels[int(np.argmax(model.predict(indices, values)))] == labels[0]
+            for indices, values, labels in held_out
+        )
+        assert correct / len(held_out) > 0.95
+
+def test_copy_adds_labels_and_keeps_weights():
+    model = LinearModel(FEATURES, [f"{CATEGORY}Invoice"])
+    model.partial_fit(_batch(np.random.default_rng(1))[:1], learning_rate=0.5)
+    copy = model.copy([f"{CATEGORY}Invoice", f"{CATEGORY}Other"])
+    assert copy.labels == [f"{CATEGORY}Invoice", f"{CATEGORY}Other"]
+    assert np.array_equal(copy.weights[:, 0], model.weights[:, 0])
+    assert not copy.weights[:, 1].any()
+
+def test_models_round_trip_through_bytes():
+    model = LinearModel(FEATURES, list(EXAMPLES))
+    model.partial_fit(_batch(np.random.default_rng(2)), learning_rate=0.5)
+    loaded = LinearModel.from_bytes(model.to_bytes(), {"version": 3})
+    assert loaded.labels == model.labels and loaded.version == 3
+    assert np.array_equal(loaded.weights, model.weights) and loaded.examples == model.examples
@@ -0,0 +1,189 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from bson import ObjectId
+from backend.app.services import enrichment
+from backend.app.services.ai_analysis import AIServiceError
+from backend.app.services.enrichment import EnrichmentQueue
+
+def _matches(row, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(row, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = row.get(field)
+            if "$lte" in condition and not (value is not None and value <= condition["$lte"]):
+                return False
+            if "$lt" in condition and not (value is not None and value < condition["$lt"]):
+                return False
+        elif row.get(field) != condition:
+            return False
+    return True
+
+def _apply(row, update, inserted=False):
+    row.update(update.get("$set", {}))
+    if inserted:
+        row.update(update.get("$setOnInsert", {}))
+    for field, amount in update.get("$inc", {}).items():
+        row[field] = row.get(field, 0) + amount
+
+class Jobs:
+    """The analysis job collection, with just the queries the queue makes"""
+
+    def __init__(self):
+        self.rows = []
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            query, update = operation._filter, operation._doc
+            row = next((row for row in self.rows if _matches(row, query)), None)
+            if row is None:
+                row = {"_id": ObjectId(), **query}
+                self.rows.append(row)
+                _apply(row, update, inserted=True)
+            else:
+                _apply(row, update)
+
+    async def find_one_and_update(self, query, update, sort, return_document):
+        (field, direction), = sort
+        rows = sorted((row for row in self.rows if _matches(row, query)), key=lambda row: row[field])
+        if not rows:
+            return None
+        _apply(rows[0], update)
+        return dict(rows[0])
+
+    async def update_one(self, query, update):
+        row = next((row for row in self.rows if _matches(row, query)), None)
+        if row is not None:
+            _apply(row, update)
+
+class Failing:
+    """Stands in for _enrich: raises the given errors in turn, then succeeds"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+
+    async def __call__(self, job):
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"summary": "", "categories": [], "tags": ["2024"]}
+
+@pytest.fixture
+def jobs(monkeypatch):
+    jobs = Jobs()
+    monkeypatch.setattr(enrichment, "AnalysisJob", SimpleNamespace(get_motor_collection=lambda: jobs))
+    monkeypatch.setattr(enrichment, "get_storage_provider", lambda: None)
+    monkeypatch.setattr(enrichment, "get_content_service", lambda: None)
+    monkeypatch.setattr(enrichment, "DocumentService", lambda: None)
+    monkeypatch.setattr(enrichment.settings, "ANTHROPIC_API_KEY", "test")
+    monkeypatch.setattr(enrichment.settings, "ENRICHMENT_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(enrichment.settings, "ENRICHMENT_RETRY_BASE_SECONDS", 30.0)
+    monkeypatch.setattr(enrichment.settings, "ENRICHMENT_LEASE_SECONDS", 600.0)
+    return jobs
+
+def _queue(worker_id, enrich=None):
+    queue = EnrichmentQueue()
+    queue.worker_id = worker_id
+    queue._enrich = enrich or Failing()
+    return queue
+
+def _document():
+    return SimpleNamespace(id=ObjectId(), owner_id="u", mime_type="text/plain")
+
+def _make_due(jobs):
+    for row in jobs.rows:
+        row["run_after"] = datetime.utcnow() - timedelta(seconds=1)
+
+def test_claimed_jobs_are_leased_and_finished(jobs):
+    queue = _queue("a")
+    document = _document()
+    assert asyncio.run(queue.enqueue(document))
+
+    job = asyncio.run(queue.claim())
+    assert job["document_id"] == str(document.id)
+    assert job["status"] == "running" and job["locked_by"] == "a" and job["attempts"] == 1
+    assert job["locked_until"] > datetime.utcnow() + timedelta(seconds=500)
+    assert asyncio.run(queue.claim()) is None  # Leased
+
+    asyncio.run(queue.process(job))
+    row, = jobs.rows
+    assert row["status"] == "done" and row["result"]["tags"] == ["2024"]
+    assert row["locked_by"] is None and row["locked_until"] is None
+    assert asyncio.run(queue.claim()) is None
+
+def test_expired_leases_are_reclaimed(jobs):
+    first, second = _queue("a"), _queue("b")
+    asyncio.run(first.enqueue(_document()))
+    stale = asyncio.run(first.claim())
+    jobs.rows[0]["locked_until"] = datetime.utcnow() - timedelta(seconds=1)  # Worker a died
+
+    job = asyncio.run(second.claim())
+    assert job["locked_by"] == "b" and job["attempts"] == 2
+
+    # The first worker comes back and finishes late: the job is no longer its
+    asyncio.run(first.process(stale))
+    assert jobs.rows[0]["status"] == "running" and jobs.rows[0]["locked_by"] == "b"
+    asyncio.run(second.process(job))
+    assert jobs.rows[0]["status"] == "done"
+
+def test_late_finishes_from_the_same_process_are_ignored(jobs):
+    # Workers of one process share their id: only attempts tells the runs apart
+    queue = _queue("a")
+    asyncio.run(queue.enqueue(_document()))
+    stale = asyncio.run(queue.claim())
+    jobs.rows[0]["locked_until"] = datetime.utcnow() - timedelta(seconds=1)
+    job = asyncio.run(queue.claim())
+    asyncio.run(queue.process(stale))
+    assert jobs.rows[0]["status"] == "running" and jobs.rows[0]["attempts"] == 2
+    asyncio.run(queue.process(job))
+    assert jobs.rows[0]["status"] == "done"
+
+def test_requeued_jobs_ignore_the_old_run(jobs):
+    queue = _queue("a")
+    document = _document()
+    asyncio.run(queue.enqueue(document))
+    job = asyncio.run(queue.claim())
+    # Re-uploaded while running: the lease and attempt count are reset
+    asyncio.run(queue.enqueue(document))
+    asyncio.run(queue.process(job))
+    assert jobs.rows[0]["status"] == "queued" and jobs.rows[0]["attempts"] == 0
+
+def test_failures_back_off_then_go_to_the_dead_letter(jobs):
+    errors = [AIServiceError("Overloaded", "overloaded_error") for _ in range(3)]
+    queue = _queue("a", Failing(*errors))
+    asyncio.run(queue.enqueue(_document()))
+
+    job = asyncio.run(queue.claim())
+    asyncio.run(queue.process(job))
+    row = jobs.rows[0]
+    assert row["status"] == "queued" and row["error"] == "Overloaded" and row["locked_by"] is None
+    assert row["run_after"] > datetime.utcnow() + timedelta(seconds=25)
+    assert asyncio.run(queue.claim()) is None  # Not due yet
+
+    _make_due(jobs)
+    asyncio.run(queue.process(asyncio.run(queue.claim())))
+    # The delay doubles with each attempt
+    assert row["run_after"] > datetime.utcnow() + timedelta(seconds=55)
+
+    _make_due(jobs)
+    job = asyncio.run(queue.claim())
+    assert job["attempts"] == 3
+    asyncio.run(queue.process(job))
+    assert row["status"] == "dead" and row["error"] == "Overloaded"
+    assert queue.stats == {"done": 0, "retried": 2, "dead": 1}
+    _make_due(jobs)
+    assert asyncio.run(queue.claim()) is None
+
+def test_retry_after_extends_the_backoff(jobs):
+    queue = _queue("a", Failing(AIServiceError("Slow down", "rate_limit_error", retry_after=300)))
+    asyncio.run(queue.enqueue(_document()))
+    asyncio.run(queue.process(asyncio.run(queue.claim())))
+    assert jobs.rows[0]["run_after"] > datetime.utcnow() + timedelta(seconds=295)
+
+def test_permanent_errors_are_dead_lettered_at_once(jobs):
+    queue = _queue("a", Failing(AIServiceError("Bad key", "authentication_error")))
+    asyncio.run(queue.enqueue(_document()))
+    asyncio.run(queue.process(asyncio.run(queue.claim())))
+    assert jobs.rows[0]["status"] == "dead" and jobs.rows[0]["attempts"] == 1
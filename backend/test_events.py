@@ -0,0 +1,51 @@
+import asyncio
+import socket
+import pytest
+from backend.app.services import events
+from backend.app.services.events import ChangeEventBus
+
+class Collection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def find(self):
+        for row in self.rows:
+            yield row
+
+class Database(dict):
+    def __getitem__(self, name):
+        return Collection(dict.get(self, name, []))
+
+@pytest.fixture
+def bus(tmp_path, monkeypatch):
+    monkeypatch.setattr(events.settings, "EVENT_BUS_SLOT_PATH", str(tmp_path))
+    monkeypatch.setattr(events.settings, "EVENT_BUS_CONSUMER", "")
+    return ChangeEventBus()
+
+def test_restarted_workers_take_back_their_slot(bus):
+    host = socket.gethostname()
+    other = ChangeEventBus()
+    assert bus._claim_slot() == f"{host}:0"
+    assert other._claim_slot() == f"{host}:1"
+    bus._slot_file.close()  # The first worker exits
+    assert ChangeEventBus()._claim_slot() == f"{host}:0"
+
+def test_catalog_collections_are_read_only_after_a_version_bump(bus, monkeypatch):
+    database = Database(
+        catalog_version=[{"_id": "catalog", "version": 1}],
+        categories=[{"_id": "c1", "name": "Invoice"}],
+        tags=[{"_id": "t1", "name": "2024"}]
+    )
+    monkeypatch.setattr(bus, "_database", lambda: database)
+    snapshots = {name: {str(row["_id"]): row for row in rows} for name, rows in database.items()}
+    published = []
+    bus.subscribe("*", lambda event: published.append((event.collection, event.operation)))
+
+    # A tag written without a bump yet is not read
+    dict.__setitem__(database, "tags", [{"_id": "t1", "name": "2024"}, {"_id": "t2", "name": "paid"}])
+    asyncio.run(bus._poll_snapshot("catalog_version", snapshots))
+    assert published == []
+
+    dict.__setitem__(database, "catalog_version", [{"_id": "catalog", "version": 2}])
+    asyncio.run(bus._poll_snapshot("catalog_version", snapshots))
+    assert published == [("tags", "insert"), ("catalog_version", "replace")]
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import pytest
+from backend.app.services import extraction
+from backend.app.services.extraction import ExtractionError, ExtractionService, _collect, extract_sync, page_sections
+
+def test_all_pages_without_a_budget():
+    assert page_sections(5, None, True) == [[0, 1, 2, 3, 4]]
+    assert page_sections(5, 10, True) == [[0, 1, 2, 3, 4]]
+
+def test_first_pages_without_sampling():
+    assert page_sections(100, 4, False) == [[0, 1, 2, 3]]
+    assert page_sections(100, 2, True) == [[0, 1]]
+
+def test_sampling_reads_head_middle_and_tail():
+    head, middle, tail = page_sections(100, 8, True)
+    assert head == [0, 1, 2, 3]
+    assert middle == [49, 50]
+    assert tail == [98, 99]
+
+def test_collect_reads_only_what_the_budget_needs():
+    read = []
+
+    def page_text(index):
+        read.append(index)
+        return "x" * 100
+
+    result = _collect([list(range(10))], page_text, 250)
+    assert read == [0, 1, 2]
+    assert len(result["text"]) == 250 + 2  # Pages joined by newlines
+    assert result["pages_extracted"] == 3 and result["truncated"]
+
+def test_collect_shares_the_budget_between_sections():
+    pages = {0: "a" * 1000, 1: "b" * 1000, 50: "m" * 10, 99: "z" * 1000}
+    result = _collect([[0, 1], [50], [99]], lambda index: pages[index], 300)
+    head, middle, tail = result["text"].split("\n")
+    # The head gets a third, the middle's unused share goes to the tail
+    assert head == "a" * 100
+    assert middle == "m" * 10
+    assert tail == "z" * 190
+    assert result["pages_extracted"] == 3 and result["truncated"]
+
+def test_collect_without_budget_reads_everything():
+    result = _collect([[0, 1], [2]], lambda index: str(index), None)
+    assert result == {"text": "0\n1\n2", "pages_extracted": 3, "truncated": False}
+
+def test_plain_text_is_cut_without_breaking_characters():
+    result = extract_sync(("é" * 100).encode(), "text/plain", max_chars=10)
+    assert result["text"] == "é" * 10 and result["truncated"]
+    assert not extract_sync("short".encode(), "text/plain", max_chars=10)["truncated"]
+
+def test_unsupported_types_are_rejected():
+    with pytest.raises(ExtractionError):
+        extract_sync(b"", "image/png")
+
+def _slow_extract(file_content, mime_type, max_chars, max_pages, sample):
+    time.sleep(0.4)
+    return {"text": "", "pages": 1, "pages_extracted": 1, "truncated": False}
+
+def test_queued_files_do_not_use_up_the_timeout(monkeypatch):
+    # Forked workers see the patched extractor
+    monkeypatch.setattr(extraction, "extract_sync", _slow_extract)
+    service = ExtractionService(workers=1, timeout=1.0, memory_limit_mb=0)
+
+    async def extract_all():
+        return await asyncio.gather(*(service.extract(b"x", "text/plain") for _ in range(4)))
+
+    try:
+        results = asyncio.run(extract_all())
+    finally:
+        service.shutdown()
+    assert len(results) == 4
+    assert service.stats["timeouts"] == 0 and service.stats["restarts"] == 0
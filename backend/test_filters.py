@@ -0,0 +1,114 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from backend.app.services.filters import (
+    FilterSyntaxError,
+    build_filter_query,
+    merge_clauses
+)
+
+def test_and_not_compiles_to_all_and_nin():
+    assert build_filter_query("Invoice AND 2024 AND NOT paid") == {
+        "tags": {"$all": ["Invoice", "2024"], "$nin": ["paid"]}
+    }
+
+def test_or_of_one_field_compiles_to_in():
+    assert build_filter_query('category:Contract (tag:urgent OR tag:"due soon")') == {
+        "categories": "Contract",
+        "tags": {"$in": ["urgent", "due soon"]}
+    }
+
+def test_not_or_is_rewritten_to_nin():
+    assert build_filter_query("NOT (draft OR archive) signed") == {
+        "tags": {"$all": ["signed"], "$nin": ["draft", "archive"]}
+    }
+
+def test_ranges_are_merged_per_field():
+    assert build_filter_query("created>=2024-01-01 AND created<2024-07-01 AND size<=5MB") == {
+        "created_at": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 7, 1)},
+        "file_size": {"$lte": 5 * 1024 * 1024}
+    }
+
+def test_mixed_fields_fall_back_to_or():
+    assert build_filter_query("urgent OR category:Invoice") == {
+        "$or": [{"tags": "urgent"}, {"categories": "Invoice"}]
+    }
+
+def test_merge_clauses_uses_and_on_collision():
+    assert merge_clauses([{"owner_id": "u"}, {"tags": "a"}, {"tags": {"$nin": ["b"]}}]) == {
+        "$and": [{"owner_id": "u", "tags": "a"}, {"tags": {"$nin": ["b"]}}]
+    }
+
+@pytest.mark.parametrize("expression", ["", "(a", "a AND", "size:10", "tag<3", "created>yesterday"])
+def test_invalid_expressions(expression):
+    with pytest.raises(FilterSyntaxError):
+        build_filter_query(expression)
+
+# Query-plan checks need a running MongoDB (e.g. docker-compose up -d mongodb)
+QUERY_PLAN_EXPRESSIONS = [
+    "Invoice AND 2024 AND NOT paid",
+    "category:Contract AND (urgent OR signed)",
+    "tag:2024 AND created>=2024-01-01 AND created<2024-07-01",
+    "category:Report AND NOT draft AND size<1MB",
+    "urgent OR category:Invoice",
+    "size>=1KB AND size<10MB",
+]
+
+@pytest.fixture(scope="module")
+def documents_collection():
+    pymongo = pytest.importorskip("pymongo")
+    pytest.importorskip("beanie")
+    from backend.app.models.document import Document
+
+    client = pymongo.MongoClient(
+        os.environ.get("MONGODB_URL", "mongodb://localhost:27017"),
+        serverSelectionTimeoutMS=1000
+    )
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip("MongoDB is not available")
+
+    collection = client["simpledms_test"]["documents_query_plans"]
+    collection.drop()
+    indexes = [
+        index if isinstance(index, pymongo.IndexModel) else pymongo.IndexModel([(index, pymongo.ASCENDING)])
+        for index in Document.Settings.indexes
+    ]
+    collection.create_indexes(indexes)
+
+    tags = ["Invoice", "2024", "paid", "urgent", "signed", "draft", "archive"]
+    categories = ["Invoice", "Contract", "Report", "Other"]
+    start = datetime(2023, 1, 1)
+    collection.insert_many([
+        {
+            "title": f"Document {i}",
+            "owner_id": f"user{i % 20}",
+            "tags": [tags[i % 7], tags[(i * 3) % 7]],
+            "categories": [categories[i % 4]],
+            "file_size": (i * 7919) % (20 * 1024 * 1024),
+            "created_at": start + timedelta(hours=i)
+        }
+        for i in range(5000)
+    ])
+    yield collection
+    collection.drop()
+    client.close()
+
+def _stages(plan):
+    """Collect every stage name in an explain plan tree"""
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_stages(child))
+    return stages
+
+@pytest.mark.parametrize("expression", QUERY_PLAN_EXPRESSIONS)
+def test_filters_are_index_backed(documents_collection, expression):
+    query = merge_clauses([{"owner_id": "user3"}, build_filter_query(expression)])
+    explain = documents_collection.find(query).explain()
+    stages = _stages(explain["queryPlanner"]["winningPlan"])
+    assert "COLLSCAN" not in stages, f"{expression!r} -> {query} scans the collection: {stages}"
+    assert "IXSCAN" in stages
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from backend.app.services.storage import key_filter as key_filter_module
+from backend.app.services.storage.key_filter import CountingBloomFilter, StorageKeyFilter
+
+class ListingStorage:
+    """Storage that lists a fixed set of keys, one page"""
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    async def list_files(self, prefix, start_after=None):
+        return [{"key": key} for key in self.keys], None
+
+@pytest.fixture
+def key_filter(monkeypatch):
+    storage = ListingStorage([f"documents/u/{i}.pdf" for i in range(100)])
+    monkeypatch.setattr(key_filter_module, "get_storage_provider", lambda: storage)
+    key_filter = StorageKeyFilter()
+    asyncio.run(key_filter.rebuild_from_storage())
+    return key_filter
+
+def test_counting_bloom_add_and_remove():
+    bloom = CountingBloomFilter(1000, 0.01)
+    keys = [f"key-{i}" for i in range(500)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    for key in keys[:250]:
+        assert bloom.remove(key)
+    assert all(key in bloom for key in keys[250:])
+    assert sum(key in bloom for key in keys[:250]) < 25
+    assert bloom.count == 250
+
+def test_removing_an_absent_key_is_refused():
+    bloom = CountingBloomFilter(1000, 0.01)
+    assert not bloom.remove("never-added")
+    assert bloom.count == 0
+
+def test_keys_are_counted_once(key_filter):
+    key_filter.key_added("documents/u/new.pdf")
+    key_filter.key_added("documents/u/new.pdf")  # e.g. the uploader's own change event
+    key_filter.key_removed("documents/u/new.pdf")
+    assert "documents/u/new.pdf" not in key_filter.filter
+    assert key_filter.filter.count == 100
+
+def test_uncounted_keys_are_not_removed(key_filter):
+    for i in range(1000):
+        key_filter.key_removed(f"documents/other/{i}.pdf")
+    assert key_filter.filter.count == 100
+    assert all(f"documents/u/{i}.pdf" in key_filter.filter for i in range(100))
+
+def test_replayed_removes_of_unlisted_keys_are_ignored(key_filter):
+    key_filter._pending = []
+    key_filter.key_removed("documents/u/0.pdf")  # Purged while the listing ran
+    asyncio.run(key_filter.rebuild_from_storage())
+    key_filter.key_removed("documents/u/0.pdf")
+    assert key_filter.filter.count == 99
+    assert all(f"documents/u/{i}.pdf" in key_filter.filter for i in range(1, 100))
+
+def test_updates_from_other_workers_add_keys(key_filter):
+    event = type("Event", (), {"operation": "update", "document": {"s3_key": "documents/u/remote.pdf"}})
+    key_filter._on_document_change(event)
+    assert key_filter.might_exist("documents/u/remote.pdf", datetime.utcnow())
+
+def test_misses_are_trusted_only_for_documents_older_than_the_build(key_filter):
+    old = key_filter.built_at - timedelta(hours=1)
+    assert not key_filter.might_exist("documents/u/missing.pdf", old)
+    assert key_filter.might_exist("documents/u/missing.pdf", datetime.utcnow())
+    assert key_filter.might_exist("documents/u/missing.pdf")
+
+def test_only_filter_hits_count_as_false_positives(key_filter):
+    old = key_filter.built_at - timedelta(hours=1)
+    # Not in the filter, but too new to trust the miss
+    assert key_filter.might_exist("documents/u/new.pdf", datetime.utcnow())
+    key_filter.confirm("documents/u/new.pdf", False)
+    # In the filter, but gone from storage
+    assert key_filter.might_exist("documents/u/0.pdf", old)
+    key_filter.confirm("documents/u/0.pdf", False)
+    key_filter.confirm("documents/u/0.pdf", False)  # Each answer is confirmed once
+    assert key_filter.stats["unverified"] == 1 and key_filter.stats["maybe"] == 1
+    assert key_filter.stats["false_positives"] == 1
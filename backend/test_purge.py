@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from bson import ObjectId
+from backend.app.services import purge
+from backend.app.services.purge import DocumentPurger
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, count):
+        return Cursor(self.rows[:count])
+
+    async def to_list(self, length):
+        return self.rows
+
+class Documents:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def find(self, query, projection=None):
+        return Cursor([row for row in self.rows if row["deleted_at"] is not None])
+
+    async def distinct(self, field, query):
+        keys = query[field]["$in"]
+        return list({row[field] for row in self.rows if row["deleted_at"] is None and row[field] in keys})
+
+    async def delete_many(self, query):
+        ids = set(query["_id"]["$in"])
+        self.rows = [row for row in self.rows if row["_id"] not in ids]
+
+class Sink:
+    """Any collection or service the purger only deletes from"""
+
+    def __init__(self):
+        self.removed = []
+
+    def get_motor_collection(self):
+        return self
+
+    async def delete_many(self, query):
+        pass
+
+    async def remove_documents(self, ids):
+        pass
+
+    async def remove(self, ids):
+        pass
+
+    async def objects_removed(self, keys):
+        self.removed.extend(keys)
+
+    def key_removed(self, key):
+        self.removed.append(key)
+
+class Storage:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_files(self, keys):
+        self.deleted.extend(keys)
+        return {}
+
+def test_files_shared_with_live_documents_are_kept(monkeypatch):
+    past = datetime.utcnow() - timedelta(days=1)
+    live, gone, shared = ObjectId(), ObjectId(), ObjectId()
+    documents = Documents([
+        {"_id": live, "s3_key": "documents/u/2024/report.pdf", "deleted_at": None},
+        {"_id": shared, "s3_key": "documents/u/2024/report.pdf", "deleted_at": past, "purge_after": past},
+        {"_id": gone, "s3_key": "documents/u/2024/old.pdf", "deleted_at": past, "purge_after": past},
+    ])
+    monkeypatch.setattr(purge, "Document", SimpleNamespace(get_motor_collection=lambda: documents))
+    monkeypatch.setattr(purge, "Share", Sink())
+    monkeypatch.setattr(purge, "AnalysisJob", Sink())
+    purger = DocumentPurger.__new__(DocumentPurger)
+    purger.storage, purger.inventory, purger.key_filter = Storage(), Sink(), Sink()
+    purger.search = purger.content = purger.related = Sink()
+    purger.stats = {"purged": 0, "failed": 0}
+
+    assert asyncio.run(purger.purge_batch()) == {"purged": 2, "failed": 0}
+    assert purger.storage.deleted == ["documents/u/2024/old.pdf"]
+    assert purger.inventory.removed == purger.key_filter.removed == ["documents/u/2024/old.pdf"]
+    assert [row["_id"] for row in documents.rows] == [live]
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from backend.app.services import rate_limit
+from backend.app.services.rate_limit import LLMRateLimiter, RateLimitExceeded
+
+class Buckets:
+    """The bucket collection, evaluating the pipeline operators the limiter uses"""
+
+    def __init__(self):
+        self.rows = {}
+        self.now = datetime(2024, 1, 1)
+
+    def _value(self, row, expression):
+        if isinstance(expression, str):
+            if expression == "$$NOW":
+                return self.now
+            return row.get(expression[1:]) if expression.startswith("$") else expression
+        if isinstance(expression, dict):
+            (operator, args), = expression.items()
+            if operator == "$cond":
+                condition, then, otherwise = args
+                return self._value(row, then if self._value(row, condition) else otherwise)
+            values = [self._value(row, arg) for arg in args]
+            if operator == "$ifNull":
+                return values[0] if values[0] is not None else values[1]
+            if operator == "$and":
+                return all(values)
+            if operator == "$add" and isinstance(values[0], datetime):
+                return values[0] + timedelta(milliseconds=values[1])
+            if operator == "$subtract" and isinstance(values[0], datetime):
+                return (values[0] - values[1]).total_seconds() * 1000
+            return {
+                "$add": lambda a, b: a + b, "$subtract": lambda a, b: a - b,
+                "$multiply": lambda a, b: a * b, "$divide": lambda a, b: a / b,
+                "$min": min, "$max": max,
+                "$lte": lambda a, b: a <= b, "$gte": lambda a, b: a >= b
+            }[operator](*values)
+        return expression
+
+    def _run(self, query, pipeline, upsert):
+        row = self.rows.get(query["_id"])
+        if row is None:
+            if not upsert:
+                return None
+            row = self.rows[query["_id"]] = {"_id": query["_id"]}
+        for stage in pipeline:
+            # Each stage sees the document as the previous one left it
+            values = {field: self._value(row, expression) for field, expression in stage["$set"].items()}
+            row.update(values)
+        return row
+
+    async def find_one_and_update(self, query, pipeline, upsert, return_document):
+        return dict(self._run(query, pipeline, upsert))
+
+    async def update_one(self, query, update, upsert=False):
+        if isinstance(update, list):
+            self._run(query, update, upsert)
+        else:
+            for field, amount in update["$inc"].items():
+                self.rows[query["_id"]][field] += amount
+
+@pytest.fixture
+def buckets(monkeypatch):
+    buckets = Buckets()
+    database = {rate_limit.BUCKET_COLLECTION: buckets}
+    monkeypatch.setattr(rate_limit, "Document", SimpleNamespace(
+        get_motor_collection=lambda: SimpleNamespace(database=database)
+    ))
+    monkeypatch.setattr(rate_limit.settings, "LLM_REQUESTS_PER_MINUTE", 60)
+    monkeypatch.setattr(rate_limit.settings, "LLM_TOKENS_PER_MINUTE", 6000)
+    monkeypatch.setattr(rate_limit.settings, "LLM_QUEUE_TIMEOUT", 30.0)
+    return buckets
+
+def test_a_new_bucket_starts_full(buckets):
+    limiter = LLMRateLimiter()
+    assert asyncio.run(limiter._try_acquire(1000)) == 0
+    bucket = buckets.rows["anthropic"]
+    assert bucket["granted"] and bucket["requests"] == 59 and bucket["tokens"] == 5000
+
+def test_buckets_refill_with_elapsed_time_up_to_capacity(buckets):
+    limiter = LLMRateLimiter()
+    asyncio.run(limiter._try_acquire(6000))
+    assert buckets.rows["anthropic"]["tokens"] == 0
+    buckets.now += timedelta(seconds=30)
+    assert asyncio.run(limiter._try_acquire(2000)) == 0
+    assert buckets.rows["anthropic"]["tokens"] == pytest.approx(1000)
+    buckets.now += timedelta(hours=1)
+    asyncio.run(limiter._try_acquire(0))
+    assert buckets.rows["anthropic"]["tokens"] == 6000
+    assert buckets.rows["anthropic"]["requests"] == 59
+
+def test_callers_wait_for_the_missing_tokens(buckets):
+    limiter = LLMRateLimiter()
+    asyncio.run(limiter._try_acquire(5000))
+    # 2000 tokens wanted, 1000 left: 1000 more refill in 10 seconds
+    assert asyncio.run(limiter._try_acquire(2000)) == pytest.approx(10)
+    bucket = buckets.rows["anthropic"]
+    assert not bucket["granted"] and bucket["tokens"] == 1000 and bucket["requests"] == 59
+
+def test_callers_wait_for_a_request(buckets):
+    limiter = LLMRateLimiter()
+    buckets.rows["anthropic"] = {"_id": "anthropic", "requests": 0.5, "tokens": 6000, "updated_at": buckets.now}
+    assert asyncio.run(limiter._try_acquire(10)) == pytest.approx(0.5)
+
+def test_a_block_holds_everyone_until_retry_after(buckets):
+    limiter = LLMRateLimiter()
+    asyncio.run(limiter.block(20))
+    assert asyncio.run(limiter._try_acquire(10)) == pytest.approx(20)
+    # A shorter block does not cut the longer one short
+    asyncio.run(limiter.block(5))
+    buckets.now += timedelta(seconds=15)
+    assert asyncio.run(limiter._try_acquire(10)) == pytest.approx(5)
+    buckets.now += timedelta(seconds=5)
+    assert asyncio.run(limiter._try_acquire(10)) == 0
+    assert limiter.stats["throttled"] == 2
+
+def test_waits_past_the_queue_timeout_are_rejected(buckets):
+    limiter = LLMRateLimiter()
+    asyncio.run(limiter.block(60))
+    with pytest.raises(RateLimitExceeded) as error:
+        asyncio.run(limiter.acquire(10))
+    assert error.value.retry_after == pytest.approx(60)
+    assert limiter.stats["rejected"] == 1 and limiter.stats["granted"] == 0
@@ -0,0 +1,165 @@
+import asyncio
+import io
+from types import SimpleNamespace
+import pytest
+from bson import ObjectId
+from backend.app.services import reanalysis
+from backend.app.services.reanalysis import (
+    CHECKPOINT_COLLECTION, AnalysisBackend, FakeAnalysisBackend, ReanalysisBackfill
+)
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def limit(self, count):
+        return Cursor(self.rows[:count])
+
+    async def __aiter__(self):
+        for row in self.rows:
+            yield row
+
+class Checkpoints:
+    def __init__(self):
+        self.rows = {}
+
+    async def find_one(self, query):
+        return self.rows.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.rows.setdefault(query["_id"], {}).update(update["$set"])
+
+    async def delete_one(self, query):
+        self.rows.pop(query["_id"], None)
+
+class Documents:
+    """The documents collection, with the checkpoints next to it"""
+
+    def __init__(self, ids):
+        self.rows = [{"_id": doc_id, "s3_key": f"documents/u/{doc_id}.txt", "mime_type": "text/plain"} for doc_id in ids]
+        self.database = {CHECKPOINT_COLLECTION: Checkpoints()}
+
+    def _after(self, query):
+        after = query.get("_id", {}).get("$gt")
+        return [row for row in self.rows if after is None or row["_id"] > after]
+
+    def find(self, query, projection=None):
+        return Cursor(self._after(query))
+
+    async def count_documents(self, query):
+        return len(self._after(query))
+
+class Contents:
+    def __init__(self):
+        self.summaries = {}
+
+    async def distinct(self, field, query):
+        return [doc_id for doc_id in query["document_id"]["$in"] if doc_id in self.summaries]
+
+class Enrichment:
+    def __init__(self, contents):
+        self.contents = contents
+
+    async def save_result(self, document, result):
+        self.contents.summaries[str(document.id)] = result["summary"]
+
+class Extractor:
+    async def prompt_text(self, file_content, mime_type):
+        return file_content.decode()
+
+class Storage:
+    async def download_file(self, key):
+        return io.BytesIO(f"Quarterly invoice {key} for consulting services".encode())
+
+class BlockingBackend(FakeAnalysisBackend):
+    """Never finishes the blocked documents, like a run killed mid-analysis"""
+
+    def __init__(self, blocked=()):
+        super().__init__()
+        self.blocked = set(blocked)
+        self.analyzed = []
+
+    async def analyze(self, file_content, mime_type, text):
+        if any(str(doc_id) in text for doc_id in self.blocked):
+            await asyncio.Event().wait()
+        self.analyzed.append(text)
+        return await super().analyze(file_content, mime_type, text)
+
+@pytest.fixture
+def ids():
+    return [ObjectId() for _ in range(20)]
+
+@pytest.fixture
+def store(ids, monkeypatch):
+    documents, contents = Documents(ids), Contents()
+    monkeypatch.setattr(reanalysis, "Document", SimpleNamespace(
+        get_motor_collection=lambda: documents,
+        get=lambda doc_id: asyncio.sleep(0, SimpleNamespace(id=doc_id, deleted_at=None))
+    ))
+    monkeypatch.setattr(reanalysis, "DocumentContent", SimpleNamespace(get_motor_collection=lambda: contents))
+    monkeypatch.setattr(reanalysis, "get_storage_provider", Storage)
+    monkeypatch.setattr(reanalysis, "get_enrichment_queue", lambda: Enrichment(contents))
+    monkeypatch.setattr(reanalysis, "AIAnalysisService", Extractor)
+    return SimpleNamespace(documents=documents, contents=contents)
+
+def _backfill(backend, **kwargs):
+    return ReanalysisBackfill(backend, batch_size=4, concurrency=3, prefetch=2, checkpoint_interval=0, **kwargs)
+
+def test_backends_must_implement_analyze():
+    with pytest.raises(TypeError):
+        AnalysisBackend()
+
+def test_fake_backend_is_deterministic():
+    backend = FakeAnalysisBackend()
+    text = "Invoice for consulting services, consulting hours and consulting travel"
+    first = asyncio.run(backend.analyze(b"", "text/plain", text))
+    assert first == asyncio.run(backend.analyze(b"", "text/plain", text))
+    assert first["tags"][0] == "consulting"
+
+def test_checkpoint_only_passes_finished_documents(store):
+    backfill = _backfill(FakeAnalysisBackend())
+    backfill._order.extend([1, 2, 3, 4])
+    backfill._finish(2)
+    assert backfill._checkpoint is None
+    backfill._finish(1)
+    assert backfill._checkpoint == 2
+    backfill._finish(4)
+    backfill._finish(3)
+    assert backfill._checkpoint == 4 and not backfill._finished
+
+def test_interrupted_run_resumes_from_its_checkpoint(ids, store):
+    async def scenario():
+        first = _backfill(BlockingBackend(blocked=[ids[5]]))
+        task = asyncio.create_task(first.run())
+        for _ in range(1000):
+            if len(store.contents.summaries) == len(ids) - 1:
+                break
+            await asyncio.sleep(0)
+        await first._save_checkpoint(force=True)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Everything after the stuck document is done, but not checkpointed
+        assert await first.load_checkpoint() == ids[4]
+        assert len(store.contents.summaries) == len(ids) - 1
+
+        second = _backfill(BlockingBackend())
+        results = await second.run()
+        assert len(second.backend.analyzed) == 1 and str(ids[5]) in second.backend.analyzed[0]
+        assert results["analyzed"] == 1 and results["skipped"] == len(ids) - 6
+        assert await second.load_checkpoint() == ids[-1]
+        assert len(store.contents.summaries) == len(ids)
+
+    asyncio.run(scenario())
+
+def test_dry_runs_write_nothing(ids, store):
+    results = asyncio.run(_backfill(FakeAnalysisBackend(), dry_run=True).run())
+    assert results["analyzed"] == len(ids)
+    assert not store.contents.summaries
+    assert not store.documents.database[CHECKPOINT_COLLECTION].rows
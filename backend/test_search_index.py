@@ -0,0 +1,64 @@
+import math
+import pytest
+from backend.app.services.search.index import BM25_B, BM25_K1, InvertedIndex
+from backend.app.services.search.tokenizer import term_frequencies
+
+def _index(documents):
+    index = InvertedIndex()
+    for doc_id, fields, categories, tags in documents:
+        frequencies, length = term_frequencies(fields)
+        index.add(doc_id, frequencies, length, categories, tags)
+    return index
+
+@pytest.fixture
+def index():
+    return _index([
+        ("a", [("Invoice March", 3), ("invoice for consulting services", 1)], ["Invoice"], ["2024", "paid"]),
+        ("b", [("Contract", 3), ("consulting contract with an invoice schedule", 1)], ["Contract"], ["2024"]),
+        ("c", [("Meeting notes", 3), ("notes about the consulting project", 1)], ["Report"], ["draft"]),
+    ])
+
+def test_bm25_score_matches_the_formula():
+    index = _index([
+        ("a", [("apple banana", 1)], [], []),
+        ("b", [("banana cherry cherry", 1)], [], []),
+    ])
+    (doc_id, score), = index.search(["apple"])
+    # apple: df=1 of 2 documents, tf=1 in a document of length 2 (average 2.5)
+    idf = math.log(1 + (2 - 1 + 0.5) / (1 + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * 2 / 2.5)
+    assert doc_id == "a"
+    assert score == pytest.approx(idf * (BM25_K1 + 1) * 1 / (1 + norm))
+
+def test_title_matches_rank_first(index):
+    assert [doc_id for doc_id, _ in index.search(["invoice"])] == ["a", "b"]
+
+def test_rare_terms_outweigh_common_ones(index):
+    # "consulting" is in every document, "project" only in c
+    ranked = index.search(["consulting", "project"])
+    assert ranked[0][0] == "c"
+    assert len(ranked) == 3
+
+def test_labels_filter_results(index):
+    assert [doc_id for doc_id, _ in index.search(["consulting"], tags={"2024", "paid"})] == ["a"]
+    assert [doc_id for doc_id, _ in index.search(["consulting"], categories={"Report"})] == ["c"]
+
+def test_removed_documents_are_not_returned(index):
+    assert index.remove("a")
+    assert not index.remove("a")
+    assert [doc_id for doc_id, _ in index.search(["invoice"])] == ["b"]
+    assert "a" not in index and len(index) == 2
+
+def test_re_adding_replaces_the_postings(index):
+    frequencies, length = term_frequencies([("Renamed", 3)])
+    index.add("a", frequencies, length)
+    assert [doc_id for doc_id, _ in index.search(["invoice"])] == ["b"]
+    assert index.search(["renamed"])[0][0] == "a"
+
+def test_compaction_keeps_rankings():
+    index = _index([(str(i), [(f"term{i % 10} common", 1)], [], []) for i in range(3000)])
+    for i in range(0, 3000, 2):
+        index.remove(str(i))
+    index.compact()
+    ranked = index.search(["term1"], limit=1000)
+    assert sorted(int(doc_id) for doc_id, _ in ranked) == list(range(1, 3000, 10))
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from backend.app.services.similarity import BANDS, NUM_PERM, band_keys, minhash, signature_fields, similarity
+
+WORDS = [f"word{i}" for i in range(400)]
+
+def _signature(words):
+    return minhash(" ".join(words)).tobytes()
+
+def test_signatures_are_deterministic():
+    text = " ".join(WORDS)
+    assert minhash(text).shape == (NUM_PERM,)
+    assert np.array_equal(minhash(text), minhash(text.upper()))
+    assert minhash("") is None
+    assert signature_fields("...") == {"minhash": None, "lsh_bands": []}
+
+def test_similarity_estimates_jaccard():
+    assert similarity(_signature(WORDS), _signature(WORDS)) == 1.0
+    # Changing every 20th word breaks 3 of each 20 shingles: Jaccard ~0.74
+    edited = [f"typo{i}" if i % 20 == 0 else word for i, word in enumerate(WORDS)]
+    assert similarity(_signature(WORDS), _signature(edited)) == pytest.approx(0.74, abs=0.12)
+    assert similarity(_signature(WORDS[:200]), _signature(WORDS[200:])) < 0.1
+
+def test_band_keys_identify_their_band():
+    signature = minhash(" ".join(WORDS))
+    keys = band_keys(signature)
+    assert len(keys) == BANDS
+    assert [key >> 56 for key in keys] == list(range(BANDS))
+    assert all(key < 1 << 63 for key in keys)  # Fits a signed 64-bit integer
+
+def test_near_duplicates_share_bands():
+    near = [f"typo{i}" if i % 100 == 0 else word for i, word in enumerate(WORDS)]
+    shared = set(band_keys(minhash(" ".join(WORDS)))) & set(band_keys(minhash(" ".join(near))))
+    assert shared
+    unrelated = band_keys(minhash(" ".join(f"other{i}" for i in range(400))))
+    assert not set(band_keys(minhash(" ".join(WORDS)))) & set(unrelated)
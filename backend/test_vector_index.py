@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pytest
+from backend.app.services.vector_index import VectorIndex, embed
+
+DIMENSIONS = 16
+
+def _id(i: int) -> str:
+    return f"{i:024x}"
+
+def _vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.fixture
+def index(tmp_path):
+    index = VectorIndex(str(tmp_path), DIMENSIONS)
+    index.open()
+    vectors = _vectors(100)
+    index.append([(_id(i), f"owner{i % 2}", vectors[i]) for i in range(100)])
+    return index
+
+def test_embeddings_are_normalized_and_deterministic():
+    a = embed("quarterly invoice for consulting services", 64)
+    assert a is not None and np.linalg.norm(a) == pytest.approx(1.0, abs=1e-5)
+    assert np.array_equal(a, embed("Quarterly invoice for consulting services", 64))
+    assert embed("12 345", 64) is None
+
+def test_search_returns_the_owners_nearest_rows(index):
+    query = index.vectors_of([_id(4)])[_id(4)]
+    hits = index.search(query, "owner0", k=5)[0]
+    assert hits[0] == (_id(4), pytest.approx(1.0, abs=1e-5))
+    assert all(int(doc_id, 16) % 2 == 0 for doc_id, _ in hits)
+    scores = [score for _, score in hits]
+    assert scores == sorted(scores, reverse=True)
+    assert _id(4) not in [doc_id for doc_id, _ in index.search(query, "owner0", k=5, exclude=[_id(4)])[0]]
+
+def test_both_search_strategies_agree(index, monkeypatch):
+    from backend.app.services import vector_index
+    query = _vectors(3, seed=1)
+    monkeypatch.setattr(vector_index.settings, "VECTOR_INDEX_FULL_SCAN_RATIO", 0.0)
+    scanned = index.search(query, "owner1", k=7)
+    monkeypatch.setattr(vector_index.settings, "VECTOR_INDEX_FULL_SCAN_RATIO", 1.0)
+    gathered = index.search(query, "owner1", k=7)
+    assert [[doc_id for doc_id, _ in row] for row in scanned] == [[doc_id for doc_id, _ in row] for row in gathered]
+
+def test_appending_a_changed_vector_replaces_the_row(index):
+    index.append([(_id(0), "owner0", index.vectors_of([_id(0)])[_id(0)])])
+    assert len(index.alive) == 100
+    index.append([(_id(0), "owner0", _vectors(1, seed=2)[0])])
+    assert len(index.alive) == 101 and len(index) == 100
+
+def test_removed_rows_survive_reopening_and_compaction(index, tmp_path):
+    assert index.remove([_id(i) for i in range(10)]) == 10
+    reopened = VectorIndex(str(tmp_path), DIMENSIONS)
+    reopened.open()
+    assert len(reopened) == 90
+    assert reopened.compact(keep={_id(i) for i in range(50)}) == 60
+    assert len(reopened) == 40 and len(reopened.alive) == 40
+    assert sorted(os.listdir(tmp_path)) == [f"gen-{reopened.meta['generation']}", "meta.json"]
+    hits = reopened.search(_vectors(1, seed=3), "owner1", k=100)[0]
+    assert sorted(int(doc_id, 16) for doc_id, _ in hits) == list(range(11, 50, 2))
+
+def test_uncommitted_rows_are_cut_on_open(index, tmp_path):
+    with open(os.path.join(tmp_path, f"gen-{index.meta['generation']}", "vectors.f32"), "ab") as f:
+        f.write(b"\0" * 10)  # A crash mid-append
+    reopened = VectorIndex(str(tmp_path), DIMENSIONS)
+    reopened.open()
+    assert len(reopened) == 100
+    reopened.append([(_id(500), "owner0", _vectors(1, seed=4)[0])])
+    assert np.array_equal(reopened.vectors[-1], _vectors(1, seed=4)[0])
+
+def test_readers_follow_the_writer(index, tmp_path):
+    reader = VectorIndex(str(tmp_path), DIMENSIONS, writable=False)
+    reader.open()
+    assert len(reader) == 100
+    assert not reader.refresh()
+
+    index.append([(_id(200), "owner2", _vectors(1, seed=5)[0])])
+    index.remove([_id(1)])
+    assert reader.refresh()
+    assert len(reader) == 100
+    assert reader.search(_vectors(1, seed=5), "owner2", k=1)[0][0][0] == _id(200)
+
+    # Removing on a reader only hides rows locally
+    reader.remove([_id(2)])
+    assert len(index) == 100
+
+    index.compact()
+    assert reader.refresh()
+    assert len(reader.alive) == len(reader) == 100
+    assert reader.meta["generation"] == index.meta["generation"]
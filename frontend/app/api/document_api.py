@@ -5,6 +5,10 @@ import json
 
 class DocumentAPI:
     """API client for interacting with the backend"""
+    # Last response and ETag per URL, shared across instances so Streamlit
+    # reruns can revalidate instead of downloading the catalog again
+    _etag_cache: Dict[str, tuple] = {}
+    
     def __init__(self, base_url: str):
         self.base_url = base_url
         self.client = httpx.AsyncClient(timeout=30.0)  # Increased timeout for uploads
@@ -12,6 +16,21 @@ class DocumentAPI:
     async def _get_client(self):
         return httpx.AsyncClient(timeout=30.0)
     
+    async def _get_revalidated(self, url: str) -> Any:
+        """GET a URL, reusing the cached body when the server answers 304"""
+        cached = self._etag_cache.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        
+        async with await self._get_client() as client:
+            response = await client.get(url, headers=headers)
+            if response.status_code == 304 and cached:
+                return cached[1]
+            response.raise_for_status()
+            data = response.json()
+            if "etag" in response.headers:
+                self._etag_cache[url] = (response.headers["etag"], data)
+            return data
+    
     async def upload_document(
         self,
         file,
@@ -63,9 +82,11 @@ class DocumentAPI:
         skip: int = 0,
         limit: int = 10,
         category: Optional[str] = None,
-        tag: Optional[str] = None
+        tag: Optional[str] = None,
+        filter_expression: Optional[str] = None,
+        include: Optional[List[str]] = None
     ) -> List[Dict]:
-        """List documents from the backend"""
+        """List documents from the backend (include=["shares"] embeds each active share)"""
         params = {
             "owner_id": owner_id,
             "skip": skip,
@@ -75,12 +96,35 @@ class DocumentAPI:
             params["category"] = category
         if tag:
             params["tag"] = tag
+        if filter_expression:
+            params["filter"] = filter_expression
+        if include:
+            params["include"] = include
         
         async with await self._get_client() as client:
             response = await client.get(f"{self.base_url}/documents/", params=params)
             response.raise_for_status()
             return response.json()
     
+    async def autocomplete(
+        self,
+        prefix: str,
+        owner_id: Optional[str] = None,
+        kinds: Optional[List[str]] = None,
+        limit: int = 10
+    ) -> Dict[str, List[Dict]]:
+        """Get tag, category and title suggestions starting with prefix"""
+        params = {"q": prefix, "limit": limit}
+        if owner_id:
+            params["owner_id"] = owner_id
+        if kinds:
+            params["kinds"] = kinds
+        
+        async with await self._get_client() as client:
+            response = await client.get(f"{self.base_url}/autocomplete/", params=params)
+            response.raise_for_status()
+            return response.json()
+    
     async def get_download_url(self, document_id: str, owner_id: str) -> str:
         """Get download URL for a document"""
         async with await self._get_client() as client:
@@ -90,6 +134,56 @@ class DocumentAPI:
             )
             response.raise_for_status()
             return response.json()["download_url"]
+
+    async def get_document_content(self, document_id: str, owner_id: str) -> Dict[str, Any]:
+        """Get the extracted text and summary of a document"""
+        async with await self._get_client() as client:
+            response = await client.get(
+                f"{self.base_url}/documents/{document_id}/content",
+                params={"owner_id": owner_id}
+            )
+            response.raise_for_status()
+            return response.json()
+    
+    async def get_similar_documents(self, document_id: str, owner_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get likely near-duplicates of a document, most similar first"""
+        async with await self._get_client() as client:
+            response = await client.get(
+                f"{self.base_url}/documents/{document_id}/similar",
+                params={"owner_id": owner_id, "limit": limit}
+            )
+            response.raise_for_status()
+            return response.json()["similar"]
+    
+    async def get_related_documents(self, document_id: str, owner_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the documents with the most similar text, most related first"""
+        async with await self._get_client() as client:
+            response = await client.get(
+                f"{self.base_url}/documents/{document_id}/related",
+                params={"owner_id": owner_id, "limit": limit}
+            )
+            response.raise_for_status()
+            return response.json()["related"]
+    
+    async def get_document_analysis(self, document_id: str, owner_id: str) -> Dict[str, Any]:
+        """Get the status and result of a document's background AI enrichment"""
+        async with await self._get_client() as client:
+            response = await client.get(
+                f"{self.base_url}/documents/{document_id}/analysis",
+                params={"owner_id": owner_id}
+            )
+            response.raise_for_status()
+            return response.json()
+    
+    async def request_document_analysis(self, document_id: str, owner_id: str) -> Dict[str, Any]:
+        """Queue AI enrichment of an uploaded document (again)"""
+        async with await self._get_client() as client:
+            response = await client.post(
+                f"{self.base_url}/documents/{document_id}/analysis",
+                params={"owner_id": owner_id}
+            )
+            response.raise_for_status()
+            return response.json()
     
     async def delete_document(self, document_id: str, owner_id: str) -> None:
         """Delete a document"""
@@ -102,10 +196,7 @@ class DocumentAPI:
     
     async def list_categories(self) -> List[Dict]:
         """Get all available categories"""
-        async with await self._get_client() as client:
-            response = await client.get(f"{self.base_url}/config/categories/")
-            response.raise_for_status()
-            return response.json()
+        return await self._get_revalidated(f"{self.base_url}/config/categories/")
     
     async def create_category(self, name: str, icon: str, description: Optional[str] = None) -> Dict:
         """Create a new category"""
@@ -123,13 +214,20 @@ class DocumentAPI:
             response = await client.delete(f"{self.base_url}/config/categories/{name}")
             response.raise_for_status()
     
-    async def list_tags(self) -> List[Dict]:
-        """Get all available tags"""
+    async def rename_category(self, name: str, new_name: str) -> Dict:
+        """Rename a category across all documents"""
         async with await self._get_client() as client:
-            response = await client.get(f"{self.base_url}/config/tags/")
+            response = await client.post(
+                f"{self.base_url}/config/categories/{name}/rename",
+                json={"new_name": new_name}
+            )
             response.raise_for_status()
             return response.json()
     
+    async def list_tags(self) -> List[Dict]:
+        """Get all available tags"""
+        return await self._get_revalidated(f"{self.base_url}/config/tags/")
+    
     async def create_tag(self, name: str, color: str) -> Dict:
         """Create a new tag"""
         async with await self._get_client() as client:
@@ -146,6 +244,16 @@ class DocumentAPI:
             response = await client.delete(f"{self.base_url}/config/tags/{name}")
             response.raise_for_status()
     
+    async def rename_tag(self, name: str, new_name: str) -> Dict:
+        """Rename a tag across all documents"""
+        async with await self._get_client() as client:
+            response = await client.post(
+                f"{self.base_url}/config/tags/{name}/rename",
+                json={"new_name": new_name}
+            )
+            response.raise_for_status()
+            return response.json()
+    
     async def get_user_stats(self, owner_id: str) -> Dict:
         """Get statistics about user's documents"""
         async with await self._get_client() as client:
@@ -207,15 +315,19 @@ class DocumentAPI:
         description: Optional[str] = None,
         categories: List[str] = None,
         tags: List[str] = None,
-        owner_id: str = None
-    ) -> List[Dict[str, Any]]:
-        """Upload multiple documents"""
+        owner_id: str = None,
+        enrich: bool = True,
+        check_duplicates: bool = False
+    ) -> Dict[str, Any]:
+        """Upload multiple documents, returning the created documents and per-file results"""
         url = f"{self.base_url}/documents/batch"
         
         # Prepare form data
         form = {
             "title_prefix": title_prefix,
             "owner_id": owner_id,
+            "enrich": "true" if enrich else "false",
+            "check_duplicates": "true" if check_duplicates else "false",
         }
         if description:
             form["description"] = description
@@ -225,7 +337,8 @@ class DocumentAPI:
             form["tags"] = tags
             
         # Prepare files
-        files_data = [("files", (f.name, f, "application/octet-stream")) for f in files]
+        # The type decides whether text can be extracted for search and AI enrichment
+        files_data = [("files", (f.name, f, getattr(f, "type", None) or "application/octet-stream")) for f in files]
         
         response = await self.client.post(url, data=form, files=files_data)
         response.raise_for_status()
@@ -242,15 +355,55 @@ class DocumentAPI:
         response.raise_for_status()
         return response.json()
 
-    async def analyze_document(self, file) -> Dict[str, Any]:
-        """Get AI-generated suggestions for a document"""
+    async def patch_document(
+        self,
+        document_id: str,
+        owner_id: str,
+        revision: Optional[int] = None,
+        **changes
+    ) -> Dict[str, Any]:
+        """Partially update a document (title, description, tags, add_tags, remove_tags, ...)"""
+        data = {"owner_id": owner_id, "revision": revision, **changes}
+        async with await self._get_client() as client:
+            response = await client.patch(f"{self.base_url}/documents/{document_id}", json=data)
+            response.raise_for_status()
+            return response.json()
+
+    async def bulk_update_documents(
+        self,
+        owner_id: str,
+        document_ids: Optional[List[str]] = None,
+        filter_expression: Optional[str] = None,
+        add_tags: Optional[List[str]] = None,
+        remove_tags: Optional[List[str]] = None,
+        add_categories: Optional[List[str]] = None,
+        remove_categories: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Add or remove labels on many documents at once"""
+        data = {
+            "owner_id": owner_id,
+            "document_ids": document_ids,
+            "filter": filter_expression,
+            "add_tags": add_tags or [],
+            "remove_tags": remove_tags or [],
+            "add_categories": add_categories or [],
+            "remove_categories": remove_categories or []
+        }
+        async with await self._get_client() as client:
+            response = await client.post(f"{self.base_url}/documents/bulk-update", json=data)
+            response.raise_for_status()
+            return response.json()
+
+    async def analyze_document(self, file, summary: bool = True) -> Dict[str, Any]:
+        """Get AI-generated suggestions for a document (without summary, locally when possible)"""
         try:
             url = f"{self.base_url}/documents/analyze"
             
             async with await self._get_client() as client:
                 response = await client.post(
                     url,
-                    files={"file": file}
+                    files={"file": file},
+                    data={"summary": str(summary).lower()}
                 )
                 response.raise_for_status()
                 return response.json()
@@ -258,6 +411,44 @@ class DocumentAPI:
         except Exception as e:
             raise ValueError(f"Error analyzing document: {str(e)}")
 
+    async def analyze_documents(
+        self,
+        files: List[BinaryIO],
+        summary: bool = True,
+        on_result=None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get AI-generated suggestions for several documents in one request.
+
+        Results stream back as each file finishes; on_result is called with
+        each one as it arrives. Returns all results in file order.
+        """
+        url = f"{self.base_url}/documents/analyze/batch"
+        files_data = [("files", (f.name, f, getattr(f, "type", None) or "application/octet-stream")) for f in files]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        try:
+            # Files may wait for rate limit capacity between results
+            async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=120.0)) as client:
+                async with client.stream(
+                    "POST",
+                    url,
+                    files=files_data,
+                    data={"summary": str(summary).lower()}
+                ) as response:
+                    if response.is_error:
+                        await response.aread()
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        result = json.loads(line)
+                        results[result["index"]] = result
+                        if on_result:
+                            on_result(result)
+        except Exception as e:
+            raise ValueError(f"Error analyzing documents: {str(e)}")
+        return results
+
     # Share-related methods
     async def create_share(
         self,
@@ -64,7 +64,7 @@ def invalidate_tags_cache():
     st.session_state.tags_cache_version += 1
 
 # Cache decorators
-@st.cache_data(ttl=60)  # Reduced cache time to 1 minute for more frequent updates
+@st.cache_data(ttl=5)  # Short TTL: the API revalidates cheaply with ETags
 def get_categories(cache_version: int, _api) -> List[str]:
     """Get list of category names from the database"""
     try:
@@ -74,7 +74,7 @@ def get_categories(cache_version: int, _api) -> List[str]:
         st.error(f"Error loading categories: {str(e)}")
         return ["Invoice", "Contract", "Report", "Other"]
 
-@st.cache_data(ttl=60)  # Reduced cache time to 1 minute for more frequent updates
+@st.cache_data(ttl=5)  # Short TTL: the API revalidates cheaply with ETags
 def get_tags(cache_version: int, _api) -> List[str]:
     """Get list of tag names from the database"""
     try:
@@ -31,7 +31,19 @@ def show_documents_page(api):
             ["All"] + get_categories(st.session_state.categories_cache_version, api)
         )
     with col2:
-        filter_tag = st.text_input("Filter by tag")
+        tag_query = st.text_input("Filter by tag")
+        filter_tag = tag_query
+        if tag_query:
+            suggestions = run_async_operation(api.autocomplete, tag_query, kinds=["tags"])
+            matching_tags = [tag["value"] for tag in suggestions["tags"]]
+            if matching_tags and tag_query not in matching_tags:
+                filter_tag = st.selectbox("Matching tags", matching_tags)
+    
+    filter_expression = st.text_input(
+        "Advanced filter",
+        help='Combine tags and categories with AND, OR, NOT and parentheses, '
+             'e.g. Invoice AND 2024 AND NOT paid, category:Contract, created>=2024-01-01, size<5MB'
+    )
     
     # List documents
     try:
@@ -39,18 +51,13 @@ def show_documents_page(api):
             api.list_documents,
             owner_id=TEMP_USER_ID,
             category=None if filter_category == "All" else filter_category,
-            tag=filter_tag if filter_tag else None
-        )
-        
-        # Get all shares for the user
-        shares = run_async_operation(
-            api.list_shares,
-            owner_id=TEMP_USER_ID,
-            include_expired=False
+            tag=filter_tag if filter_tag else None,
+            filter_expression=filter_expression or None,
+            include=["shares"]
         )
         
         # Create a map of document_id to share info
-        share_map = {share["document_id"]: share for share in shares}
+        share_map = {doc["_id"]: doc["share"] for doc in documents if doc.get("share")}
         
         if not documents:
             st.info("No documents found")
@@ -71,6 +78,35 @@ def show_documents_page(api):
                             share = share_map[doc["_id"]]
                             st.markdown(f"🔗 **Shared link:** [{share['short_url']}]({share['short_url']})")
                             st.caption(format_expiry(share['expires_at']))
+                        
+                        if st.checkbox("Show similar documents", key=f"similar_{doc['_id']}"):
+                            try:
+                                similar = run_async_operation(
+                                    api.get_similar_documents,
+                                    doc['_id'],
+                                    TEMP_USER_ID
+                                )
+                                if not similar:
+                                    st.caption("No near-duplicates found")
+                                for other in similar:
+                                    st.write(f"📄 {other['title']} ({other['file_name']}) - {other['similarity']:.0%} similar")
+                            except Exception as e:
+                                st.caption(f"Similar documents unavailable: {str(e)}")
+                        
+                        if st.checkbox("Show related documents", key=f"related_{doc['_id']}"):
+                            try:
+                                related = run_async_operation(
+                                    api.get_related_documents,
+                                    doc['_id'],
+                                    TEMP_USER_ID,
+                                    5
+                                )
+                                if not related:
+                                    st.caption("No related documents found")
+                                for other in related:
+                                    st.write(f"📄 {other['title']} ({other['file_name']})")
+                            except Exception as e:
+                                st.caption(f"Related documents unavailable: {str(e)}")
                     
                     with col2:
                         if st.button("Download", key=f"download_{doc['_id']}"):
@@ -139,16 +175,7 @@ def show_documents_page(api):
                                 if st.button("Yes", key=f"yes_{doc['_id']}"):
                                     with st.spinner("Deleting document..."):
                                         try:
-                                            # Delete any existing shares first
-                                            if doc["_id"] in share_map:
-                                                share = share_map[doc["_id"]]
-                                                run_async_operation(
-                                                    api.delete_share,
-                                                    share['id'],
-                                                    TEMP_USER_ID
-                                                )
-                                            
-                                            # Then delete the document
+                                            # Shares are removed with the document
                                             run_async_operation(
                                                 api.delete_document,
                                                 doc['_id'],
@@ -9,6 +9,7 @@ from app.components.utils import (
     TEMP_USER_ID
 )
 import time
+from collections import Counter
 
 def show_upload_page(api):
     """Upload page content"""
@@ -89,6 +90,45 @@ def show_upload_page(api):
                         st.session_state.suggested_description = ""
                         st.session_state.suggested_categories = []
                         st.session_state.suggested_tags = []
+        elif uploaded_files:
+            if st.button("Analyze Documents with AI", key="analyze_batch_button"):
+                progress = st.progress(0.0, text="Analyzing documents...")
+                finished = []
+                
+                def show_result(result):
+                    finished.append(result)
+                    progress.progress(
+                        len(finished) / len(uploaded_files),
+                        text=f"Analyzed {len(finished)} of {len(uploaded_files)} documents"
+                    )
+                    if result["status"] != "success":
+                        st.warning(f"Could not analyze {result['file_name']}: {result['error']}")
+                
+                try:
+                    # Only labels are merged across the batch, so the local
+                    # classifier may answer instead of the LLM
+                    results = run_async_operation(
+                        api.analyze_documents,
+                        uploaded_files,
+                        summary=False,
+                        on_result=show_result
+                    )
+                    # One set of metadata applies to the whole batch: suggest
+                    # what the documents share, most common first
+                    analyses = [r["result"] for r in results if r and r["status"] == "success"]
+                    categories = Counter(c for a in analyses for c in a["categories"])
+                    tags = Counter(t for a in analyses for t in a["tags"])
+                    summaries = {a["summary"] for a in analyses if a["summary"]}
+                    st.session_state.suggested_description = summaries.pop() if len(summaries) == 1 else ""
+                    st.session_state.suggested_categories = [c for c, _ in categories.most_common()]
+                    st.session_state.suggested_tags = [t for t, _ in tags.most_common(10)]
+                    if analyses:
+                        st.success(f"Analyzed {len(analyses)} of {len(uploaded_files)} documents")
+                except ValueError as e:
+                    st.error(f"Could not analyze documents: {str(e)}")
+                    st.session_state.suggested_description = ""
+                    st.session_state.suggested_categories = []
+                    st.session_state.suggested_tags = []
         
         with st.form("upload_form", clear_on_submit=True):
             col1, col2 = st.columns(2)
@@ -159,6 +199,17 @@ def show_upload_page(api):
                             except Exception as e:
                                 st.error(f"Error creating new tag '{new_tag}': {str(e)}")
             
+            enrich = st.checkbox(
+                "Enrich with AI in the background",
+                value=True,
+                help="Adds an AI summary, categories and tags after the upload; you don't have to wait for it"
+            )
+            check_duplicates = st.checkbox(
+                "Warn about near-duplicates",
+                value=False,
+                help="Compares the files with your documents before finishing; uploads take longer"
+            )
+            
             # Main form submit button
             submit = st.form_submit_button("Upload Documents", use_container_width=True)
             
@@ -170,16 +221,29 @@ def show_upload_page(api):
                 else:
                     with st.spinner(f"Uploading {len(uploaded_files)} document(s)..."):
                         try:
-                            documents = run_async_operation(
+                            result = run_async_operation(
                                 api.upload_documents,
                                 uploaded_files,
                                 title_prefix,
                                 description,
                                 categories,
                                 tags,
-                                TEMP_USER_ID
+                                TEMP_USER_ID,
+                                enrich,
+                                check_duplicates
                             )
-                            st.success(f"Successfully uploaded {len(documents)} document(s)!")
+                            documents = result["documents"]
+                            st.success(f"Successfully uploaded {len(documents)} of {result['total']} document(s)!")
+                            
+                            # Report files that could not be stored
+                            for outcome in result["results"]:
+                                if outcome["status"] != "created":
+                                    st.error(f"{outcome['file_name']}: {outcome['error']}")
+                                for duplicate in outcome.get("duplicates", []):
+                                    st.warning(
+                                        f"{outcome['file_name']} looks like \"{duplicate['title']}\" "
+                                        f"({duplicate['similarity']:.0%} similar)"
+                                    )
                             
                             # Show uploaded documents summary
                             with st.expander("View uploaded documents"):